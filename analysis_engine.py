@@ -1,7 +1,59 @@
+import threading
+
+import numpy as np
 import pandas as pd
-from prophet import Prophet
+
+from data_store import get_data_store
+from elasticity import get_elasticity_table
+from fast_forecast import FOURIER_PARAMS, forecast_many
+from forecast_cache import get_forecast_cache, make_cache_key
+from instrumentation import increment, label, span, traced
+from model_registry import get_model_registry, warm_start_params
+from simulation import (DEFAULT_DISCOUNTS, DEFAULT_PATHS, interval_demand_paths, prophet_demand_paths,
+                        simulate_promotions, simulate_shelf_life_promotions, simulate_waste_risk)
+
+# Keyword arguments every Prophet model is built with (also part of the forecast cache key)
+PROPHET_PARAMS = {'weekly_seasonality': True, 'yearly_seasonality': True}
+
+# Forecasting engines selectable in get_forecast(), with the settings that key their cache entries
+ENGINE_PARAMS = {'prophet': PROPHET_PARAMS, 'fourier': FOURIER_PARAMS}
+
+# Prophet (with cmdstanpy, matplotlib and the Stan backend) takes about a second to
+# import, so it is loaded on the first fit rather than with this module
+_prophet_class = None
+_prophet_lock = threading.Lock()
+
+
+def load_prophet():
+    """
+    Import Prophet on first use.
+    
+    Returns:
+        type: The prophet.Prophet class
+    """
+    global _prophet_class
+    with _prophet_lock:
+        if _prophet_class is None:
+            with span('prophet_import'):
+                from prophet import Prophet
+            _prophet_class = Prophet
+        return _prophet_class
+
+
+def warm_up():
+    """
+    Load Prophet and run one tiny fit so the Stan backend is ready before the first real request.
+    
+    Worker processes and the dashboard's job threads call this at startup.
+    """
+    Prophet = load_prophet()
+    ds = pd.date_range('2024-01-01', periods=28, freq='D')
+    y = 10.0 + np.sin(np.arange(28) * 2.0 * np.pi / 7.0)
+    with span('prophet_warm_up'):
+        Prophet(weekly_seasonality=True, yearly_seasonality=False).fit(pd.DataFrame({'ds': ds, 'y': y}))
 
 
+@traced('get_product_list')
 def get_product_list():
     """
     Get the list of products from current inventory.
@@ -9,83 +61,290 @@ def get_product_list():
     Returns:
         dict[str, str]: Dictionary mapping product_name to sku
     """
-    # Read the current inventory CSV
-    inventory_df = pd.read_csv('current_inventory.csv')
+    # Dictionary with product_name as key and sku as value, built once per file version
+    return get_data_store().product_list()
+
+
+def build_prophet_frame(product_sales):
+    """
+    Convert one product's sales rows into Prophet's input format.
     
-    # Create dictionary with product_name as key and sku as value
-    product_dict = dict(zip(inventory_df['product_name'], inventory_df['sku']))
+    Args:
+        product_sales (pd.DataFrame): Sales rows with datetime_id and qty_sold_kg columns
+    
+    Returns:
+        pd.DataFrame: DataFrame with 'ds' (datetime) and 'y' (float) columns
+    """
+    # Convert datetime_id (YYYYMMDD format) to datetime
+    with span('prepare_history'):
+        return pd.DataFrame({
+            'ds': pd.to_datetime(product_sales['datetime_id'].astype(str), format='%Y%m%d'),
+            'y': product_sales['qty_sold_kg'].astype('float64'),
+        })
+
+
+def fit_forecast(prophet_df, forecast_days=7, init=None):
+    """
+    Fit a Prophet model on prepared sales history and predict ahead.
+    
+    Args:
+        prophet_df (pd.DataFrame): History with 'ds' and 'y' columns
+        forecast_days (int): Number of days to forecast (default: 7)
+        init (dict): Optional Stan initialization from warm_start_params() of a previous fit
     
-    return product_dict
+    Returns:
+        tuple: (model, forecast_df, total_forecast_days), as returned by get_forecast()
+    """
+    # Initialize Prophet model with seasonality settings
+    model = load_prophet()(**PROPHET_PARAMS)
+    
+    # Fit the model
+    with span('prophet_fit'):
+        if init is None:
+            model.fit(prophet_df)
+        else:
+            model.fit(prophet_df, init=init)
+    increment('prophet_fits')
+    if init is not None:
+        increment('prophet_warm_starts')
+    
+    forecast_df, total_forecast_days = predict_with_model(model, forecast_days)
+    
+    return model, forecast_df, total_forecast_days
+
+
+def predict_with_model(model, forecast_days=7):
+    """
+    Predict the model's history plus the next forecast_days days without refitting.
+    
+    Args:
+        model (Prophet): A fitted Prophet model
+        forecast_days (int): Number of days to forecast (default: 7)
+    
+    Returns:
+        tuple: (forecast_df, total_forecast_days)
+    """
+    # Create future dataframe for specified days ahead
+    future = model.make_future_dataframe(periods=forecast_days)
+    
+    # Generate forecast
+    with span('prophet_predict'):
+        forecast_df = model.predict(future)
+    increment('prophet_predictions')
+    
+    # Calculate total forecasted sales for the forecast period
+    # Get only the future predictions (last N rows)
+    future_predictions = forecast_df.tail(forecast_days)
+    total_forecast_days = future_predictions['yhat'].sum()
+    
+    return forecast_df, total_forecast_days
+
+
+def _report_progress(progress, stage, fraction):
+    """Forward a stage update to an optional progress callback."""
+    if progress is not None:
+        progress(stage, fraction)
 
 
-def get_forecast(sku_id, forecast_days=7):
+def validate_engine(engine):
     """
-    Generate demand forecast for a given SKU using Prophet.
+    Look up an engine's settings, rejecting unknown engine names.
+
+    Args:
+        engine (str): Forecasting engine name
+
+    Returns:
+        dict: The engine's entry in ENGINE_PARAMS
+
+    Raises:
+        ValueError: If the engine is unknown
+    """
+    if engine not in ENGINE_PARAMS:
+        raise ValueError(f"Unknown forecast engine '{engine}' (expected one of: {', '.join(ENGINE_PARAMS)})")
+    return ENGINE_PARAMS[engine]
+
+
+def _fourier_forecast(sku_id, forecast_days):
+    """Forecast one SKU with the vectorized Fourier engine (no model object)."""
+    with span('fourier_fit'):
+        forecast_df, total_forecast_days = forecast_many([sku_id], forecast_days)[sku_id]
+    increment('fourier_fits')
+    return None, forecast_df, total_forecast_days
+
+
+@traced('get_forecast')
+def get_forecast(sku_id, forecast_days=7, use_cache=True, progress=None, engine='prophet'):
+    """
+    Generate demand forecast for a given SKU using Prophet or the fast Fourier engine.
+    
+    Forecasts are cached on (sku, forecast_days, engine settings, hash of the SKU's
+    sales history); a cache hit skips the fit entirely. On a Prophet cache miss the
+    model registry is consulted: a stored model fitted on the same history is only
+    re-predicted, and a model fitted on older history warm-starts the refit.
     
     Args:
         sku_id (str): The SKU identifier (e.g., 'VEG0001')
         forecast_days (int): Number of days to forecast (default: 7)
+        use_cache (bool): Reuse and store cached forecasts and registry models (default: True)
+        progress (callable): Optional callback progress(stage, fraction) for status reporting
+        engine (str): 'prophet' (default) or 'fourier' (fast_forecast least squares)
     
     Returns:
         tuple: (model, forecast_df, total_forecast_days)
-            - model: Fitted Prophet model object
+            - model: Fitted Prophet model object (None when served from the cache
+              or for the fourier engine)
             - forecast_df: Full forecast DataFrame
             - total_forecast_days: Sum of predicted sales for forecast period (float)
+    
+    Raises:
+        ValueError: If the SKU is not in the inventory or the engine is unknown
     """
-    # Read the data files
-    inventory_df = pd.read_csv('current_inventory.csv')
-    sales_df = pd.read_csv('daily_sales.csv')
+    label(sku_id=sku_id, forecast_days=forecast_days, engine=engine)
+    engine_params = validate_engine(engine)
+    store = get_data_store()
     
     # Get the product_id for the given sku_id
-    product_row = inventory_df[inventory_df['sku'] == sku_id]
-    if product_row.empty:
-        raise ValueError(f"SKU {sku_id} not found in inventory")
+    with span('data_access'):
+        product_id = store.product_id(sku_id)
     
-    product_id = product_row['product_id'].iloc[0]
+    if not use_cache:
+        _report_progress(progress, 'fitting model', 0.1)
+        if engine == 'fourier':
+            result = _fourier_forecast(sku_id, forecast_days)
+        else:
+            prophet_df = build_prophet_frame(store.product_sales(product_id))
+            result = fit_forecast(prophet_df, forecast_days)
+        _report_progress(progress, 'done', 1.0)
+        return result
     
-    # Filter sales data for this product
-    product_sales = sales_df[sales_df['product_id'] == product_id].copy()
+    _report_progress(progress, 'checking cache', 0.05)
+    cache = get_forecast_cache()
+    with span('data_access'):
+        fingerprint = store.product_fingerprint(product_id)
+    cache_key = make_cache_key(sku_id, forecast_days, engine_params, fingerprint)
+    with span('cache_lookup'):
+        cached = cache.get(cache_key)
+    if cached is not None:
+        increment('forecast_cache_hits')
+        forecast_df, total_forecast_days = cached
+        _report_progress(progress, 'done', 1.0)
+        return None, forecast_df, total_forecast_days
+    increment('forecast_cache_misses')
     
-    # Prepare data for Prophet: rename columns to 'ds' and 'y'
-    # Convert datetime_id (YYYYMMDD format) to datetime
-    product_sales['ds'] = pd.to_datetime(product_sales['datetime_id'].astype(str), format='%Y%m%d')
-    product_sales['y'] = product_sales['qty_sold_kg']
+    if engine == 'fourier':
+        # Fitting is cheaper than any registry round-trip
+        _report_progress(progress, 'fitting model', 0.1)
+        model, forecast_df, total_forecast_days = _fourier_forecast(sku_id, forecast_days)
+        with span('cache_store'):
+            cache.put(cache_key, sku_id, forecast_days, forecast_df, total_forecast_days)
+        _report_progress(progress, 'done', 1.0)
+        return model, forecast_df, total_forecast_days
     
-    # Select only the required columns for Prophet
-    prophet_df = product_sales[['ds', 'y']]
+    registry = get_model_registry()
+    with span('registry_load'):
+        latest = registry.latest(sku_id)
+    if latest is not None and latest['params'] != PROPHET_PARAMS:
+        latest = None
     
-    # Initialize Prophet model with seasonality settings
-    model = Prophet(weekly_seasonality=True, yearly_seasonality=True)
+    if latest is not None and latest['data_fingerprint'] == fingerprint:
+        # Same history as the stored model: predict only
+        _report_progress(progress, 'predicting', 0.5)
+        with span('registry_load'):
+            model = registry.load(sku_id, latest['version'])
+        increment('registry_reuses')
+        forecast_df, total_forecast_days = predict_with_model(model, forecast_days)
+    else:
+        # Sales data for this product, served from the in-memory per-product index
+        _report_progress(progress, 'fitting model', 0.1)
+        with span('data_access'):
+            product_sales = store.product_sales(product_id)
+        prophet_df = build_prophet_frame(product_sales)
+        
+        # Warm-start from the previous model's parameters when history has grown
+        init = None
+        if latest is not None:
+            with span('registry_load'):
+                init = warm_start_params(registry.load(sku_id, latest['version']))
+        model, forecast_df, total_forecast_days = fit_forecast(prophet_df, forecast_days, init=init)
+        with span('registry_save'):
+            registry.save(sku_id, model, fingerprint, PROPHET_PARAMS)
     
-    # Fit the model
-    model.fit(prophet_df)
+    with span('cache_store'):
+        cache.put(cache_key, sku_id, forecast_days, forecast_df, total_forecast_days)
+    _report_progress(progress, 'done', 1.0)
     
-    # Create future dataframe for specified days ahead
-    future = model.make_future_dataframe(periods=forecast_days)
+    return model, forecast_df, total_forecast_days
+
+
+def forecast_version(sku_id, forecast_days=7, engine='prophet'):
+    """
+    Identify the forecast get_forecast() would currently return for a SKU.
     
-    # Generate forecast
-    forecast_df = model.predict(future)
+    The version changes whenever the SKU's sales history, the horizon or the
+    engine settings change, so it can key caches of anything derived from a forecast.
     
-    # Calculate total forecasted sales for the forecast period
-    # Get only the future predictions (last N rows)
-    future_predictions = forecast_df.tail(forecast_days)
-    total_forecast_days = future_predictions['yhat'].sum()
+    Args:
+        sku_id (str): The SKU identifier (e.g., 'VEG0001')
+        forecast_days (int): Number of days to forecast (default: 7)
+        engine (str): 'prophet' (default) or 'fourier'
+    
+    Returns:
+        str: Version identifier (the forecast cache key)
+    """
+    engine_params = validate_engine(engine)
+    store = get_data_store()
+    fingerprint = store.product_fingerprint(store.product_id(sku_id))
+    return make_cache_key(sku_id, forecast_days, engine_params, fingerprint)
+
+
+@traced('predict_forecast')
+def predict_forecast(sku_id, forecast_days=7, version=None):
+    """
+    Forecast any horizon from a stored model without refitting.
+    
+    Args:
+        sku_id (str): The SKU identifier (e.g., 'VEG0001')
+        forecast_days (int): Number of days to forecast (default: 7)
+        version (int): Registry version to predict with (default: latest)
+    
+    Returns:
+        tuple: (model, forecast_df, total_forecast_days), as returned by get_forecast()
+    
+    Raises:
+        ValueError: If no model is stored for the SKU
+    """
+    label(sku_id=sku_id, forecast_days=forecast_days)
+    with span('registry_load'):
+        model = get_model_registry().load(sku_id, version)
+    forecast_df, total_forecast_days = predict_with_model(model, forecast_days)
     
     return model, forecast_df, total_forecast_days
 
 
-def run_waste_simulation(sku_id, base_forecast_days, discount_percentage, stock_multiplier=1.0):
+@traced('run_waste_simulation')
+def run_waste_simulation(sku_id, base_forecast_days, discount_percentage, stock_multiplier=1.0,
+                         forecast_df=None, forecast_days=7, date_id=None):
     """
     Simulate waste and revenue under baseline and promotional scenarios.
     
+    Without forecast_df, the horizon's total demand is compared with stock on hand.
+    With forecast_df, the daily yhat path drives a FIFO shelf-life simulation:
+    stock expires when its shelf life runs out, in-transit stock arrives after
+    the lead time, and revenue counts only sales served from stock.
+    
     Args:
         sku_id (str): The SKU identifier (e.g., 'VEG0001')
         base_forecast_days (float): Total forecasted sales for forecast period from get_forecast()
         discount_percentage (float): Discount percentage as decimal (e.g., 0.15 for 15%)
         stock_multiplier (float): Multiplier for stock levels to simulate overstocking (default: 1.0)
+        forecast_df (pd.DataFrame): Forecast from get_forecast(); enables the shelf-life simulation
+        forecast_days (int): Forecast days at the end of forecast_df to simulate (default: 7)
+        date_id (int): Inventory date as YYYYMMDD; the SKU's latest row on or before it is
+            used (default: latest snapshot)
     
     Returns:
         dict: Dictionary containing simulation results with keys:
+            - snapshot_date: Inventory snapshot the stock came from (YYYYMMDD)
             - current_stock: Current stock on hand (kg)
             - days_to_expire: Days until product expires
             - base_waste_kg: Waste without discount (kg)
@@ -93,44 +352,105 @@ def run_waste_simulation(sku_id, base_forecast_days, discount_percentage, stock_
             - base_revenue: Revenue without discount (VND)
             - promo_revenue: Revenue with discount (VND)
     """
-    # Read current inventory
-    inventory_df = pd.read_csv('current_inventory.csv')
-    
-    # Find the row for the given SKU
-    product_row = inventory_df[inventory_df['sku'] == sku_id]
-    if product_row.empty:
-        raise ValueError(f"SKU {sku_id} not found in inventory")
+    # As-of lookup in the inventory's (sku, store, date) index
+    # SKU-level simulation uses the SKU's first store;
+    # simulation.run_store_simulation() covers every store
+    label(sku_id=sku_id)
+    with span('data_access'):
+        product_row = get_data_store().inventory_row(sku_id, date_id=date_id)
     
     # Extract required values
-    base_stock = product_row['stock_on_hand_kg'].iloc[0]
-    current_stock = base_stock * stock_multiplier  # Apply multiplier for overstocking scenarios
-    shelf_life_days = product_row['shelf_life_days'].iloc[0]
-    cost_price = product_row['cost_price'].iloc[0]
-    sale_price = product_row['list_price'].iloc[0]  # Use list_price as sale_price
+    base_stock = float(product_row['stock_on_hand_kg'])
+    shelf_life_days = int(product_row['shelf_life_days'])
+    sale_price = float(product_row['list_price'])  # Use list_price as sale_price
     
     # Calculate days_to_expire
-    # Inventory snapshot is dated 2025-12-30, shelf_life_days is the remaining days
+    # shelf_life_days is the remaining shelf life on the row's snapshot date
     days_to_expire = shelf_life_days
     
-    # Define the Price Elasticity Multiplier
-    ELASTICITY_MULTIPLIER = 2.5
-    
-    # Calculate Promo scenario
-    sales_uplift = discount_percentage * ELASTICITY_MULTIPLIER
-    predicted_sales_with_promo = base_forecast_days * (1 + sales_uplift)
-    promo_waste_kg = max(0, current_stock - predicted_sales_with_promo)
-    promo_revenue = predicted_sales_with_promo * (sale_price * (1 - discount_percentage))
+    # The SKU's fitted elasticity (ELASTICITY_MULTIPLIER until a table is fitted)
+    elasticity = get_elasticity_table().get(sku_id)
     
-    # Calculate Baseline scenario (0% discount)
-    base_waste_kg = max(0, current_stock - base_forecast_days)
-    base_revenue = base_forecast_days * sale_price
+    # Evaluate the promo model for this single point;
+    # both kernels apply the stock multiplier for overstocking scenarios
+    if forecast_df is None:
+        with span('simulate'):
+            result = simulate_promotions(
+                [base_forecast_days], [base_stock], [sale_price], [discount_percentage], [stock_multiplier],
+                elasticity
+            )
+        base_revenue = float(result['base_revenue'][0])
+        promo_revenue = float(result['promo_revenue'][0, 0])
+    else:
+        daily_demand = forecast_df['yhat'].tail(forecast_days).to_numpy(dtype=np.float64)
+        with span('simulate'):
+            result = simulate_shelf_life_promotions(
+                daily_demand[None, :], [base_stock], [sale_price], [discount_percentage], [stock_multiplier],
+                elasticity,
+                stock_in_transit=float(product_row['stock_in_transit_kg']),
+                lead_time_days=int(product_row['lead_time_days']),
+                shelf_life_days=shelf_life_days,
+            )
+        base_revenue = float(result['base_revenue'][0, 0])
+        promo_revenue = float(result['promo_revenue'][0, 0, 0])
     
     # Return dictionary with all results
     return {
-        "current_stock": current_stock,
+        "snapshot_date": int(product_row['date_id']),
+        "current_stock": float(result['current_stock'][0, 0]),
         "days_to_expire": days_to_expire,
-        "base_waste_kg": base_waste_kg,
-        "promo_waste_kg": promo_waste_kg,
+        "base_waste_kg": float(result['base_waste_kg'][0, 0]),
+        "promo_waste_kg": float(result['promo_waste_kg'][0, 0, 0]),
         "base_revenue": base_revenue,
         "promo_revenue": promo_revenue
     }
+
+
+@traced('run_waste_risk')
+def run_waste_risk(sku_id, forecast_df, discounts=DEFAULT_DISCOUNTS, n_paths=DEFAULT_PATHS, stock_multiplier=1.0,
+                   model=None, forecast_days=7, seed=None, date_id=None):
+    """
+    Monte Carlo waste and revenue bands per discount level.
+    
+    Demand paths come from the model's predictive samples when a fitted Prophet
+    model is given, and otherwise from a normal fit to forecast_df's
+    yhat_lower/yhat_upper band. Every path goes through the shelf-life
+    simulation in one NumPy batch.
+    
+    Args:
+        sku_id (str): The SKU identifier (e.g., 'VEG0001')
+        forecast_df (pd.DataFrame): Forecast from get_forecast()
+        discounts (array-like): Discounts as decimals (default: 0-80% in 1% steps)
+        n_paths (int): Demand paths to simulate (default: DEFAULT_PATHS)
+        stock_multiplier (float): Multiplier for stock levels (default: 1.0)
+        model (Prophet): Fitted model from get_forecast(); None uses the interval fit
+        forecast_days (int): Forecast days at the end of forecast_df (default: 7)
+        seed (int): Random seed for the interval fit's draws
+        date_id (int): Inventory date as YYYYMMDD, resolved as of that date (default: latest snapshot)
+    
+    Returns:
+        pd.DataFrame: One row per discount with P10/P50/P90 base and promo
+            waste (kg) and revenue (VND), see simulation.simulate_waste_risk()
+    """
+    label(sku_id=sku_id, n_paths=n_paths)
+    with span('data_access'):
+        product_row = get_data_store().inventory_row(sku_id, date_id=date_id)
+    
+    with span('sample_paths'):
+        if model is not None:
+            paths = prophet_demand_paths(model, n_paths, forecast_days)
+        else:
+            paths = interval_demand_paths(forecast_df, n_paths, forecast_days, seed=seed)
+    
+    with span('simulate'):
+        return simulate_waste_risk(
+            paths,
+            float(product_row['stock_on_hand_kg']),
+            float(product_row['list_price']),
+            discounts,
+            stock_multiplier,
+            get_elasticity_table().get(sku_id),
+            stock_in_transit=float(product_row['stock_in_transit_kg']),
+            lead_time_days=int(product_row['lead_time_days']),
+            shelf_life_days=int(product_row['shelf_life_days']),
+        )
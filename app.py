@@ -1,7 +1,16 @@
-import streamlit as st
+import os
+import tempfile
+
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from analysis_engine import get_product_list, get_forecast, run_waste_simulation
+import streamlit as st
+from analysis_engine import run_waste_risk, run_waste_simulation
+from data_store import get_data_store
+from export import EXPORT_KINDS, export_batches, write_batches
+from instrumentation import last_request, snapshot, stage_breakdown
+from forecast_jobs import FAILED, get_job_scheduler
+from rendering import cached_product_list, forecast_figure, forecast_table
+from simulation import DEFAULT_PATHS, run_store_simulation
 
 # Page configuration
 st.set_page_config(
@@ -113,6 +122,47 @@ if 'base_forecast_7_days' not in st.session_state:
     st.session_state.base_forecast_7_days = None
 if 'selected_sku' not in st.session_state:
     st.session_state.selected_sku = None
+if 'forecast_sku' not in st.session_state:
+    st.session_state.forecast_sku = None
+if 'forecast_job_id' not in st.session_state:
+    st.session_state.forecast_job_id = None
+if 'forecast_version' not in st.session_state:
+    st.session_state.forecast_version = None
+if 'forecast_error' not in st.session_state:
+    st.session_state.forecast_error = None
+if 'export_file' not in st.session_state:
+    st.session_state.export_file = None
+
+# Start the shared job scheduler now so Prophet loads while the user picks a product
+get_job_scheduler()
+
+
+@st.fragment(run_every=0.5)
+def show_forecast_job_progress():
+    """Poll the background forecast job; rerun the whole app once it finishes."""
+    job = get_job_scheduler().get(st.session_state.forecast_job_id)
+    if job is None:
+        st.session_state.forecast_job_id = None
+        st.rerun()
+    
+    if not job.finished:
+        st.progress(job.progress, text=f"Forecasting {job.sku_id}: {job.stage}...")
+        return
+    
+    st.session_state.forecast_job_id = None
+    if job.status == FAILED:
+        st.session_state.forecast_error = job.error
+    else:
+        model, forecast_df, total_forecast_7_days = job.result
+        
+        # Store in session state
+        st.session_state.forecast_data = forecast_df
+        st.session_state.base_forecast_7_days = total_forecast_7_days
+        st.session_state.forecast_sku = job.sku_id
+        st.session_state.forecast_version = job.version
+        st.session_state.forecast_error = None
+    st.rerun()
+
 
 # Sidebar
 with st.sidebar:
@@ -121,7 +171,7 @@ with st.sidebar:
     
     # Load product list
     try:
-        product_dict = get_product_list()
+        product_dict = cached_product_list()
         product_names = list(product_dict.keys())
         
         # Product selection dropdown
@@ -146,6 +196,18 @@ with st.sidebar:
             </div>
         """, unsafe_allow_html=True)
         
+        # Inventory snapshot used by every simulation, latest first
+        st.markdown("**Inventory Snapshot**")
+        snapshot_dates = get_data_store().snapshot_dates()[::-1]
+        snapshot_date = st.selectbox(
+            "Inventory snapshot",
+            options=snapshot_dates,
+            index=0,
+            format_func=lambda date_id: f"{date_id // 10000}-{date_id // 100 % 100:02d}-{date_id % 100:02d}",
+            help="Stock levels and remaining shelf life are taken from this snapshot",
+            label_visibility="collapsed"
+        )
+        
         # Forecast button
         generate_forecast_btn = st.button(
             "Generate Forecast",
@@ -170,6 +232,7 @@ with st.sidebar:
     except Exception as e:
         st.error(f"Error loading product list: {str(e)}")
         generate_forecast_btn = False
+        snapshot_date = None
 
 # Main content area
 col1, col2 = st.columns([2, 1], gap="large")
@@ -179,25 +242,25 @@ with col1:
     st.markdown('<div class="section-header">Demand Forecast</div>', unsafe_allow_html=True)
     
     if generate_forecast_btn:
-        with st.spinner("Generating forecast..."):
-            try:
-                # Call get_forecast
-                model, forecast_df, total_forecast_7_days = get_forecast(selected_sku)
-                
-                # Store in session state
-                st.session_state.forecast_data = forecast_df
-                st.session_state.base_forecast_7_days = total_forecast_7_days
-                
-                st.success("Forecast generated successfully!")
-                
-            except Exception as e:
-                st.error(f"Error generating forecast: {str(e)}")
+        # Queue the forecast in the background; identical in-flight requests share one job
+        st.session_state.forecast_job_id = get_job_scheduler().submit(selected_sku).job_id
+    
+    if st.session_state.forecast_job_id is not None:
+        show_forecast_job_progress()
+    elif st.session_state.forecast_error:
+        st.error(f"Error generating forecast: {st.session_state.forecast_error}")
     
     # Display forecast if available
     if st.session_state.forecast_data is not None:
         forecast_df = st.session_state.forecast_data
         total_forecast = st.session_state.base_forecast_7_days
         
+        # The forecast may belong to a product other than the current selection
+        forecast_product_name = next(
+            (name for name, sku in product_dict.items() if sku == st.session_state.forecast_sku),
+            st.session_state.forecast_sku
+        )
+        
         # Show total forecasted demand in a styled card
         st.markdown(f"""
             <div style='background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
@@ -211,83 +274,23 @@ with col1:
             </div>
         """, unsafe_allow_html=True)
         
-        # Create interactive Plotly chart
-        fig = go.Figure()
-        
-        # Add yhat (forecast line)
-        fig.add_trace(go.Scatter(
-            x=forecast_df['ds'],
-            y=forecast_df['yhat'],
-            mode='lines',
-            name='Forecast (yhat)',
-            line=dict(color='#1f77b4', width=2),
-            hovertemplate='<b>Date:</b> %{x}<br><b>Forecast:</b> %{y:.2f} kg<extra></extra>'
-        ))
-        
-        # Add confidence interval (upper bound)
-        fig.add_trace(go.Scatter(
-            x=forecast_df['ds'],
-            y=forecast_df['yhat_upper'],
-            mode='lines',
-            name='Upper Bound',
-            line=dict(color='rgba(31, 119, 180, 0.3)', width=0),
-            showlegend=True,
-            hovertemplate='<b>Upper:</b> %{y:.2f} kg<extra></extra>'
-        ))
-        
-        # Add confidence interval (lower bound) with fill
-        fig.add_trace(go.Scatter(
-            x=forecast_df['ds'],
-            y=forecast_df['yhat_lower'],
-            mode='lines',
-            name='Lower Bound',
-            line=dict(color='rgba(31, 119, 180, 0.3)', width=0),
-            fillcolor='rgba(31, 119, 180, 0.2)',
-            fill='tonexty',
-            showlegend=True,
-            hovertemplate='<b>Lower:</b> %{y:.2f} kg<extra></extra>'
-        ))
-        
-        # Update layout
-        fig.update_layout(
-            title=dict(
-                text=f"Demand Forecast: {selected_product_name}",
-                font=dict(size=18, family="Arial, sans-serif", color="#2c3e50")
-            ),
-            xaxis_title="Date",
-            yaxis_title="Quantity (kg)",
-            hovermode='x unified',
-            template='plotly_white',
-            height=500,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1,
-                bgcolor="rgba(255,255,255,0.8)",
-                bordercolor="#e0e0e0",
-                borderwidth=1
-            ),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
+        # Interactive Plotly chart, memoized per (SKU, forecast version)
+        fig = forecast_figure(
+            st.session_state.forecast_sku,
+            st.session_state.forecast_version,
+            f"Demand Forecast: {forecast_product_name}",
+            forecast_df
         )
         
-        # Add gridlines
-        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.1)')
-        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.1)')
-        
         st.plotly_chart(fig, use_container_width=True)
         
         # Show forecast table for next 7 days
         with st.expander("View Detailed Forecast Table (Next 7 Days)"):
-            next_7_days = forecast_df.tail(7)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
-            next_7_days.columns = ['Date', 'Forecast (kg)', 'Lower Bound (kg)', 'Upper Bound (kg)']
-            next_7_days['Date'] = pd.to_datetime(next_7_days['Date']).dt.strftime('%Y-%m-%d')
-            
-            # Format numeric columns
-            for col in ['Forecast (kg)', 'Lower Bound (kg)', 'Upper Bound (kg)']:
-                next_7_days[col] = next_7_days[col].apply(lambda x: f"{x:.2f}")
+            next_7_days = forecast_table(
+                st.session_state.forecast_sku,
+                st.session_state.forecast_version,
+                forecast_df
+            )
             
             st.dataframe(
                 next_7_days, 
@@ -295,9 +298,9 @@ with col1:
                 hide_index=True,
                 column_config={
                     "Date": st.column_config.TextColumn("Date", width="medium"),
-                    "Forecast (kg)": st.column_config.TextColumn("Forecast (kg)", width="medium"),
-                    "Lower Bound (kg)": st.column_config.TextColumn("Lower Bound (kg)", width="medium"),
-                    "Upper Bound (kg)": st.column_config.TextColumn("Upper Bound (kg)", width="medium"),
+                    "Forecast (kg)": st.column_config.NumberColumn("Forecast (kg)", width="medium", format="%.2f"),
+                    "Lower Bound (kg)": st.column_config.NumberColumn("Lower Bound (kg)", width="medium", format="%.2f"),
+                    "Upper Bound (kg)": st.column_config.NumberColumn("Upper Bound (kg)", width="medium", format="%.2f"),
                 }
             )
     
@@ -338,15 +341,18 @@ with col2:
         if run_simulation_btn:
             with st.spinner("Running simulation..."):
                 try:
-                    # Call run_waste_simulation
+                    # Call run_waste_simulation; the daily forecast path drives the shelf-life simulation
                     simulation_results = run_waste_simulation(
-                        sku_id=st.session_state.selected_sku,
+                        sku_id=st.session_state.forecast_sku,
                         base_forecast_days=st.session_state.base_forecast_7_days,
-                        discount_percentage=discount_decimal
+                        discount_percentage=discount_decimal,
+                        forecast_df=st.session_state.forecast_data,
+                        date_id=snapshot_date
                     )
                     
                     st.markdown("---")
                     st.markdown("###  Simulation Results")
+                    st.caption(f"Inventory snapshot {simulation_results['snapshot_date']}")
                     
                     # Display metrics in a nice layout
                     st.metric(
@@ -425,11 +431,137 @@ with col2:
                     else:
                         st.info(" No change in revenue")
                     
+                    # Monte Carlo risk bands: demand paths drawn from the forecast interval
+                    with st.expander("Waste Risk (Monte Carlo)"):
+                        risk = run_waste_risk(
+                            st.session_state.forecast_sku,
+                            st.session_state.forecast_data,
+                            discounts=np.arange(0, 81, 5) / 100.0,
+                            seed=0,
+                            date_id=snapshot_date
+                        )
+                        st.caption(f"P10 / P50 / P90 over {DEFAULT_PATHS:,} simulated 7-day demand paths")
+                        st.dataframe(
+                            risk[['discount', 'promo_waste_p10', 'promo_waste_p50', 'promo_waste_p90',
+                                  'promo_revenue_p10', 'promo_revenue_p50', 'promo_revenue_p90']],
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "discount": st.column_config.NumberColumn("Discount", format="percent"),
+                                "promo_waste_p10": st.column_config.NumberColumn("Waste P10 (kg)", format="%.2f"),
+                                "promo_waste_p50": st.column_config.NumberColumn("Waste P50 (kg)", format="%.2f"),
+                                "promo_waste_p90": st.column_config.NumberColumn("Waste P90 (kg)", format="%.2f"),
+                                "promo_revenue_p10": st.column_config.NumberColumn("Revenue P10 (VND)", format="%.0f"),
+                                "promo_revenue_p50": st.column_config.NumberColumn("Revenue P50 (VND)", format="%.0f"),
+                                "promo_revenue_p90": st.column_config.NumberColumn("Revenue P90 (VND)", format="%.0f"),
+                            }
+                        )
+                    
+                    # Store-level breakdown: product forecast allocated to every store
+                    with st.expander("Store-Level Breakdown"):
+                        store_results = run_store_simulation(
+                            {st.session_state.forecast_sku: st.session_state.base_forecast_7_days},
+                            discount_percentage=discount_decimal,
+                            date_id=snapshot_date,
+                            daily_forecasts=pd.DataFrame({
+                                st.session_state.forecast_sku: st.session_state.forecast_data['yhat'].tail(7).to_numpy()
+                            })
+                        ).xs(st.session_state.forecast_sku, level='sku')
+                        
+                        st.dataframe(
+                            store_results[['allocated_forecast_kg', 'current_stock', 'base_waste_kg', 'promo_waste_kg', 'promo_revenue']],
+                            use_container_width=True,
+                            column_config={
+                                "allocated_forecast_kg": st.column_config.NumberColumn("Forecast (kg)", format="%.2f"),
+                                "current_stock": st.column_config.NumberColumn("Stock (kg)", format="%.2f"),
+                                "base_waste_kg": st.column_config.NumberColumn("Base Waste (kg)", format="%.2f"),
+                                "promo_waste_kg": st.column_config.NumberColumn("Promo Waste (kg)", format="%.2f"),
+                                "promo_revenue": st.column_config.NumberColumn("Promo Revenue (VND)", format="%.0f"),
+                            }
+                        )
+                    
                 except Exception as e:
                     st.error(f"Error running simulation: {str(e)}")
     else:
         st.info(" Generate a forecast first to run simulations")
 
+# Catalog export: written chunk by chunk to a temporary file, then offered for download
+with st.sidebar:
+    with st.expander("Export Results"):
+        export_kind = st.selectbox("Export", options=EXPORT_KINDS, key='export_kind')
+        export_format = st.radio("Format", options=['parquet', 'csv'], horizontal=True, key='export_format')
+        export_discount = st.slider(
+            "Discount",
+            min_value=0,
+            max_value=80,
+            value=15,
+            step=5,
+            format="%d%%",
+            key='export_discount',
+            disabled=export_kind != 'simulations'
+        )
+        
+        if st.button("Prepare Export", use_container_width=True):
+            with st.spinner(f"Exporting {export_kind}..."):
+                path = None
+                try:
+                    # Replace this session's previous export file
+                    if st.session_state.export_file is not None:
+                        old_path = st.session_state.export_file[0]
+                        if os.path.exists(old_path):
+                            os.remove(old_path)
+                    fd, path = tempfile.mkstemp(prefix=f"{export_kind}-", suffix=f".{export_format}")
+                    os.close(fd)
+                    result = write_batches(
+                        export_batches(export_kind, discounts=[export_discount / 100.0], date_id=snapshot_date),
+                        path
+                    )
+                    st.session_state.export_file = (path, export_kind, export_format, result['rows'])
+                except Exception as e:
+                    st.session_state.export_file = None
+                    if path is not None and os.path.exists(path):
+                        os.remove(path)
+                    st.error(f"Error exporting {export_kind}: {str(e)}")
+        
+        if st.session_state.export_file is not None and os.path.exists(st.session_state.export_file[0]):
+            path, kind, fmt, rows = st.session_state.export_file
+            # Streamlit buffers the finished file for the download; stream large exports from /export in service.py
+            with open(path, 'rb') as export_file:
+                st.download_button(
+                    f"Download {kind}.{fmt} ({rows:,} rows)",
+                    data=export_file,
+                    file_name=f"{kind}.{fmt}",
+                    mime='text/csv' if fmt == 'csv' else 'application/octet-stream',
+                    use_container_width=True
+                )
+
+# Debug panel (FORECAST_DEBUG=1 or ?debug=1): where the last engine request spent its time
+if os.environ.get('FORECAST_DEBUG') == '1' or st.query_params.get('debug') == '1':
+    with st.sidebar:
+        with st.expander("Debug: Last Request", expanded=True):
+            trace = last_request()
+            if trace is None:
+                st.caption("No engine requests recorded yet")
+            else:
+                st.markdown(f"**{trace['name']}** {trace['labels']} — {trace['duration_ms']:.1f} ms ({trace['status']})")
+                st.dataframe(
+                    stage_breakdown(trace),
+                    use_container_width=True,
+                    column_config={
+                        "stage": "Stage",
+                        "calls": st.column_config.NumberColumn("Calls"),
+                        "duration_ms": st.column_config.NumberColumn("Time (ms)", format="%.1f"),
+                    }
+                )
+                if trace['counters']:
+                    st.json(trace['counters'])
+                if 'peak_memory_mb' in trace:
+                    st.caption(f"Peak traced memory: {trace['peak_memory_mb']:.1f} MB")
+                if 'profile' in trace:
+                    st.code(trace['profile'], language=None)
+            st.caption("Process counters")
+            st.json(snapshot()['counters'])
+
 # Footer
 st.markdown("<br><br>", unsafe_allow_html=True)
 st.markdown("---")
@@ -0,0 +1,345 @@
+"""
+Rolling-origin backtesting of the forecast engines.
+
+For each cutoff, every SKU is fitted on its history up to the cutoff and
+scored on the following `horizon` days. Cutoffs step back from the end of the
+history by `period` days. Prophet folds run on the pre-warmed worker pool, one
+task per SKU (folds warm-start from the previous cutoff's fit), and each
+fold's predictions are cached in their own store (get_backtest_cache), apart
+from the live forecasts, so re-running after new sales only fits the new
+folds. Fourier folds fit every SKU at once per cutoff.
+
+Usage:
+    python backtest.py --cutoffs 8 --horizon 7
+    python backtest.py --engine fourier --output sku_metrics.csv --category-output category_metrics.csv
+    python backtest.py --params '{"yearly_seasonality": false}'
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+import pandas as pd
+
+from analysis_engine import ENGINE_PARAMS, validate_engine
+from batch_forecast import _resolve_skus, write_table
+from data_store import get_data_store, sales_fingerprint
+from fast_forecast import (
+    _to_datetimes,
+    fit_fourier,
+    forecast_errors,
+    predict_fourier,
+    sales_matrix,
+)
+from forecast_cache import get_backtest_cache, make_cache_key
+from worker_pool import WarmWorkerPool, get_worker_pool, quiet_fit_logs
+
+DEFAULT_CUTOFFS = 4
+DEFAULT_HORIZON = 7
+DEFAULT_PERIOD = 7
+
+FOLD_COLUMNS = ['sku', 'cutoff', 'ds', 'y', 'yhat', 'yhat_lower', 'yhat_upper']
+FAILURE_COLUMNS = ['sku', 'cutoff', 'error']
+
+
+def make_cutoffs(last_day, n_cutoffs=DEFAULT_CUTOFFS, horizon=DEFAULT_HORIZON, period=DEFAULT_PERIOD):
+    """
+    Place rolling-origin cutoffs so the latest fold ends on the last observed day.
+
+    Args:
+        last_day (int): Last observed day number
+        n_cutoffs (int): Number of folds
+        horizon (int): Days scored after each cutoff
+        period (int): Days between consecutive cutoffs
+
+    Returns:
+        np.ndarray: Cutoff day numbers, oldest first
+    """
+    return last_day - horizon - period * np.arange(n_cutoffs)[::-1]
+
+
+def _fit_prophet_folds(params, history_days, history_y, cutoffs, horizon):
+    """
+    Fit one SKU at several cutoffs. Runs inside a worker process.
+
+    Each fold after the first warm-starts from the previous fold's parameters.
+    A fold whose cold retry also fails is skipped; later folds keep going.
+
+    Returns:
+        tuple: (folds, failures)
+            - folds: {cutoff: forecast DataFrame for the horizon days}, failed folds omitted
+            - failures: {cutoff: error message} for the folds that could not be fitted
+    """
+    from analysis_engine import load_prophet
+    from model_registry import warm_start_params
+
+    Prophet = load_prophet()
+    folds = {}
+    failures = {}
+    init = None
+    for cutoff in sorted(cutoffs):
+        train = history_days <= cutoff
+        if train.sum() < 2:
+            continue
+        model = Prophet(**params)
+        train_df = pd.DataFrame({'ds': _to_datetimes(history_days[train]), 'y': history_y[train]})
+        try:
+            if init is None:
+                model.fit(train_df)
+            else:
+                model.fit(train_df, init=init)
+        except Exception:
+            # Warm start can fail when the new history shifts the optimum a lot; retry cold
+            model = Prophet(**params)
+            try:
+                model.fit(train_df)
+            except Exception as e:
+                failures[int(cutoff)] = f"{type(e).__name__}: {e}"
+                continue
+        init = warm_start_params(model)
+        future = pd.DataFrame({'ds': _to_datetimes(cutoff + np.arange(1, horizon + 1))})
+        folds[int(cutoff)] = model.predict(future)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    return folds, failures
+
+
+def _prophet_folds(sku_ids, days, values, cutoffs, horizon, params, max_workers):
+    """
+    Fold forecasts for every SKU, served from the backtest fold cache where possible.
+
+    Returns:
+        tuple: ({(sku, cutoff): forecast}, folds fitted, [(sku, cutoff, error)] for failed folds)
+    """
+    cache = get_backtest_cache()
+    fold_params = {**params, 'backtest_horizon': horizon}
+    forecasts = {}
+    tasks = {}
+    for i, sku_id in enumerate(sku_ids):
+        observed = ~np.isnan(values[i])
+        history_days, history_y = days[observed], values[i, observed]
+        missing = []
+        for cutoff in cutoffs:
+            train = history_days <= cutoff
+            fingerprint = sales_fingerprint(pd.DataFrame({
+                'datetime_id': history_days[train].astype('int32'),
+                'qty_sold_kg': history_y[train].astype('float32'),
+            }))
+            key = make_cache_key(sku_id, horizon, {**fold_params, 'cutoff': int(cutoff)}, fingerprint)
+            cached = cache.get(key)
+            if cached is not None:
+                forecasts[(sku_id, int(cutoff))] = cached[0]
+            else:
+                missing.append((int(cutoff), key))
+        if missing:
+            tasks[sku_id] = (history_days, history_y, missing)
+
+    failures = []
+
+    def store(sku_id, folds, fold_failures):
+        for cutoff, key in tasks[sku_id][2]:
+            if cutoff in folds:
+                forecasts[(sku_id, cutoff)] = folds[cutoff]
+                cache.put(key, sku_id, horizon, folds[cutoff], folds[cutoff]['yhat'].sum())
+            elif cutoff in fold_failures:
+                failures.append((sku_id, cutoff, fold_failures[cutoff]))
+
+    def store_error(sku_id, exc):
+        # The whole task failed (e.g. a worker died): every fold it owned is reported
+        for cutoff, _ in tasks[sku_id][2]:
+            failures.append((sku_id, cutoff, f"{type(exc).__name__}: {exc}"))
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1:
+        quiet_fit_logs()
+        for sku_id, (history_days, history_y, missing) in tasks.items():
+            try:
+                store(sku_id, *_fit_prophet_folds(params, history_days, history_y, [c for c, _ in missing], horizon))
+            except Exception as e:
+                store_error(sku_id, e)
+    elif tasks:
+        shared = max_workers is None
+        pool = get_worker_pool() if shared else WarmWorkerPool(workers)
+        try:
+            futures = {
+                pool.submit(_fit_prophet_folds, params, history_days, history_y, [c for c, _ in missing], horizon): sku_id
+                for sku_id, (history_days, history_y, missing) in tasks.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    store(futures[future], *future.result())
+                except Exception as e:
+                    store_error(futures[future], e)
+        finally:
+            if not shared:
+                pool.shutdown()
+
+    attempted = sum(len(missing) for _, _, missing in tasks.values())
+    return forecasts, attempted - len(failures), failures
+
+
+def _fourier_folds(sku_ids, days, values, cutoffs, horizon, params):
+    """Fold forecasts for every SKU: one vectorized fit per cutoff (never fails per fold)."""
+    forecasts = {}
+    for cutoff in cutoffs:
+        fit = fit_fourier(days, np.where(days[None, :] <= cutoff, values, np.nan), params)
+        future_days = cutoff + np.arange(1, horizon + 1)
+        yhat, lower, upper = predict_fourier(fit, future_days)
+        ds = _to_datetimes(future_days)
+        for i, sku_id in enumerate(sku_ids):
+            if fit['observed'][i].sum() < 2:
+                continue
+            forecasts[(sku_id, int(cutoff))] = pd.DataFrame({
+                'ds': ds, 'yhat': yhat[i], 'yhat_lower': lower[i], 'yhat_upper': upper[i],
+            })
+    return forecasts, len(cutoffs) * len(sku_ids), []
+
+
+def summarize_folds(folds, by):
+    """
+    Aggregate fold rows into MAPE/WAPE/bias per group.
+
+    Args:
+        folds (pd.DataFrame): Fold rows from run_backtest()
+        by (list[str]): Grouping columns, e.g. ['sku'] or ['category']
+
+    Returns:
+        pd.DataFrame: One row per group with points, mape, wape and bias
+    """
+    rows = []
+    for key, group in folds.groupby(by, sort=True, observed=True):
+        key = key if isinstance(key, tuple) else (key,)
+        rows.append({
+            **dict(zip(by, key)),
+            'points': len(group),
+            **forecast_errors(group['y'].to_numpy(), group['yhat'].to_numpy()),
+        })
+    return pd.DataFrame(rows, columns=list(by) + ['points', 'mape', 'wape', 'bias'])
+
+
+def run_backtest(skus='all', engine='prophet', n_cutoffs=DEFAULT_CUTOFFS, horizon=DEFAULT_HORIZON,
+                 period=DEFAULT_PERIOD, params=None, max_workers=None):
+    """
+    Rolling-origin cross-validation for many SKUs.
+
+    Args:
+        skus (list[str] or str): SKUs to backtest, or 'all' for the whole inventory
+        engine (str): 'prophet' (default) or 'fourier'
+        n_cutoffs (int): Number of folds per SKU
+        horizon (int): Days scored after each cutoff
+        period (int): Days between consecutive cutoffs
+        params (dict): Engine settings overriding the defaults, e.g. {'yearly_seasonality': False}
+        max_workers (int): Prophet worker processes (default: the shared warm pool); 1 runs inline
+
+    Returns:
+        dict: Backtest results with keys:
+            - folds: One row per scored day (sku, product_name, category, subcategory,
+              cutoff, ds, y, yhat, yhat_lower, yhat_upper)
+            - by_sku: MAPE/WAPE/bias per SKU
+            - by_category: MAPE/WAPE/bias per category
+            - overall: MAPE/WAPE/bias over every scored day
+            - fits: Folds fitted in this run (the rest came from the cache)
+            - failures: One row per fold that could not be fitted (sku, cutoff, error);
+              those folds are left out of every metric
+            - seconds: Wall time
+
+    Raises:
+        ValueError: If the engine is unknown
+    """
+    params = {**validate_engine(engine), **(params or {})}
+
+    start = time.perf_counter()
+    store = get_data_store()
+    sku_ids = _resolve_skus(skus, store)
+    days, values = sales_matrix(sku_ids)
+    observed = ~np.isnan(values)
+    cutoffs = make_cutoffs(days[observed.any(axis=0)].max(), n_cutoffs, horizon, period)
+
+    if engine == 'fourier':
+        forecasts, fits, failures = _fourier_folds(sku_ids, days, values, cutoffs, horizon, params)
+    else:
+        forecasts, fits, failures = _prophet_folds(sku_ids, days, values, cutoffs, horizon, params, max_workers)
+
+    # Score each fold on the days that actually have sales rows (days is a contiguous daily grid)
+    rows = {sku_id: row for row, sku_id in enumerate(sku_ids)}
+    frames = []
+    for (sku_id, cutoff), forecast in forecasts.items():
+        columns = cutoff + np.arange(1, horizon + 1) - days[0]
+        in_grid = columns < len(days)
+        actual = np.full(horizon, np.nan)
+        actual[in_grid] = values[rows[sku_id], columns[in_grid]]
+        fold = forecast.assign(sku=sku_id, cutoff=_to_datetimes([cutoff])[0], y=actual)
+        frames.append(fold[~np.isnan(actual)])
+
+    folds = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FOLD_COLUMNS)
+    folds = folds[FOLD_COLUMNS]
+
+    # Attach product metadata for the category roll-up
+    metadata = pd.DataFrame([
+        {key: str(store.inventory_rows(sku_id)[key].iloc[0]) for key in ('product_name', 'category', 'subcategory')}
+        | {'sku': sku_id}
+        for sku_id in sku_ids
+    ])
+    folds = folds.merge(metadata, on='sku', how='left')
+    folds = folds[['sku', 'product_name', 'category', 'subcategory'] + FOLD_COLUMNS[1:]]
+    folds = folds.sort_values(['sku', 'cutoff', 'ds'], kind='stable').reset_index(drop=True)
+
+    by_sku = summarize_folds(folds, ['sku']).merge(metadata, on='sku', how='left')
+    by_sku = by_sku[['sku', 'product_name', 'category', 'subcategory', 'points', 'mape', 'wape', 'bias']]
+    return {
+        'folds': folds,
+        'by_sku': by_sku,
+        'by_category': summarize_folds(folds, ['category']),
+        'overall': forecast_errors(folds['y'].to_numpy(), folds['yhat'].to_numpy()),
+        'fits': fits,
+        'failures': pd.DataFrame(
+            [(sku_id, _to_datetimes([cutoff])[0], error) for sku_id, cutoff, error in failures],
+            columns=FAILURE_COLUMNS,
+        ),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the forecast engines.")
+    parser.add_argument('skus', nargs='*', default=['all'], help="SKUs to backtest, or 'all' (default)")
+    parser.add_argument('--engine', choices=list(ENGINE_PARAMS), default='prophet', help="Forecasting engine")
+    parser.add_argument('--cutoffs', type=int, default=DEFAULT_CUTOFFS, help=f"Folds per SKU (default: {DEFAULT_CUTOFFS})")
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help=f"Days scored per fold (default: {DEFAULT_HORIZON})")
+    parser.add_argument('--period', type=int, default=DEFAULT_PERIOD, help=f"Days between cutoffs (default: {DEFAULT_PERIOD})")
+    parser.add_argument('--params', default=None, help="JSON object overriding engine settings")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--output', default=None, help="Per-SKU metrics (.csv or .parquet)")
+    parser.add_argument('--category-output', default=None, help="Per-category metrics (.csv or .parquet)")
+    parser.add_argument('--folds-output', default=None, help="Scored fold rows (.csv or .parquet)")
+    args = parser.parse_args(argv)
+
+    try:
+        params = json.loads(args.params) if args.params else None
+        result = run_backtest(args.skus or 'all', args.engine, args.cutoffs, args.horizon, args.period,
+                              params, args.workers)
+    except (ValueError, json.JSONDecodeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    for path, table in ((args.output, result['by_sku']), (args.category_output, result['by_category']),
+                        (args.folds_output, result['folds'])):
+        if path:
+            write_table(table, path)
+
+    overall = result['overall']
+    print(f"Backtested {len(result['by_sku'])} SKUs x {args.cutoffs} cutoffs in {result['seconds']:.1f}s "
+          f"({result['fits']} folds fitted, the rest cached)")
+    print(f"Overall: MAPE {overall['mape']:.3f}  WAPE {overall['wape']:.3f}  bias {overall['bias']:+.3f}")
+    print(result['by_category'].to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    failures = result['failures']
+    if len(failures):
+        print(f"{len(failures)} folds failed and were left out:", file=sys.stderr)
+        for _, row in failures.iterrows():
+            print(f"  {row['sku']} @ {row['cutoff']:%Y-%m-%d}: {row['error']}", file=sys.stderr)
+    return 1 if len(failures) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Batch forecasting: fit one Prophet model per SKU across a process pool,
+or every SKU at once with the vectorized Fourier engine.
+
+Usage:
+    python batch_forecast.py all --workers 8 --output forecasts.csv
+    python batch_forecast.py VEG0001 VEG0002 --days 14
+    python batch_forecast.py all --engine fourier
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+import pandas as pd
+
+from analysis_engine import build_prophet_frame, fit_forecast, validate_engine
+from data_store import get_data_store
+from fast_forecast import forecast_table as fourier_forecast_table
+from worker_pool import WarmWorkerPool, get_worker_pool, quiet_fit_logs
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+def _fit_sku(sku_id, prophet_df, forecast_days):
+    """
+    Fit and predict a single SKU. Runs inside a worker process.
+
+    Returns:
+        dict: Result with sku, status, seconds, total_forecast, forecast rows and error
+    """
+    start = time.perf_counter()
+    try:
+        _, forecast_df, total = fit_forecast(prophet_df, forecast_days)
+    except Exception as e:
+        return {
+            'sku': sku_id,
+            'status': 'failed',
+            'seconds': time.perf_counter() - start,
+            'total_forecast': None,
+            'forecast': None,
+            'error': f"{type(e).__name__}: {e}",
+        }
+
+    return {
+        'sku': sku_id,
+        'status': 'ok',
+        'seconds': time.perf_counter() - start,
+        'total_forecast': float(total),
+        'forecast': forecast_df.tail(forecast_days)[FORECAST_COLUMNS].reset_index(drop=True),
+        'error': None,
+    }
+
+
+def _resolve_skus(skus, store):
+    """Expand 'all' (or None) into every SKU in the inventory."""
+    if skus is None or skus == 'all' or list(skus) == ['all']:
+        return store.skus()
+    return list(skus)
+
+
+def _fit_fourier_batch(sku_ids, forecast_days):
+    """
+    Fit every SKU in one vectorized Fourier pass.
+
+    Returns:
+        list[dict]: One result per SKU, shaped like _fit_sku()'s; seconds is the
+            pass time split evenly across SKUs
+    """
+    start = time.perf_counter()
+    table = fourier_forecast_table(sku_ids, forecast_days)
+    seconds = (time.perf_counter() - start) / max(len(sku_ids), 1)
+
+    results = []
+    for sku_id, forecast in table.groupby('sku', sort=False):
+        forecast = forecast[FORECAST_COLUMNS].reset_index(drop=True)
+        results.append({
+            'sku': sku_id,
+            'status': 'ok',
+            'seconds': seconds,
+            'total_forecast': float(forecast['yhat'].sum()),
+            'forecast': forecast,
+            'error': None,
+        })
+    return results
+
+
+def run_batch_forecast(skus='all', forecast_days=7, max_workers=None, engine='prophet'):
+    """
+    Forecast many SKUs in parallel.
+
+    Sales history is split by product_id once by the data store. With the Prophet
+    engine each SKU's prepared history is shipped to a pre-warmed worker process for fitting;
+    the Fourier engine fits all SKUs at once in this process.
+
+    Args:
+        skus (list[str] or str): SKUs to forecast, or 'all' for the whole inventory
+        forecast_days (int): Number of days to forecast per SKU (default: 7)
+        max_workers (int): Worker processes (default: the shared warm pool from
+            worker_pool.get_worker_pool(), sized to os.cpu_count()); 1 runs inline
+        engine (str): 'prophet' (default) or 'fourier'
+
+    Returns:
+        tuple: (forecast_table, report)
+            - forecast_table: Consolidated DataFrame with sku, product_id, ds, yhat, yhat_lower, yhat_upper
+            - report: DataFrame with one row per SKU (sku, status, seconds, total_forecast, error)
+
+    Raises:
+        ValueError: If engine is unknown
+    """
+    validate_engine(engine)
+    store = get_data_store()
+    sku_list = _resolve_skus(skus, store)
+
+    # Prepare every SKU's history up front; unknown SKUs are reported, not raised
+    jobs = {}
+    results = []
+    for sku_id in sku_list:
+        try:
+            product_id = store.product_id(sku_id)
+        except ValueError as e:
+            results.append({'sku': sku_id, 'status': 'failed', 'seconds': 0.0,
+                            'total_forecast': None, 'forecast': None, 'error': str(e)})
+            continue
+        jobs[sku_id] = (product_id, build_prophet_frame(store.product_sales(product_id)) if engine == 'prophet' else None)
+
+    workers = max_workers or os.cpu_count() or 1
+    if engine == 'fourier':
+        if jobs:
+            results.extend(_fit_fourier_batch(list(jobs), forecast_days))
+    elif workers == 1:
+        quiet_fit_logs()
+        for sku_id, (_, prophet_df) in jobs.items():
+            results.append(_fit_sku(sku_id, prophet_df, forecast_days))
+    else:
+        # The shared pool's workers stay warm across calls; an explicit size gets its own pool
+        shared = max_workers is None
+        pool = get_worker_pool() if shared else WarmWorkerPool(workers)
+        try:
+            futures = [
+                pool.submit(_fit_sku, sku_id, prophet_df, forecast_days)
+                for sku_id, (_, prophet_df) in jobs.items()
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+        finally:
+            if not shared:
+                pool.shutdown()
+
+    # Consolidate successful forecasts into one table, in request order
+    order = {sku_id: position for position, sku_id in enumerate(sku_list)}
+    results.sort(key=lambda result: order.get(result['sku'], len(order)))
+
+    frames = []
+    for result in results:
+        if result['forecast'] is not None:
+            frame = result['forecast']
+            frame.insert(0, 'product_id', jobs[result['sku']][0])
+            frame.insert(0, 'sku', result['sku'])
+            frames.append(frame)
+
+    if frames:
+        forecast_table = pd.concat(frames, ignore_index=True)
+    else:
+        forecast_table = pd.DataFrame(columns=['sku', 'product_id'] + FORECAST_COLUMNS)
+
+    report = pd.DataFrame(
+        [{key: value for key, value in result.items() if key != 'forecast'} for result in results],
+        columns=['sku', 'status', 'seconds', 'total_forecast', 'error'],
+    )
+
+    return forecast_table, report
+
+
+def write_table(df, path):
+    """Write a DataFrame as Parquet or CSV depending on the file extension."""
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit forecasts for many SKUs in parallel.")
+    parser.add_argument('skus', nargs='*', default=['all'], help="SKUs to forecast, or 'all' (default)")
+    parser.add_argument('--days', type=int, default=7, help="Forecast horizon in days (default: 7)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--engine', choices=['prophet', 'fourier'], default='prophet',
+                        help="Forecasting engine (default: prophet)")
+    parser.add_argument('--output', default='batch_forecast.csv', help="Forecast table (.csv or .parquet)")
+    parser.add_argument('--report', default=None, help="Optional per-SKU timing report (.csv or .parquet)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    forecast_table, report = run_batch_forecast(args.skus or 'all', args.days, args.workers, args.engine)
+    elapsed = time.perf_counter() - start
+
+    write_table(forecast_table, args.output)
+    if args.report:
+        write_table(report, args.report)
+
+    failed = report[report['status'] != 'ok']
+    print(f"Forecasted {len(report) - len(failed)}/{len(report)} SKUs in {elapsed:.1f}s "
+          f"(fit time p50 {report['seconds'].median():.2f}s, max {report['seconds'].max():.2f}s)")
+    print(f"Forecast table written to {args.output}")
+    for _, row in failed.iterrows():
+        print(f"  FAILED {row['sku']}: {row['error']}", file=sys.stderr)
+
+    return 1 if len(failed) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,412 @@
+"""
+Benchmark suite for the forecasting and simulation hot paths.
+
+Generates synthetic daily_sales.csv / current_inventory.csv at a chosen scale,
+times each stage separately (cold and warm), and writes latency percentiles and
+peak memory to a JSON report that can be compared between runs.
+
+Usage:
+    python benchmark.py run --skus 78 --stores 92 --years 1 --output bench.json
+    python benchmark.py compare baseline.json bench.json --threshold 0.2
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import data_store
+from analysis_engine import (build_prophet_frame, fit_forecast, get_product_list, predict_with_model, run_waste_risk,
+                             run_waste_simulation)
+from fast_forecast import forecast_table as fourier_forecast_table
+from sales_binary import SalesBinary, write_sales_binary
+from simulation import run_promotion_grid, run_store_simulation
+
+CATEGORIES = [
+    ('VEG', 'Vegetable', 'Leafy Greens', 3),
+    ('MEAT', 'Meat', 'Pork', 4),
+    ('FISH', 'Seafood', 'Shrimp', 2),
+    ('DAIRY', 'Dairy', 'Milk', 7),
+    ('FRZ', 'Frozen Food', 'Dumplings', 180),
+    ('PAN', 'Pantry', 'Rice', 365),
+]
+
+SNAPSHOT_DATES = [20251230, 20251231]
+
+
+def generate_dataset(out_dir, n_skus=78, n_stores=92, years=1.0, seed=0):
+    """
+    Write synthetic inventory and sales CSVs with the production schema.
+
+    Args:
+        out_dir (str): Directory to write current_inventory.csv and daily_sales.csv into
+        n_skus (int): Number of products
+        n_stores (int): Number of stores
+        years (float): Years of daily sales history
+        seed (int): Random seed
+
+    Returns:
+        tuple: (inventory_path, sales_path)
+    """
+    rng = np.random.default_rng(seed)
+    product_ids = np.arange(1, n_skus + 1)
+    category_rows = [CATEGORIES[i % len(CATEGORIES)] for i in range(n_skus)]
+    skus = [f"{prefix}{pid:04d}" for pid, (prefix, _, _, _) in zip(product_ids, category_rows)]
+    list_price = rng.uniform(10000, 300000, n_skus).round()
+
+    # Inventory: every store x product on each snapshot date
+    n_rows = len(SNAPSHOT_DATES) * n_stores * n_skus
+    product_index = np.tile(np.arange(n_skus), len(SNAPSHOT_DATES) * n_stores)
+    inventory_df = pd.DataFrame({
+        'date_id': np.repeat(SNAPSHOT_DATES, n_stores * n_skus),
+        'store_id': np.tile(np.repeat(np.arange(1, n_stores + 1), n_skus), len(SNAPSHOT_DATES)),
+        'product_id': product_ids[product_index],
+        'stock_on_hand_kg': rng.gamma(2.0, 5.0, n_rows).round(2),
+        'stock_in_transit_kg': rng.gamma(1.0, 1.0, n_rows).round(2),
+        'stock_wasted_kg': rng.gamma(1.0, 1.5, n_rows).round(2),
+        'lead_time_days': rng.integers(1, 8, n_rows),
+        'sku': np.array(skus)[product_index],
+        'product_name': np.array([f"Product {pid}" for pid in product_ids])[product_index],
+        'category': np.array([row[1] for row in category_rows])[product_index],
+        'subcategory': np.array([row[2] for row in category_rows])[product_index],
+        'shelf_life_days': np.array([row[3] for row in category_rows])[product_index],
+        'supplier_id': rng.integers(1, 20, n_skus)[product_index],
+        'cost_price': (list_price * 0.8).round()[product_index],
+        'list_price': list_price[product_index],
+        'base_waste_rate': rng.uniform(0.01, 0.25, n_skus).round(2)[product_index],
+    })
+
+    # Sales: one row per product per day with weekly/yearly seasonality
+    dates = pd.date_range('2024-01-01', periods=max(int(years * 365), 14), freq='D')
+    day = np.arange(len(dates))
+    level = rng.uniform(20, 400, n_skus)
+    weekly = 1 + 0.15 * np.sin(2 * np.pi * day / 7)
+    yearly = 1 + 0.2 * np.sin(2 * np.pi * day / 365.25)
+    qty = level[None, :] * (weekly * yearly)[:, None] * rng.lognormal(0, 0.1, (len(dates), n_skus))
+    sales_df = pd.DataFrame({
+        'datetime_id': np.repeat(dates.strftime('%Y%m%d').astype(int), n_skus),
+        'product_id': np.tile(product_ids, len(dates)),
+        'qty_sold_kg': qty.ravel().round(2),
+    })
+
+    inventory_path = os.path.join(out_dir, 'current_inventory.csv')
+    sales_path = os.path.join(out_dir, 'daily_sales.csv')
+    inventory_df.to_csv(inventory_path, index=False)
+    sales_df.to_csv(sales_path, index=False)
+    return inventory_path, sales_path
+
+
+def _summarize(samples):
+    """Latency percentiles (milliseconds) for a list of durations in seconds."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'n': int(ms.size),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+def _peak_memory(fn):
+    """Peak Python heap allocation (MB) while fn runs once."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def measure(fn, repeats, setup=None, memory=True):
+    """
+    Time fn over several runs and measure its peak memory once.
+
+    Args:
+        fn (callable): Work to time; receives setup()'s result if setup is given
+        repeats (int): Timed runs
+        setup (callable): Untimed preparation before each run
+        memory (bool): Also measure peak memory (one extra, untimed run)
+
+    Returns:
+        dict: Latency percentiles plus peak_memory_mb
+    """
+    samples = []
+    for _ in range(repeats):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        fn(state) if setup else fn()
+        samples.append(time.perf_counter() - start)
+
+    stats = _summarize(samples)
+    if memory:
+        state = setup() if setup else None
+        stats['peak_memory_mb'] = _peak_memory(lambda: fn(state) if setup else fn())
+    return stats
+
+
+# Modules whose cold import time is reported: the engine alone, Prophet, and what app.py loads
+IMPORT_TARGETS = {
+    'import_engine': ['analysis_engine'],
+    'import_prophet': ['prophet'],
+    'import_dashboard': ['analysis_engine', 'forecast_jobs', 'rendering', 'simulation'],
+}
+
+_IMPORT_SCRIPT = """
+import importlib, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(time.perf_counter() - start)
+"""
+
+
+def measure_import(modules, repeats):
+    """
+    Time importing modules in fresh interpreters.
+
+    Args:
+        modules (list[str]): Modules imported in order
+        repeats (int): Interpreters started
+
+    Returns:
+        dict: Latency percentiles of the imports (interpreter startup excluded)
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', _IMPORT_SCRIPT, *modules],
+            cwd=repo_dir, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return _summarize(samples)
+
+
+def run_benchmarks(inventory_path, sales_path, repeats=5, fit_skus=3, seed=0):
+    """
+    Time every hot-path stage against one dataset.
+
+    Args:
+        inventory_path (str): Inventory CSV
+        sales_path (str): Sales CSV
+        repeats (int): Timed runs per cheap stage
+        fit_skus (int): SKUs used for the Prophet fit/predict stages
+        seed (int): Random seed for SKU sampling
+
+    Returns:
+        dict: {stage: {'cold': stats, 'warm': stats}} (some stages have only one mode)
+    """
+    work_dir = os.path.dirname(inventory_path)
+    no_store = os.path.join(work_dir, 'no_sales_store')
+    no_binary = os.path.join(work_dir, 'no_sales.bin')
+    fresh_store = lambda: data_store.DataStore(inventory_path, sales_path, no_store, no_binary)
+    results = {}
+
+    # Startup cost: Prophet is only imported on the first fit
+    for stage, modules in IMPORT_TARGETS.items():
+        results[stage] = {'cold': measure_import(modules, max(repeats // 2, 1))}
+
+    # CSV load: cold parses both files, warm only checks file signatures
+    results['csv_load'] = {
+        'cold': measure(lambda store: (store.inventory(), store.sales()), repeats, setup=fresh_store),
+    }
+    store = data_store.configure_data_store(inventory_path, sales_path, no_store, no_binary)
+    store.inventory()
+    store.sales()
+    results['csv_load']['warm'] = measure(lambda: (store.inventory(), store.sales()), repeats * 20)
+
+    results['product_list'] = {
+        'cold': measure(lambda s: s.product_list(), repeats, setup=fresh_store),
+        'warm': measure(get_product_list, repeats * 20),
+    }
+
+    # Per-SKU filtering: indexed lookup versus the old full-frame boolean mask
+    rng = random.Random(seed)
+    skus = store.skus()
+    sample_ids = [store.product_id(rng.choice(skus)) for _ in range(repeats * 20)]
+    sales_df = store.sales()
+    lookups = iter(sample_ids * 2)
+    results['sku_filter'] = {
+        'warm': measure(lambda: store.product_sales(next(lookups)), len(sample_ids), memory=False),
+    }
+    scans = iter(sample_ids * 2)
+    results['sku_filter_scan'] = {
+        'warm': measure(lambda: sales_df[sales_df['product_id'] == next(scans)], len(sample_ids), memory=False),
+    }
+
+    # Memory-mapped binary sales: cold opens the file, warm slices one product's rows
+    binary_path = os.path.join(work_dir, 'daily_sales.bin')
+    write_sales_binary(sales_df, binary_path)
+    results['binary_load'] = {
+        'cold': measure(lambda: SalesBinary(binary_path).get(sample_ids[0]), repeats),
+    }
+    binary = SalesBinary(binary_path)
+    binary_lookups = iter(sample_ids * 2)
+    results['sku_filter_binary'] = {
+        'warm': measure(lambda: binary.get(next(binary_lookups)), len(sample_ids), memory=False),
+    }
+
+    # Inventory point lookups: as-of search in the (sku, store, date) index versus a full-frame mask
+    inventory_df = store.inventory()
+    store_ids = inventory_df['store_id'].unique().tolist()
+    dates = store.snapshot_dates()
+    sample_rows = [(rng.choice(skus), rng.choice(store_ids), rng.choice(dates)) for _ in range(repeats * 20)]
+    row_lookups = iter(sample_rows * 2)
+    results['inventory_lookup'] = {
+        'warm': measure(lambda: store.inventory_row(*next(row_lookups)), len(sample_rows), memory=False),
+    }
+    row_scans = iter(sample_rows * 2)
+
+    def scan_inventory():
+        sku_id, store_id, date_id = next(row_scans)
+        return inventory_df[(inventory_df['sku'] == sku_id) & (inventory_df['store_id'] == store_id)
+                            & (inventory_df['date_id'] == date_id)]
+
+    results['inventory_lookup_scan'] = {'warm': measure(scan_inventory, len(sample_rows), memory=False)}
+
+    # Prophet fit and predict; the first fit in the process also imports Prophet and loads the Stan model
+    fit_frames = [build_prophet_frame(store.product_sales(store.product_id(sku))) for sku in skus[:fit_skus]]
+    fits = iter(fit_frames * 3)
+    results['prophet_fit'] = {'cold': measure(lambda: fit_forecast(next(fits)), 1, memory=False)}
+    results['prophet_fit']['warm'] = measure(lambda: fit_forecast(next(fits)), len(fit_frames), memory=False)
+
+    model, _, _ = fit_forecast(fit_frames[0])
+    results['predict'] = {'warm': measure(lambda: predict_with_model(model, 7), repeats)}
+
+    # Fast path: one vectorized Fourier fit across every SKU
+    results['fourier_fit_all'] = {'warm': measure(lambda: fourier_forecast_table(skus, 7), repeats)}
+
+    # Simulation: scalar per-SKU path, SKU x discount grid, and every store x SKU (total and daily)
+    forecasts = {sku: 100.0 for sku in skus}
+    results['simulation'] = {
+        'warm': measure(lambda: run_waste_simulation(skus[0], 100.0, 0.15), repeats * 20),
+    }
+    results['simulation_grid'] = {
+        'warm': measure(lambda: run_promotion_grid(forecasts, stock_multipliers=[1.0, 1.5, 2.0]), repeats),
+    }
+    results['store_simulation'] = {
+        'warm': measure(lambda: run_store_simulation(forecasts, 0.15), repeats),
+    }
+    daily = pd.DataFrame({sku: np.full(7, 100.0 / 7) for sku in skus})
+    risk_forecast = pd.DataFrame({'yhat': np.full(7, 15.0), 'yhat_lower': np.full(7, 10.0), 'yhat_upper': np.full(7, 20.0)})
+    results['waste_risk'] = {
+        'warm': measure(lambda: run_waste_risk(skus[0], risk_forecast, seed=0), repeats),
+    }
+    results['store_shelf_life_simulation'] = {
+        'warm': measure(lambda: run_store_simulation(forecasts, 0.15, daily_forecasts=daily), repeats),
+    }
+
+    return results
+
+
+def run(args):
+    logging.getLogger('cmdstanpy').disabled = True
+    logging.getLogger('prophet').setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory(prefix='forecast-bench-') as work_dir:
+        start = time.perf_counter()
+        inventory_path, sales_path = generate_dataset(work_dir, args.skus, args.stores, args.years, args.seed)
+        generate_seconds = time.perf_counter() - start
+
+        stages = run_benchmarks(inventory_path, sales_path, args.repeats, args.fit_skus, args.seed)
+        sizes = {
+            'inventory_bytes': os.path.getsize(inventory_path),
+            'sales_bytes': os.path.getsize(sales_path),
+        }
+
+    report = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'scale': {
+            'skus': args.skus,
+            'stores': args.stores,
+            'years': args.years,
+            'repeats': args.repeats,
+            'fit_skus': args.fit_skus,
+            'generate_seconds': generate_seconds,
+            **sizes,
+        },
+        'stages': stages,
+        'process': {
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2)
+
+    for stage, modes in stages.items():
+        for mode, stats in modes.items():
+            print(f"{stage:<18} {mode:<5} p50 {stats['p50_ms']:10.3f} ms  p99 {stats['p99_ms']:10.3f} ms")
+    print(f"Report written to {args.output}")
+    return 0
+
+
+def compare(args):
+    """Print p50 changes between two reports; exit non-zero on regressions."""
+    with open(args.baseline, encoding='utf-8') as handle:
+        baseline = json.load(handle)['stages']
+    with open(args.candidate, encoding='utf-8') as handle:
+        candidate = json.load(handle)['stages']
+
+    regressions = 0
+    for stage, modes in candidate.items():
+        for mode, stats in modes.items():
+            before = baseline.get(stage, {}).get(mode)
+            if before is None:
+                print(f"{stage:<18} {mode:<5} (new)")
+                continue
+            change = stats['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] > 0 else 0.0
+            flag = ''
+            if change > args.threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"{stage:<18} {mode:<5} p50 {before['p50_ms']:10.3f} -> {stats['p50_ms']:10.3f} ms "
+                  f"({change:+.1%}){flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the forecasting and simulation hot paths.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Generate a dataset and time every stage")
+    run_parser.add_argument('--skus', type=int, default=78, help="Products (default: 78)")
+    run_parser.add_argument('--stores', type=int, default=92, help="Stores (default: 92)")
+    run_parser.add_argument('--years', type=float, default=1.0, help="Years of daily history (default: 1)")
+    run_parser.add_argument('--repeats', type=int, default=5, help="Timed runs per stage (default: 5)")
+    run_parser.add_argument('--fit-skus', type=int, default=3, help="SKUs for fit/predict stages (default: 3)")
+    run_parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    run_parser.add_argument('--output', default='bench_output.json', help="JSON report path")
+
+    compare_parser = subparsers.add_parser('compare', help="Compare two JSON reports")
+    compare_parser.add_argument('baseline', help="Earlier report")
+    compare_parser.add_argument('candidate', help="Newer report")
+    compare_parser.add_argument('--threshold', type=float, default=0.2,
+                                help="Relative p50 slowdown flagged as a regression (default: 0.2)")
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,653 @@
+"""
+Shared in-memory data access layer for the inventory and sales data.
+
+Both tables are parsed once with compact dtypes and kept in memory together
+with per-SKU and per-product indexes. Every access checks the source file's
+modification time and size; the file is only re-parsed when that signature
+changes *and* its content hash differs from the loaded copy.
+
+Inventory rows are kept sorted by snapshot date and indexed by
+(sku, store_id, date_id) keys (see InventoryIndex), so a snapshot is a slice
+and a point or as-of lookup is a binary search rather than a mask over every
+snapshot.
+
+Sales are read from the partitioned Parquet sales store (see ingestion.py)
+once it has been built. Without a store, a memory-mapped daily_sales.bin (see
+sales_binary.py) is preferred over parsing daily_sales.csv, but only while the
+CSV is unchanged since the conversion; otherwise the CSV is served until the
+binary file is rebuilt.
+"""
+import glob
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import increment, span
+from sales_binary import SalesBinary, source_is_current
+
+INVENTORY_PATH = 'current_inventory.csv'
+SALES_PATH = 'daily_sales.csv'
+
+# Append-only sales store: <SALES_STORE_DIR>/month=YYYYMM/part-*.parquet plus a manifest
+SALES_STORE_DIR = 'sales_store'
+SALES_MANIFEST_NAME = '_manifest.json'
+
+# Memory-mapped sales history written by `python sales_binary.py convert`
+SALES_BINARY_PATH = 'daily_sales.bin'
+
+INVENTORY_DTYPES = {
+    'date_id': 'int32',
+    'store_id': 'int32',
+    'product_id': 'int32',
+    'stock_on_hand_kg': 'float32',
+    'stock_in_transit_kg': 'float32',
+    'stock_wasted_kg': 'float32',
+    'lead_time_days': 'int32',
+    'sku': 'category',
+    'product_name': 'category',
+    'category': 'category',
+    'subcategory': 'category',
+    'shelf_life_days': 'int32',
+    'supplier_id': 'int32',
+    'cost_price': 'float32',
+    'list_price': 'float32',
+    'base_waste_rate': 'float32',
+}
+
+SALES_DTYPES = {
+    'datetime_id': 'int32',
+    'product_id': 'int32',
+    'qty_sold_kg': 'float32',
+}
+
+_HASH_CHUNK_BYTES = 1 << 20
+
+# date_id is YYYYMMDD, so it fits below this in the low digits of a composite key
+_DATE_KEY_SPAN = 10 ** 8
+
+
+def _file_signature(path):
+    """Return a cheap (mtime_ns, size) signature for a file."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_digest(path):
+    """Return the SHA-1 hex digest of a file's content."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_sales_manifest(root=SALES_STORE_DIR):
+    """
+    Read the sales store manifest.
+
+    Args:
+        root (str): Sales store directory
+
+    Returns:
+        dict or None: Manifest with version, files and last_datetime_id per product,
+            or None if the store has not been built
+    """
+    path = os.path.join(root, SALES_MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def read_sales_store(root=SALES_STORE_DIR):
+    """
+    Load every partition of the sales store, oldest month first.
+
+    Args:
+        root (str): Sales store directory
+
+    Returns:
+        pd.DataFrame: Sales rows with SALES_DTYPES
+    """
+    manifest = read_sales_manifest(root)
+    files = manifest['files'] if manifest else sorted(glob.glob(os.path.join(root, 'month=*', '*.parquet')))
+    frames = [pd.read_parquet(os.path.join(root, name)) for name in files]
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in SALES_DTYPES.items()})
+    return pd.concat(frames, ignore_index=True).astype(SALES_DTYPES)
+
+
+class CachedTable:
+    """
+    A parsed source file plus the indexes built from it.
+
+    refresh() re-parses only when the file's (mtime, size) signature moves and
+    its content hash differs, so any module that serves lookups from a file on
+    disk (e.g. elasticity.ElasticityTable) can reuse it.
+
+    Args:
+        path (str): Path to the file whose signature and hash are tracked
+        load (callable): Called with no arguments, returns the parsed frame
+        build_index (callable): Called with the parsed frame, returns the index object
+    """
+
+    def __init__(self, path, load, build_index):
+        self.path = path
+        self.load = load
+        self.build_index = build_index
+        self.signature = None
+        self.digest = None
+        self.frame = None
+        self.index = None
+
+    def refresh(self):
+        """Reload the file if it changed on disk. Returns True if it was re-parsed."""
+        signature = _file_signature(self.path)
+        if signature == self.signature:
+            return False
+
+        # mtime/size moved: only pay for a re-parse if the content really changed
+        with span('data_hash'):
+            digest = _file_digest(self.path)
+        if digest == self.digest:
+            self.signature = signature
+            return False
+
+        with span('data_load'):
+            frame = self.load()
+            self.index = self.build_index(frame)
+        increment('data_reloads')
+        self.frame = frame
+        self.signature = signature
+        self.digest = digest
+        return True
+
+
+def _split_by(frame, column):
+    """Split a frame into {key: sub-frame} using a single groupby pass."""
+    return {
+        key: frame.iloc[positions].reset_index(drop=True)
+        for key, positions in frame.groupby(column, observed=True, sort=False).indices.items()
+    }
+
+
+def _load_inventory(path):
+    """Parse the inventory, stable-sorted by date_id so every snapshot is a contiguous run of rows."""
+    inventory_df = pd.read_csv(path, dtype=INVENTORY_DTYPES)
+    dates = inventory_df['date_id'].to_numpy()
+    if len(dates) and (dates[1:] < dates[:-1]).any():
+        inventory_df = inventory_df.sort_values('date_id', kind='stable').reset_index(drop=True)
+    return inventory_df
+
+
+class InventoryIndex:
+    """
+    Sorted-key index over the inventory's snapshots.
+
+    The frame is sorted by date_id, so a snapshot is found with two binary
+    searches over the date column. Every row's (sku, store_id, date_id) key is
+    also packed into one int64, sorted, so a point lookup - or an "as-of"
+    lookup of the latest row on or before a date - is one np.searchsorted.
+
+    Args:
+        inventory_df (pd.DataFrame): Inventory sorted by date_id (see _load_inventory)
+    """
+
+    def __init__(self, inventory_df):
+        self.dates = inventory_df['date_id'].to_numpy(dtype=np.int64)
+        self.snapshot_dates = np.unique(self.dates)
+
+        # Dense codes: SKUs from the categorical column, stores from the sorted distinct ids
+        sku_column = inventory_df['sku'].astype('category')
+        self.sku_codes = {str(sku): code for code, sku in enumerate(sku_column.cat.categories)}
+        self.store_ids, store_codes = np.unique(inventory_df['store_id'].to_numpy(dtype=np.int64),
+                                                return_inverse=True)
+        pairs = sku_column.cat.codes.to_numpy(dtype=np.int64) * len(self.store_ids) + store_codes
+
+        keys = pairs * _DATE_KEY_SPAN + self.dates
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+        # Default store for SKU-level lookups: the lowest store_id carrying the SKU
+        sku_of_key, first_key = np.unique(pairs[self.order] // len(self.store_ids), return_index=True)
+        first_store = self.store_ids[store_codes[self.order[first_key]]]
+        self.first_store = {int(code): int(store_id) for code, store_id in zip(sku_of_key, first_store)}
+
+    def resolve_date(self, date_id=None):
+        """
+        Get the latest snapshot date on or before date_id.
+
+        Args:
+            date_id (int): Date as YYYYMMDD (default: the latest snapshot)
+
+        Returns:
+            int: A snapshot date present in the inventory
+
+        Raises:
+            ValueError: If there is no snapshot on or before date_id
+        """
+        if date_id is None:
+            if not len(self.snapshot_dates):
+                raise ValueError("Inventory has no snapshots")
+            return int(self.snapshot_dates[-1])
+        position = np.searchsorted(self.snapshot_dates, int(date_id), side='right') - 1
+        if position < 0:
+            raise ValueError(f"No inventory snapshot on or before {date_id}")
+        return int(self.snapshot_dates[position])
+
+    def snapshot_bounds(self, date_id):
+        """Row range [start, stop) of one snapshot date (empty if the date has no snapshot)."""
+        return (int(np.searchsorted(self.dates, date_id, side='left')),
+                int(np.searchsorted(self.dates, date_id, side='right')))
+
+    def positions(self, skus, store_ids, date_id):
+        """
+        As-of row positions for many (sku, store_id) pairs.
+
+        Args:
+            skus (array-like[str]): SKU per lookup
+            store_ids (array-like[int]): Store per lookup
+            date_id (int): Date as YYYYMMDD; each pair gets its latest row on or before it
+
+        Returns:
+            np.ndarray: Frame row position per lookup, -1 where the pair has no row by then
+        """
+        sku_code = np.array([self.sku_codes.get(str(sku_id), -1) for sku_id in skus], dtype=np.int64)
+        store_ids = np.asarray(store_ids, dtype=np.int64)
+        store_code = np.searchsorted(self.store_ids, store_ids)
+        known = (sku_code >= 0) & (store_code < len(self.store_ids))
+        known &= self.store_ids[np.minimum(store_code, len(self.store_ids) - 1)] == store_ids
+
+        pair = sku_code * len(self.store_ids) + store_code
+        found = np.searchsorted(self.keys, pair * _DATE_KEY_SPAN + int(date_id), side='right') - 1
+        clipped = np.maximum(found, 0)
+        # The key just below the query must belong to the same (sku, store) pair
+        known &= (found >= 0) & (self.keys[clipped] // _DATE_KEY_SPAN == pair)
+        return np.where(known, self.order[clipped], -1)
+
+
+def _build_inventory_index(inventory_df):
+    """Index inventory rows by SKU, by (sku, store, date) key, and the SKU's product metadata."""
+    rows_by_sku = _split_by(inventory_df, 'sku')
+    product_list = dict(zip(inventory_df['product_name'].astype(str), inventory_df['sku'].astype(str)))
+    product_id_by_sku = {
+        str(sku): int(rows['product_id'].iloc[0]) for sku, rows in rows_by_sku.items()
+    }
+    return {
+        'rows_by_sku': {str(sku): rows for sku, rows in rows_by_sku.items()},
+        'product_list': product_list,
+        'product_id_by_sku': product_id_by_sku,
+        'sku_by_product_id': {product_id: sku for sku, product_id in product_id_by_sku.items()},
+        'snapshots': InventoryIndex(inventory_df),
+    }
+
+
+def _build_sales_index(sales_df):
+    """Index sales rows by product_id."""
+    return {
+        'rows_by_product': {int(pid): rows for pid, rows in _split_by(sales_df, 'product_id').items()},
+        'fingerprints': {},
+    }
+
+
+def _build_binary_sales_index(path):
+    """Index a binary sales file: the memory map itself serves per-product rows."""
+    return {
+        'rows_by_product': SalesBinary(path),
+        'fingerprints': {},
+    }
+
+
+def sales_fingerprint(product_sales):
+    """
+    Hash one product's sales slice.
+
+    Args:
+        product_sales (pd.DataFrame): Sales rows with datetime_id and qty_sold_kg columns
+
+    Returns:
+        str: SHA-1 hex digest of the dates and quantities
+    """
+    digest = hashlib.sha1()
+    digest.update(product_sales['datetime_id'].to_numpy(dtype='int32').tobytes())
+    digest.update(product_sales['qty_sold_kg'].to_numpy(dtype='float32').tobytes())
+    return digest.hexdigest()
+
+
+class DataStore:
+    """
+    Loads the inventory and sales files once and serves indexed views of them.
+
+    Args:
+        inventory_path (str): Path to current_inventory.csv
+        sales_path (str): Path to daily_sales.csv
+        sales_store_dir (str): Sales store directory, preferred over sales_path once built
+        sales_binary_path (str): Binary sales file, preferred over sales_path while it
+            still matches sales_path's content
+    """
+
+    def __init__(self, inventory_path=INVENTORY_PATH, sales_path=SALES_PATH, sales_store_dir=SALES_STORE_DIR,
+                 sales_binary_path=SALES_BINARY_PATH):
+        self._lock = threading.RLock()
+        self.sales_path = sales_path
+        self.sales_store_dir = sales_store_dir
+        self.sales_binary_path = sales_binary_path
+        # ((binary signature, CSV signature), binary is current) from the last check
+        self._binary_check = (None, False)
+        self._inventory = CachedTable(
+            inventory_path,
+            lambda: _load_inventory(inventory_path),
+            _build_inventory_index,
+        )
+        self._sales = self._csv_sales_table()
+
+    def _inventory_table(self):
+        with self._lock:
+            self._inventory.refresh()
+            return self._inventory
+
+    def _csv_sales_table(self):
+        sales_path = self.sales_path
+        return CachedTable(sales_path, lambda: pd.read_csv(sales_path, dtype=SALES_DTYPES), _build_sales_index)
+
+    def _binary_is_current(self):
+        """Whether the binary sales file exists and still reflects the sales CSV."""
+        if not os.path.exists(self.sales_binary_path):
+            return False
+        csv_signature = _file_signature(self.sales_path) if os.path.exists(self.sales_path) else None
+        key = (_file_signature(self.sales_binary_path), csv_signature)
+        # Re-checked only when either file moves, so the CSV is hashed at most once per change
+        if self._binary_check[0] != key:
+            self._binary_check = (key, source_is_current(self.sales_binary_path, self.sales_path))
+        return self._binary_check[1]
+
+    def _sales_manifest_path(self):
+        return os.path.join(self.sales_store_dir, SALES_MANIFEST_NAME)
+
+    def _sales_table(self):
+        with self._lock:
+            # Switch over to the sales store the first time it shows up
+            manifest_path = self._sales_manifest_path()
+            if self._sales.path != manifest_path and os.path.exists(manifest_path):
+                root = self.sales_store_dir
+                self._sales = CachedTable(manifest_path, lambda: read_sales_store(root), _build_sales_index)
+            elif self._sales.path != manifest_path:
+                # The binary file is only served while it matches the CSV it was converted from
+                binary_current = self._binary_is_current()
+                if binary_current and self._sales.path != self.sales_binary_path:
+                    # Nothing to parse: the index maps the file and sales() assembles the full frame on demand
+                    binary_path = self.sales_binary_path
+                    self._sales = CachedTable(binary_path, lambda: None,
+                                              lambda _: _build_binary_sales_index(binary_path))
+                elif not binary_current and self._sales.path == self.sales_binary_path:
+                    increment('sales_binary_stale')
+                    self._sales = self._csv_sales_table()
+            self._sales.refresh()
+            return self._sales
+
+    def inventory(self):
+        """
+        Get the full inventory table.
+
+        Returns:
+            pd.DataFrame: Inventory rows (shared; do not modify in place)
+        """
+        return self._inventory_table().frame
+
+    def sales(self):
+        """
+        Get the full sales table.
+
+        Returns:
+            pd.DataFrame: Sales rows (shared; do not modify in place)
+        """
+        with self._lock:
+            table = self._sales_table()
+            if table.frame is None:
+                # Dropped by append_sales(); rebuild from the per-product index
+                table.frame = pd.concat(list(table.index['rows_by_product'].values()), ignore_index=True)
+            return table.frame
+
+    def product_list(self):
+        """
+        Get the product selection list.
+
+        Returns:
+            dict[str, str]: Dictionary mapping product_name to sku
+        """
+        return dict(self._inventory_table().index['product_list'])
+
+    def skus(self):
+        """
+        Get every SKU in the inventory.
+
+        Returns:
+            list[str]: SKUs in order of first appearance
+        """
+        return list(self._inventory_table().index['product_id_by_sku'])
+
+    def inventory_rows(self, sku_id):
+        """
+        Get every inventory row for a SKU, ordered by snapshot date and then by file order within a snapshot.
+
+        Args:
+            sku_id (str): The SKU identifier (e.g., 'VEG0001')
+
+        Returns:
+            pd.DataFrame: Inventory rows for the SKU (shared; do not modify in place)
+
+        Raises:
+            ValueError: If the SKU is not in the inventory
+        """
+        rows = self._inventory_table().index['rows_by_sku'].get(sku_id)
+        if rows is None:
+            raise ValueError(f"SKU {sku_id} not found in inventory")
+        return rows
+
+    def snapshot_dates(self):
+        """
+        Get every inventory snapshot date.
+
+        Returns:
+            list[int]: Dates as YYYYMMDD, oldest first
+        """
+        return [int(date_id) for date_id in self._inventory_table().index['snapshots'].snapshot_dates]
+
+    def resolve_snapshot_date(self, date_id=None):
+        """
+        Get the snapshot in effect on a date: the latest one on or before it.
+
+        Args:
+            date_id (int): Date as YYYYMMDD (default: the latest snapshot)
+
+        Returns:
+            int: The snapshot date
+
+        Raises:
+            ValueError: If there is no snapshot on or before date_id
+        """
+        return self._inventory_table().index['snapshots'].resolve_date(date_id)
+
+    def inventory_snapshot(self, date_id=None):
+        """
+        Get every (store, SKU) row of the snapshot in effect on a date.
+
+        Args:
+            date_id (int): Date as YYYYMMDD; resolved as of that date (default: latest snapshot)
+
+        Returns:
+            pd.DataFrame: The snapshot's rows in file order (shared; do not modify in place)
+
+        Raises:
+            ValueError: If there is no snapshot on or before date_id
+        """
+        table = self._inventory_table()
+        snapshots = table.index['snapshots']
+        start, stop = snapshots.snapshot_bounds(snapshots.resolve_date(date_id))
+        return table.frame.iloc[start:stop]
+
+    def inventory_row(self, sku_id, store_id=None, date_id=None):
+        """
+        Get one (store, SKU) inventory row as of a date.
+
+        Args:
+            sku_id (str): The SKU identifier (e.g., 'VEG0001')
+            store_id (int): The store (default: the lowest store_id carrying the SKU)
+            date_id (int): Date as YYYYMMDD; the pair's latest row on or before it is
+                returned (default: the latest snapshot)
+
+        Returns:
+            pd.Series: The inventory row; its date_id is the snapshot it came from
+
+        Raises:
+            ValueError: If the SKU is unknown or the store has no row for it by date_id
+        """
+        table = self._inventory_table()
+        snapshots = table.index['snapshots']
+        if sku_id not in snapshots.sku_codes:
+            raise ValueError(f"SKU {sku_id} not found in inventory")
+        if store_id is None:
+            store_id = snapshots.first_store[snapshots.sku_codes[sku_id]]
+        date_id = snapshots.resolve_date(date_id)
+        position, = snapshots.positions([sku_id], [store_id], date_id)
+        if position < 0:
+            raise ValueError(f"No inventory for SKU {sku_id} at store {store_id} on or before {date_id}")
+        return table.frame.iloc[position]
+
+    def product_id(self, sku_id):
+        """
+        Get the product_id for a SKU.
+
+        Args:
+            sku_id (str): The SKU identifier (e.g., 'VEG0001')
+
+        Returns:
+            int: The product_id
+
+        Raises:
+            ValueError: If the SKU is not in the inventory
+        """
+        product_id = self._inventory_table().index['product_id_by_sku'].get(sku_id)
+        if product_id is None:
+            raise ValueError(f"SKU {sku_id} not found in inventory")
+        return product_id
+
+    def sku(self, product_id):
+        """
+        Get the SKU for a product_id.
+
+        Args:
+            product_id (int): The product identifier
+
+        Returns:
+            str or None: The SKU, or None if the product is not in the inventory
+        """
+        return self._inventory_table().index['sku_by_product_id'].get(int(product_id))
+
+    def product_sales(self, product_id):
+        """
+        Get the sales history for one product, in file order.
+
+        Args:
+            product_id (int): The product identifier
+
+        Returns:
+            pd.DataFrame: Sales rows for the product (empty if it has no sales)
+        """
+        rows = self._sales_table().index['rows_by_product'].get(int(product_id))
+        if rows is None:
+            return self.sales().iloc[0:0]
+        return rows
+
+    def product_fingerprint(self, product_id):
+        """
+        Get the content hash of one product's sales history.
+
+        Computed once per product and file version, so it is cheap to use as a cache key.
+
+        Args:
+            product_id (int): The product identifier
+
+        Returns:
+            str: SHA-1 hex digest of the product's sales slice
+        """
+        with self._lock:
+            table = self._sales_table()
+            fingerprints = table.index['fingerprints']
+            product_id = int(product_id)
+            if product_id not in fingerprints:
+                fingerprints[product_id] = sales_fingerprint(self.product_sales(product_id))
+            return fingerprints[product_id]
+
+    def append_sales(self, batch_df):
+        """
+        Fold a newly persisted sales batch into the in-memory indexes.
+
+        Only the batch's products are touched: their row slices are extended and
+        their fingerprints dropped. Call this after the batch and the new manifest
+        have been written to the sales store (see ingestion.ingest_daily_sales).
+
+        Args:
+            batch_df (pd.DataFrame): Sales rows with SALES_DTYPES columns
+        """
+        with self._lock:
+            table = self._sales
+            manifest_path = self._sales_manifest_path()
+            if table.path != manifest_path or table.index is None:
+                # Not serving from the store yet: the next access loads it, batch included
+                return
+
+            rows_by_product = table.index['rows_by_product']
+            fingerprints = table.index['fingerprints']
+            for product_id, rows in _split_by(batch_df.astype(SALES_DTYPES), 'product_id').items():
+                product_id = int(product_id)
+                existing = rows_by_product.get(product_id)
+                rows_by_product[product_id] = rows if existing is None else pd.concat([existing, rows], ignore_index=True)
+                fingerprints.pop(product_id, None)
+            table.frame = None
+
+            # Adopt the manifest written with this batch so refresh() does not reload the store
+            table.signature = _file_signature(manifest_path)
+            table.digest = _file_digest(manifest_path)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_data_store():
+    """
+    Get the process-wide DataStore (over the default paths unless reconfigured).
+
+    Returns:
+        DataStore: The shared data store
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = DataStore()
+        return _default_store
+
+
+def configure_data_store(inventory_path=INVENTORY_PATH, sales_path=SALES_PATH, sales_store_dir=SALES_STORE_DIR,
+                         sales_binary_path=SALES_BINARY_PATH):
+    """
+    Point the process-wide DataStore at other files (e.g. synthetic benchmark data).
+
+    Args:
+        inventory_path (str): Path to the inventory CSV
+        sales_path (str): Path to the sales CSV
+        sales_store_dir (str): Sales store directory
+        sales_binary_path (str): Binary sales file
+
+    Returns:
+        DataStore: The new shared data store
+    """
+    global _default_store
+    with _default_store_lock:
+        _default_store = DataStore(inventory_path, sales_path, sales_store_dir, sales_binary_path)
+        return _default_store
@@ -0,0 +1,270 @@
+"""
+Per-SKU price elasticity for the promo model.
+
+The promo model lifts sales by (1 + discount * elasticity). This module
+estimates that elasticity from a price history instead of using one constant
+for every product. The history has datetime_id, product_id and qty_sold_kg,
+plus either discount (as a decimal) or price (converted with the inventory
+list_price). For every observation the uplift over the SKU's undiscounted
+baseline for that weekday, y = qty / baseline - 1, is regressed on the
+discount d through the origin. All SKUs are fitted at once with grouped sums:
+
+    raw        = sum(d * y) / sum(d^2)                              per SKU
+    elasticity = (sum(d * y) + k * parent) / (sum(d^2) + k)
+
+The parent is the subcategory estimate, which is shrunk the same way toward
+the catalog estimate, which is shrunk toward ELASTICITY_MULTIPLIER. SKUs with
+little promo history therefore stay close to their subcategory, and SKUs with
+none get the subcategory value (or 2.5 when nothing has been observed).
+
+The fitted table is written to ELASTICITY_PATH; simulations look SKUs up in it
+through get_elasticity_table(), a dict reloaded when the file changes.
+
+Usage:
+    python elasticity.py fit --history price_history.csv
+    python elasticity.py show VEG0001 FRUIT0040
+"""
+import argparse
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_store import CachedTable, get_data_store
+from instrumentation import span
+
+# Sales uplift per unit of discount (15% off -> +37.5% sales) when nothing better is known
+ELASTICITY_MULTIPLIER = 2.5
+
+# Fitted lookup table written by `python elasticity.py fit`
+ELASTICITY_PATH = 'elasticities.csv'
+
+# Prior strength in units of sum(d^2): 0.5 is worth 50 days at 10% off
+DEFAULT_PRIOR_STRENGTH = 0.5
+
+# Fitted values are kept in this range; a discount never lowers sales
+MIN_ELASTICITY = 0.0
+MAX_ELASTICITY = 10.0
+
+TABLE_COLUMNS = [
+    'sku', 'product_id', 'category', 'subcategory', 'n_days', 'n_promo_days',
+    'raw_elasticity', 'subcategory_elasticity', 'elasticity',
+]
+
+
+def _shrink(sum_dy, sum_dd, prior, strength):
+    return (sum_dy + strength * prior) / (sum_dd + strength)
+
+
+def fit_elasticities(history_df, prior_strength=DEFAULT_PRIOR_STRENGTH):
+    """
+    Fit shrunk per-SKU elasticities from a price history, vectorized over the catalog.
+
+    Args:
+        history_df (pd.DataFrame): Rows with datetime_id, product_id, qty_sold_kg and
+            either discount (decimal) or price
+        prior_strength (float): Shrinkage strength k in units of sum(d^2) (default: 0.5)
+
+    Returns:
+        pd.DataFrame: TABLE_COLUMNS, one row per inventory SKU
+
+    Raises:
+        ValueError: If the history has neither a discount nor a price column
+    """
+    products = get_data_store().inventory().drop_duplicates('product_id').reset_index(drop=True)
+    history = history_df[history_df['product_id'].isin(products['product_id'])]
+
+    # Discount depth per row, from the discount column or the price paid against list_price
+    list_price = products.set_index('product_id')['list_price'].astype(np.float64)
+    if 'discount' in history:
+        discount = history['discount'].to_numpy(dtype=np.float64)
+    elif 'price' in history:
+        discount = 1.0 - history['price'].to_numpy(dtype=np.float64) / list_price.reindex(history['product_id']).to_numpy()
+    else:
+        raise ValueError("Price history needs a 'discount' or a 'price' column")
+    discount = np.clip(np.nan_to_num(discount), 0.0, 1.0)
+
+    n_products = len(products)
+    codes = pd.Index(products['product_id']).get_indexer(history['product_id'])
+    quantity = history['qty_sold_kg'].to_numpy(dtype=np.float64)
+    weekday = pd.to_datetime(history['datetime_id'].astype(str), format='%Y%m%d').dt.dayofweek.to_numpy()
+
+    # Undiscounted baseline per (SKU, weekday), falling back to the SKU's undiscounted mean
+    full_price = discount == 0
+    cells = codes * 7 + weekday
+    cell_sum = np.bincount(cells, weights=quantity * full_price, minlength=n_products * 7)
+    cell_count = np.bincount(cells, weights=full_price, minlength=n_products * 7)
+    sku_sum = np.bincount(codes, weights=quantity * full_price, minlength=n_products)
+    sku_count = np.bincount(codes, weights=full_price, minlength=n_products)
+    sku_mean = np.divide(sku_sum, sku_count, out=np.full(n_products, np.nan), where=sku_count > 0)
+    cell_mean = np.divide(cell_sum, cell_count, out=np.repeat(sku_mean, 7), where=cell_count > 0)
+    baseline = cell_mean[cells]
+
+    # Rows without a baseline cannot say anything about uplift
+    usable = np.isfinite(baseline) & (baseline > 0)
+    d = np.where(usable, discount, 0.0)
+    y = np.where(usable, quantity / np.where(usable, baseline, 1.0) - 1.0, 0.0)
+    sum_dy = np.bincount(codes, weights=d * y, minlength=n_products)
+    sum_dd = np.bincount(codes, weights=d * d, minlength=n_products)
+
+    # Catalog -> subcategory -> SKU, each shrunk toward its parent. Subcategory
+    # names repeat across categories, so the group key is (category, subcategory)
+    catalog = _shrink(sum_dy.sum(), sum_dd.sum(), ELASTICITY_MULTIPLIER, prior_strength)
+    groups, group_names = pd.factorize(pd.MultiIndex.from_frame(products[['category', 'subcategory']].astype(str)))
+    group_dy = np.bincount(groups, weights=sum_dy, minlength=len(group_names))
+    group_dd = np.bincount(groups, weights=sum_dd, minlength=len(group_names))
+    subcategory = _shrink(group_dy, group_dd, catalog, prior_strength)[groups]
+    shrunk = _shrink(sum_dy, sum_dd, subcategory, prior_strength)
+
+    return pd.DataFrame({
+        'sku': products['sku'].astype(str).to_numpy(),
+        'product_id': products['product_id'].to_numpy(),
+        'category': products['category'].to_numpy(),
+        'subcategory': products['subcategory'].to_numpy(),
+        'n_days': np.bincount(codes, weights=usable, minlength=n_products).astype(np.int64),
+        'n_promo_days': np.bincount(codes, weights=usable & (discount > 0), minlength=n_products).astype(np.int64),
+        'raw_elasticity': np.divide(sum_dy, sum_dd, out=np.full(n_products, np.nan), where=sum_dd > 0),
+        'subcategory_elasticity': np.clip(subcategory, MIN_ELASTICITY, MAX_ELASTICITY),
+        'elasticity': np.clip(shrunk, MIN_ELASTICITY, MAX_ELASTICITY),
+    })[TABLE_COLUMNS]
+
+
+class ElasticityTable:
+    """
+    O(1) elasticity lookups by SKU from the fitted table on disk.
+
+    The file is re-read only when it changes. SKUs missing from the table (or
+    every SKU, when no table has been fitted) get ELASTICITY_MULTIPLIER.
+
+    Args:
+        path (str): Table written by `python elasticity.py fit` (default: ELASTICITY_PATH)
+    """
+
+    def __init__(self, path=ELASTICITY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._table = CachedTable(path, lambda: pd.read_csv(path, dtype={'sku': str}), self._build_index)
+
+    @staticmethod
+    def _build_index(table_df):
+        return dict(zip(table_df['sku'], table_df['elasticity'].astype(float)))
+
+    def _index(self):
+        with self._lock:
+            if not os.path.exists(self.path):
+                return {}
+            with span('elasticity_load'):
+                self._table.refresh()
+            return self._table.index
+
+    def get(self, sku_id, default=ELASTICITY_MULTIPLIER):
+        """
+        Get one SKU's elasticity.
+
+        Args:
+            sku_id (str): The SKU identifier (e.g., 'VEG0001')
+            default (float): Returned for SKUs not in the table (default: 2.5)
+
+        Returns:
+            float: The elasticity
+        """
+        return self._index().get(sku_id, default)
+
+    def lookup(self, skus, default=ELASTICITY_MULTIPLIER):
+        """
+        Get elasticities for many SKUs, aligned with the input.
+
+        Args:
+            skus (iterable[str]): SKU identifiers
+            default (float): Used for SKUs not in the table (default: 2.5)
+
+        Returns:
+            np.ndarray: One float64 elasticity per SKU
+        """
+        index = self._index()
+        return np.array([index.get(sku_id, default) for sku_id in skus], dtype=np.float64)
+
+    def frame(self):
+        """
+        Get the fitted table.
+
+        Returns:
+            pd.DataFrame or None: TABLE_COLUMNS, or None when no table has been fitted
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return None
+            self._table.refresh()
+            return self._table.frame
+
+
+_default_table = None
+_default_table_lock = threading.Lock()
+
+
+def get_elasticity_table():
+    """
+    Get the process-wide ElasticityTable.
+
+    Returns:
+        ElasticityTable: The shared table
+    """
+    global _default_table
+    with _default_table_lock:
+        if _default_table is None:
+            _default_table = ElasticityTable()
+        return _default_table
+
+
+def write_elasticity_table(table_df, path=ELASTICITY_PATH):
+    """Write a fitted table, replacing path atomically."""
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    table_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit and inspect per-SKU price elasticities.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fit_parser = subparsers.add_parser('fit', help="Fit the catalog and write the lookup table")
+    fit_parser.add_argument('--history', required=True,
+                            help="Price history (.csv or .parquet): datetime_id, product_id, qty_sold_kg, "
+                                 "and discount or price")
+    fit_parser.add_argument('--prior-strength', type=float, default=DEFAULT_PRIOR_STRENGTH,
+                            help=f"Shrinkage toward the subcategory, in sum(d^2) units (default: {DEFAULT_PRIOR_STRENGTH})")
+    fit_parser.add_argument('--output', default=ELASTICITY_PATH, help=f"Table to write (default: {ELASTICITY_PATH})")
+
+    show_parser = subparsers.add_parser('show', help="Print elasticities from the lookup table")
+    show_parser.add_argument('skus', nargs='*', help="SKUs to show (default: all)")
+    show_parser.add_argument('--table', default=ELASTICITY_PATH, help=f"Table to read (default: {ELASTICITY_PATH})")
+    args = parser.parse_args(argv)
+
+    if args.command == 'fit':
+        reader = pd.read_parquet if args.history.endswith('.parquet') else pd.read_csv
+        try:
+            table = fit_elasticities(reader(args.history), args.prior_strength)
+        except (ValueError, KeyError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        write_elasticity_table(table, args.output)
+        fitted = table[table['n_promo_days'] > 0]
+        print(f"Wrote {len(table)} SKU elasticities to {args.output} ({len(fitted)} with promo history)")
+        print(table.groupby(['category', 'subcategory'])['elasticity'].describe()[['count', 'mean', 'min', 'max']]
+              .to_string(float_format=lambda value: f"{value:.2f}"))
+        return 0
+
+    table = ElasticityTable(args.table).frame()
+    if table is None:
+        print(f"No elasticity table at {args.table}; every SKU uses {ELASTICITY_MULTIPLIER}")
+        return 0
+    if args.skus:
+        table = table[table['sku'].isin(args.skus)]
+    print(table.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,406 @@
+"""
+Streaming export of catalog-wide forecasts and simulation results.
+
+Results are produced as a generator of DataFrames, a few SKUs at a time, and
+rechunked into fixed-size row batches before they are written. Each batch
+becomes one Parquet row group (or one CSV append), so memory stays bounded by
+chunk_rows no matter how many stores, SKUs or discounts are exported.
+
+Outputs:
+    *.csv / *.parquet    one file
+    any other path       a directory of part-NNNNN.parquet (or .csv) files of
+                         at most rows_per_file rows each
+
+Usage:
+    python export.py forecasts forecasts.parquet
+    python export.py store-forecasts exports/store_forecasts --engine prophet
+    python export.py simulations simulations.csv --discounts 0.1 0.2 0.3
+
+The same batches can be streamed over HTTP (iter_csv_bytes, iter_arrow_bytes);
+service.py serves them at /export with chunked transfer encoding.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis_engine import ENGINE_PARAMS, get_forecast, validate_engine
+from batch_forecast import _resolve_skus
+from data_store import get_data_store
+from fast_forecast import forecast_many
+from elasticity import get_elasticity_table
+from simulation import allocate_store_demand, simulate_shelf_life_promotions, store_demand_paths
+
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_ROWS_PER_FILE = 1_000_000
+
+# SKUs forecast per generator step, and discounts simulated per kernel call
+DEFAULT_CHUNK_SKUS = 32
+DISCOUNT_BLOCK = 16
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+EXPORT_KINDS = ('forecasts', 'store-forecasts', 'simulations')
+
+
+def _forecast_chunk(skus, forecast_days, engine):
+    """Forecast rows for the horizon, {sku: DataFrame}, for one chunk of SKUs."""
+    if engine == 'fourier':
+        forecasts = forecast_many(skus, forecast_days)
+    else:
+        forecasts = {sku_id: get_forecast(sku_id, forecast_days, engine=engine)[1:] for sku_id in skus}
+    return {
+        sku_id: forecasts[sku_id][0].tail(forecast_days)[FORECAST_COLUMNS].reset_index(drop=True)
+        for sku_id in skus
+    }
+
+
+def _sku_chunks(skus, chunk_skus, forecast_days, engine):
+    """Yield {sku: forecast rows} for successive chunks of the catalog."""
+    validate_engine(engine)
+    skus = _resolve_skus(skus, get_data_store())
+    for start in range(0, len(skus), chunk_skus):
+        yield _forecast_chunk(skus[start:start + chunk_skus], forecast_days, engine)
+
+
+def forecast_batches(skus='all', forecast_days=7, engine='fourier', chunk_skus=DEFAULT_CHUNK_SKUS):
+    """
+    Yield product-level forecast rows, one chunk of SKUs at a time.
+
+    Args:
+        skus (list[str] or 'all'): SKUs to export (default: every SKU)
+        forecast_days (int): Forecast horizon in days (default: 7)
+        engine (str): Forecasting engine (default: 'fourier')
+        chunk_skus (int): SKUs forecast per yielded frame
+
+    Yields:
+        pd.DataFrame: sku, ds, yhat, yhat_lower, yhat_upper
+    """
+    for forecasts in _sku_chunks(skus, chunk_skus, forecast_days, engine):
+        yield pd.concat([rows.assign(sku=sku_id) for sku_id, rows in forecasts.items()],
+                        ignore_index=True)[['sku'] + FORECAST_COLUMNS]
+
+
+def store_forecast_batches(skus='all', forecast_days=7, engine='fourier', date_id=None, allocation='stock',
+                           chunk_skus=DEFAULT_CHUNK_SKUS):
+    """
+    Yield store-level forecast rows: each product's daily forecast split across its stores.
+
+    Args:
+        skus (list[str] or 'all'): SKUs to export (default: every SKU)
+        forecast_days (int): Forecast horizon in days (default: 7)
+        engine (str): Forecasting engine (default: 'fourier')
+        date_id (int): Inventory snapshot date as YYYYMMDD (default: latest snapshot)
+        allocation (str): Demand allocation, see simulation.allocate_store_demand()
+        chunk_skus (int): SKUs forecast per yielded frame
+
+    Yields:
+        pd.DataFrame: store_id, sku, ds, yhat, yhat_lower, yhat_upper
+    """
+    for forecasts in _sku_chunks(skus, chunk_skus, forecast_days, engine):
+        totals = {sku_id: float(rows['yhat'].sum()) for sku_id, rows in forecasts.items()}
+        stores = allocate_store_demand(totals, date_id, allocation)
+        sku_labels = stores['sku'].astype(str).to_numpy()
+
+        # (stores x days) rows: repeat each store row once per day, scale the product path by its share
+        order = list(forecasts)
+        stacked = pd.concat([forecasts[sku_id] for sku_id in order], ignore_index=True)
+        first_row = pd.Index(order).get_indexer(sku_labels) * forecast_days
+        source = (first_row[:, None] + np.arange(forecast_days)[None, :]).ravel()
+        share = np.repeat(stores['demand_share'].to_numpy(), forecast_days)
+        yield pd.DataFrame({
+            'store_id': np.repeat(stores['store_id'].to_numpy(), forecast_days),
+            'sku': np.repeat(sku_labels, forecast_days),
+            'ds': stacked['ds'].to_numpy()[source],
+            'yhat': stacked['yhat'].to_numpy()[source] * share,
+            'yhat_lower': stacked['yhat_lower'].to_numpy()[source] * share,
+            'yhat_upper': stacked['yhat_upper'].to_numpy()[source] * share,
+        })
+
+
+def simulation_batches(discounts=(0.15,), stock_multiplier=1.0, skus='all', forecast_days=7, engine='fourier',
+                       date_id=None, allocation='stock', chunk_skus=DEFAULT_CHUNK_SKUS):
+    """
+    Yield store-level shelf-life simulation rows for every discount, one chunk of SKUs at a time.
+
+    Args:
+        discounts (iterable[float]): Discounts as decimals (default: (0.15,))
+        stock_multiplier (float): Multiplier for stock levels (default: 1.0)
+        skus (list[str] or 'all'): SKUs to export (default: every SKU)
+        forecast_days (int): Forecast horizon in days (default: 7)
+        engine (str): Forecasting engine (default: 'fourier')
+        date_id (int): Inventory snapshot date as YYYYMMDD (default: latest snapshot)
+        allocation (str): Demand allocation, see simulation.allocate_store_demand()
+        chunk_skus (int): SKUs forecast per chunk
+
+    Yields:
+        pd.DataFrame: discount, store_id, sku and the run_store_simulation() columns, one frame per discount
+    """
+    discounts = np.asarray(list(discounts), dtype=np.float64)
+    for forecasts in _sku_chunks(skus, chunk_skus, forecast_days, engine):
+        daily = pd.DataFrame({sku_id: rows['yhat'].to_numpy() for sku_id, rows in forecasts.items()})
+        stores = allocate_store_demand(daily.sum(), date_id, allocation)
+        paths = store_demand_paths(stores, daily)
+        sku_labels = stores['sku'].astype(str).to_numpy()
+        elasticity = get_elasticity_table().lookup(sku_labels)
+
+        # A block of discounts per simulation call bounds the (rows x discounts) arrays
+        for start in range(0, len(discounts), DISCOUNT_BLOCK):
+            block = discounts[start:start + DISCOUNT_BLOCK]
+            result = simulate_shelf_life_promotions(
+                paths,
+                stores['stock_on_hand_kg'].to_numpy(),
+                stores['list_price'].to_numpy(),
+                block,
+                [stock_multiplier],
+                elasticity,
+                stores['stock_in_transit_kg'].to_numpy(),
+                stores['lead_time_days'].to_numpy(),
+                stores['shelf_life_days'].to_numpy(),
+            )
+            for j, discount in enumerate(block):
+                yield pd.DataFrame({
+                    'discount': np.full(len(stores), discount, dtype=np.float32),
+                    'store_id': stores['store_id'].to_numpy(),
+                    'sku': sku_labels,
+                    'allocated_forecast_kg': stores['allocated_forecast_kg'].to_numpy(dtype=np.float32),
+                    'current_stock': result['current_stock'][:, 0].astype(np.float32),
+                    'days_to_expire': stores['shelf_life_days'].to_numpy(),
+                    'base_waste_kg': result['base_waste_kg'][:, 0].astype(np.float32),
+                    'promo_waste_kg': result['promo_waste_kg'][:, 0, j].astype(np.float32),
+                    'base_revenue': result['base_revenue'][:, 0].astype(np.float32),
+                    'promo_revenue': result['promo_revenue'][:, 0, j].astype(np.float32),
+                })
+
+
+def rechunk(batches, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Regroup a stream of frames into frames of exactly chunk_rows rows (the last may be shorter).
+
+    Holds at most chunk_rows rows plus one incoming frame at a time.
+
+    Args:
+        batches (iterable[pd.DataFrame]): Frames with the same columns
+        chunk_rows (int): Rows per output frame
+
+    Yields:
+        pd.DataFrame: Chunks with a fresh RangeIndex
+    """
+    pending = []
+    pending_rows = 0
+    for batch in batches:
+        while len(batch):
+            take = min(chunk_rows - pending_rows, len(batch))
+            pending.append(batch.iloc[:take])
+            pending_rows += take
+            batch = batch.iloc[take:]
+            if pending_rows == chunk_rows:
+                yield pd.concat(pending, ignore_index=True)
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield pd.concat(pending, ignore_index=True)
+
+
+class _PartWriter:
+    """Appends chunks to one CSV or Parquet file."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, chunk):
+        if self.fmt == 'csv':
+            chunk.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        else:
+            # pyarrow is only needed for Parquet output
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table.cast(self._schema))
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _output_format(path, fmt):
+    if fmt is not None:
+        return fmt
+    return 'csv' if path.endswith('.csv') else 'parquet'
+
+
+def write_batches(batches, path, fmt=None, chunk_rows=DEFAULT_CHUNK_ROWS, rows_per_file=DEFAULT_ROWS_PER_FILE):
+    """
+    Stream frames to disk in fixed-size chunks.
+
+    A path ending in .csv or .parquet is written as one file. Any other path
+    becomes a directory of part-NNNNN files with at most rows_per_file rows each.
+    Every file is written under a temporary name and renamed when complete; if
+    the batches raise, the file in progress is removed and the error propagates.
+    Part files completed before the error are kept.
+
+    Args:
+        batches (iterable[pd.DataFrame]): Frames with the same columns, e.g. from forecast_batches()
+        path (str): Output file or directory
+        fmt (str): 'parquet' or 'csv' (default: from the extension, else parquet)
+        chunk_rows (int): Rows per Parquet row group / CSV append (default: 100,000)
+        rows_per_file (int): Rows per part file in directory mode (default: 1,000,000)
+
+    Returns:
+        dict: rows, files (list of paths) and seconds
+    """
+    start = time.perf_counter()
+    fmt = _output_format(path, fmt)
+    single_file = path.endswith(('.csv', '.parquet'))
+    if not single_file:
+        os.makedirs(path, exist_ok=True)
+
+    files = []
+    writer = None
+    rows = 0
+
+    try:
+        for chunk in rechunk(batches, chunk_rows):
+            if writer is not None and not single_file and writer.rows + len(chunk) > rows_per_file:
+                writer.close()
+                os.replace(writer.path, files[-1])
+                writer = None
+            if writer is None:
+                target = path if single_file else os.path.join(path, f"part-{len(files):05d}.{fmt}")
+                files.append(target)
+                writer = _PartWriter(f"{target}.tmp.{os.getpid()}", fmt)
+            writer.write(chunk)
+            rows += len(chunk)
+    except BaseException:
+        # Never leave a partial file under its final name
+        if writer is not None:
+            writer.close()
+            if os.path.exists(writer.path):
+                os.remove(writer.path)
+        raise
+    if writer is not None:
+        writer.close()
+        os.replace(writer.path, files[-1])
+
+    return {'rows': rows, 'files': files, 'seconds': time.perf_counter() - start}
+
+
+def iter_csv_bytes(batches, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Encode a stream of frames as CSV, one chunk at a time.
+
+    Args:
+        batches (iterable[pd.DataFrame]): Frames with the same columns
+        chunk_rows (int): Rows encoded per yielded block
+
+    Yields:
+        bytes: The header plus the first chunk, then one block per further chunk
+    """
+    header = True
+    for chunk in rechunk(batches, chunk_rows):
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, header=header, index=False)
+        header = False
+        yield buffer.getvalue().encode()
+
+
+def iter_arrow_bytes(batches, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Encode a stream of frames as one Arrow IPC stream, one record batch per chunk.
+
+    Args:
+        batches (iterable[pd.DataFrame]): Frames with the same columns
+        chunk_rows (int): Rows per record batch
+
+    Yields:
+        bytes: The schema plus the first batch, then one block per further batch and the end marker
+    """
+    # pyarrow is only needed for Arrow output
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    stream = None
+    for chunk in rechunk(batches, chunk_rows):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if stream is None:
+            stream = pa.ipc.new_stream(sink, table.schema)
+            schema = table.schema
+        stream.write_table(table.cast(schema))
+        # Hand back what this chunk encoded and reuse the buffer
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if stream is not None:
+        stream.close()
+        yield sink.getvalue()
+
+
+def export_batches(kind, skus='all', forecast_days=7, engine='fourier', discounts=(0.15,), stock_multiplier=1.0,
+                   date_id=None, chunk_skus=DEFAULT_CHUNK_SKUS):
+    """
+    Get the batch generator for one export kind.
+
+    Args:
+        kind (str): 'forecasts', 'store-forecasts' or 'simulations'
+        Other arguments are passed to the matching *_batches() generator.
+
+    Returns:
+        generator: Frames of the export
+
+    Raises:
+        ValueError: If kind is unknown
+    """
+    if kind == 'forecasts':
+        return forecast_batches(skus, forecast_days, engine, chunk_skus)
+    if kind == 'store-forecasts':
+        return store_forecast_batches(skus, forecast_days, engine, date_id, chunk_skus=chunk_skus)
+    if kind == 'simulations':
+        return simulation_batches(discounts, stock_multiplier, skus, forecast_days, engine, date_id,
+                                  chunk_skus=chunk_skus)
+    raise ValueError(f"Unknown export {kind!r}; expected one of {list(EXPORT_KINDS)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream catalog-wide forecasts or simulations to Parquet/CSV.")
+    parser.add_argument('kind', choices=EXPORT_KINDS, help="What to export")
+    parser.add_argument('output', help="File (.csv/.parquet) or directory of part files")
+    parser.add_argument('--skus', nargs='+', default=['all'], help="SKUs to export (default: all)")
+    parser.add_argument('--days', type=int, default=7, help="Forecast horizon in days (default: 7)")
+    parser.add_argument('--engine', choices=list(ENGINE_PARAMS), default='fourier', help="Forecasting engine")
+    parser.add_argument('--discounts', type=float, nargs='+', default=[0.15],
+                        help="Discounts for the simulations export (default: 0.15)")
+    parser.add_argument('--stock-multiplier', type=float, default=1.0, help="Stock multiplier for simulations")
+    parser.add_argument('--date', type=int, default=None, help="Inventory snapshot date YYYYMMDD (default: latest)")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default=None,
+                        help="Output format (default: from the extension, else parquet)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f"Rows per written chunk (default: {DEFAULT_CHUNK_ROWS})")
+    parser.add_argument('--rows-per-file', type=int, default=DEFAULT_ROWS_PER_FILE,
+                        help=f"Rows per part file in directory mode (default: {DEFAULT_ROWS_PER_FILE})")
+    args = parser.parse_args(argv)
+
+    try:
+        batches = export_batches(args.kind, args.skus, args.days, args.engine, args.discounts,
+                                 args.stock_multiplier, args.date)
+        result = write_batches(batches, args.output, args.format, args.chunk_rows, args.rows_per_file)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Exported {result['rows']} rows to {len(result['files'])} file(s) under {args.output} "
+          f"in {result['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
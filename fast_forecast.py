@@ -0,0 +1,375 @@
+"""
+Vectorized Fourier least-squares forecaster.
+
+A fast alternative to Prophet for high-SKU-count runs. Every series is fitted
+at once as one (n_series, n_days) array. The model keeps Prophet's additive
+structure without changepoints: intercept, linear trend, and weekly and yearly
+Fourier terms. Each series is solved by ridge-regularized least squares.
+
+Usage:
+    python fast_forecast.py compare --holdout 28
+    python fast_forecast.py compare VEG0001 VEG0002 --holdout 14
+"""
+import argparse
+import logging
+import sys
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from data_store import get_data_store
+
+# Model settings (also part of the forecast cache key for engine='fourier')
+FOURIER_PARAMS = {
+    'engine': 'fourier',
+    'weekly_order': 3,
+    'yearly_order': 10,
+    'ridge': 1.0,
+    'interval_width': 0.8,
+}
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def day_numbers(datetime_ids):
+    """
+    Convert YYYYMMDD integers to days since 1970-01-01.
+
+    Args:
+        datetime_ids (array-like): Dates as YYYYMMDD integers
+
+    Returns:
+        np.ndarray: int64 day numbers, same shape as the input
+    """
+    datetime_ids = np.asarray(datetime_ids)
+    unique, inverse = np.unique(datetime_ids, return_inverse=True)
+    # Parse each distinct date once
+    days = (pd.to_datetime(unique.astype(str), format='%Y%m%d').to_numpy().astype('datetime64[D]') - _EPOCH)
+    return days.astype(np.int64)[inverse].reshape(datetime_ids.shape)
+
+
+def fourier_features(days, t0, span, weekly_order, yearly_order):
+    """
+    Build the design matrix for the given days.
+
+    Args:
+        days (np.ndarray): Day numbers, any shape
+        t0 (int): Day number where the trend term is zero
+        span (float): Days over which the trend term grows by 1
+        weekly_order (int): Number of weekly sine/cosine pairs
+        yearly_order (int): Number of yearly sine/cosine pairs
+
+    Returns:
+        np.ndarray: Features with shape days.shape + (2 + 2 * (weekly_order + yearly_order),)
+    """
+    days = np.asarray(days, dtype=np.float64)
+    columns = [np.ones_like(days), (days - t0) / span]
+    for period, order in ((7.0, weekly_order), (365.25, yearly_order)):
+        for k in range(1, order + 1):
+            angle = 2.0 * np.pi * k * days / period
+            columns.append(np.sin(angle))
+            columns.append(np.cos(angle))
+    return np.stack(columns, axis=-1)
+
+
+def sales_matrix(sku_ids):
+    """
+    Stack the sales history of several SKUs into one array on a shared daily grid.
+
+    Args:
+        sku_ids (list[str]): SKUs to load
+
+    Returns:
+        tuple: (days, values)
+            - days: int64 day numbers of the grid, shape (n_days,)
+            - values: float64 quantities, shape (n_series, n_days); NaN where a SKU has no row
+
+    Raises:
+        ValueError: If a SKU is not in the inventory
+    """
+    store = get_data_store()
+    histories = [store.product_sales(store.product_id(sku_id)) for sku_id in sku_ids]
+
+    lengths = np.array([len(history) for history in histories])
+    if lengths.sum() == 0:
+        return np.zeros(0, dtype=np.int64), np.full((len(sku_ids), 0), np.nan)
+
+    dates = np.concatenate([history['datetime_id'].to_numpy() for history in histories])
+    quantities = np.concatenate([history['qty_sold_kg'].to_numpy(dtype=np.float64) for history in histories])
+    days = day_numbers(dates)
+
+    start = days.min()
+    grid = np.arange(start, days.max() + 1, dtype=np.int64)
+    values = np.full((len(sku_ids), len(grid)), np.nan)
+    values[np.repeat(np.arange(len(sku_ids)), lengths), days - start] = quantities
+    return grid, values
+
+
+def fit_fourier(days, values, params=FOURIER_PARAMS):
+    """
+    Fit every series in one pass.
+
+    Missing values (NaN) are left out of each series' fit. When all series share
+    the same observed days a single factorization serves them all; otherwise the
+    per-series normal equations are solved as one batched call.
+
+    Args:
+        days (np.ndarray): Day numbers of the columns, shape (n_days,)
+        values (np.ndarray): Observations, shape (n_series, n_days)
+        params (dict): Model settings (default: FOURIER_PARAMS)
+
+    Returns:
+        dict: Fitted state with coef (n_series, n_features), sigma (n_series,),
+            last_day (n_series,), observed (bool mask) and the feature settings
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    observed = ~np.isnan(values)
+    t0 = float(days[0]) if len(days) else 0.0
+    span = float(max(days[-1] - days[0], 1)) if len(days) else 1.0
+
+    X = fourier_features(days, t0, span, params['weekly_order'], params['yearly_order'])
+    n_features = X.shape[1]
+
+    # Ridge penalty on the seasonal terms only; intercept and trend stay free
+    penalty = np.full(n_features, float(params['ridge']))
+    penalty[:2] = 0.0
+    penalty = np.diag(penalty)
+
+    y = np.where(observed, values, 0.0)
+    if len(values) and (observed == observed[0]).all():
+        # Shared observation pattern: one solve for every series
+        Xo = X[observed[0]]
+        gram = Xo.T @ Xo + penalty
+        rhs = Xo.T @ values[:, observed[0]].T
+        try:
+            coef = np.linalg.solve(gram, rhs).T
+        except np.linalg.LinAlgError:
+            # Zero or one observed days leave the trend unidentified; use the pseudo-inverse
+            coef = (np.linalg.pinv(gram) @ rhs).T
+    else:
+        weights = observed.astype(np.float64)
+        gram = np.einsum('nt,tk,tl->nkl', weights, X, X) + penalty
+        rhs = np.einsum('nt,tk->nk', y, X)
+        # Series with too few points fall back to the pseudo-inverse
+        coef = np.einsum('nkl,nl->nk', np.linalg.pinv(gram), rhs)
+
+    residuals = np.where(observed, values - coef @ X.T, 0.0)
+    n_observed = observed.sum(axis=1)
+    dof = np.maximum(n_observed - n_features, 1)
+    sigma = np.sqrt((residuals ** 2).sum(axis=1) / dof)
+
+    # Each series forecasts from its own last observed day
+    if len(days):
+        last_index = np.where(n_observed > 0, len(days) - 1 - np.argmax(observed[:, ::-1], axis=1), len(days) - 1)
+        last_day = np.asarray(days)[last_index]
+    else:
+        last_day = np.zeros(len(values), dtype=np.int64)
+
+    return {
+        'coef': coef,
+        'sigma': sigma,
+        'last_day': last_day,
+        'observed': observed,
+        't0': t0,
+        'span': span,
+        'params': dict(params),
+    }
+
+
+def predict_fourier(fit, days):
+    """
+    Predict fitted series at the given days.
+
+    Args:
+        fit (dict): Result of fit_fourier()
+        days (np.ndarray): Day numbers, shape (n_days,) shared by all series,
+            or (n_series, n_days) per series
+
+    Returns:
+        tuple: (yhat, yhat_lower, yhat_upper), each of shape (n_series, n_days)
+    """
+    params = fit['params']
+    X = fourier_features(days, fit['t0'], fit['span'], params['weekly_order'], params['yearly_order'])
+    if X.ndim == 2:
+        yhat = fit['coef'] @ X.T
+    else:
+        yhat = np.einsum('ntk,nk->nt', X, fit['coef'])
+
+    z = NormalDist().inv_cdf(0.5 + params['interval_width'] / 2.0)
+    half_width = z * fit['sigma'][:, None]
+    return yhat, yhat - half_width, yhat + half_width
+
+
+def _to_datetimes(days):
+    return (_EPOCH + np.asarray(days).astype('timedelta64[D]')).astype('datetime64[ns]')
+
+
+def forecast_many(sku_ids, forecast_days=7, params=FOURIER_PARAMS):
+    """
+    Forecast several SKUs with one vectorized fit.
+
+    Args:
+        sku_ids (list[str]): SKUs to forecast
+        forecast_days (int): Number of days to forecast (default: 7)
+        params (dict): Model settings (default: FOURIER_PARAMS)
+
+    Returns:
+        dict[str, tuple]: sku -> (forecast_df, total_forecast_days), where forecast_df
+            covers each observed history day plus the forecast days, like Prophet's
+
+    Raises:
+        ValueError: If a SKU is not in the inventory
+    """
+    days, values = sales_matrix(sku_ids)
+    fit = fit_fourier(days, values, params)
+
+    future_days = fit['last_day'][:, None] + np.arange(1, forecast_days + 1)
+    in_sample = predict_fourier(fit, days)
+    future = predict_fourier(fit, future_days)
+    totals = future[0].sum(axis=1)
+
+    results = {}
+    for i, sku_id in enumerate(sku_ids):
+        history = fit['observed'][i]
+        series_days = np.concatenate([days[history], future_days[i]])
+        columns = [np.concatenate([part[i][history], future_part[i]]) for part, future_part in zip(in_sample, future)]
+        forecast_df = pd.DataFrame({
+            'ds': _to_datetimes(series_days),
+            'yhat': columns[0],
+            'yhat_lower': columns[1],
+            'yhat_upper': columns[2],
+        })
+        results[sku_id] = (forecast_df, float(totals[i]))
+    return results
+
+
+def forecast_table(sku_ids, forecast_days=7, params=FOURIER_PARAMS):
+    """
+    Forecast several SKUs and return only the future days as one long table.
+
+    Args:
+        sku_ids (list[str]): SKUs to forecast
+        forecast_days (int): Number of days to forecast (default: 7)
+        params (dict): Model settings (default: FOURIER_PARAMS)
+
+    Returns:
+        pd.DataFrame: sku, ds, yhat, yhat_lower, yhat_upper; forecast_days rows per SKU
+    """
+    days, values = sales_matrix(sku_ids)
+    fit = fit_fourier(days, values, params)
+
+    future_days = fit['last_day'][:, None] + np.arange(1, forecast_days + 1)
+    yhat, lower, upper = predict_fourier(fit, future_days)
+    return pd.DataFrame({
+        'sku': np.repeat(np.asarray(sku_ids, dtype=object), forecast_days),
+        'ds': _to_datetimes(future_days.ravel()),
+        'yhat': yhat.ravel(),
+        'yhat_lower': lower.ravel(),
+        'yhat_upper': upper.ravel(),
+    })
+
+
+def forecast_errors(actual, predicted):
+    """
+    Summarize forecast accuracy.
+
+    Args:
+        actual (np.ndarray): Observed quantities
+        predicted (np.ndarray): Forecast quantities, same shape
+
+    Returns:
+        dict: mape (mean absolute percentage error over non-zero actuals),
+            wape (sum |error| / sum actual) and bias (sum error / sum actual)
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    error = np.asarray(predicted, dtype=np.float64) - actual
+    nonzero = actual != 0
+    total = np.abs(actual).sum()
+    return {
+        'mape': float(np.mean(np.abs(error[nonzero] / actual[nonzero]))) if nonzero.any() else float('nan'),
+        'wape': float(np.abs(error).sum() / total) if total else float('nan'),
+        'bias': float(error.sum() / total) if total else float('nan'),
+    }
+
+
+def compare_engines(skus='all', holdout=28, params=FOURIER_PARAMS):
+    """
+    Compare this forecaster with Prophet on held-out history.
+
+    The last `holdout` observations of each SKU are hidden, both engines are
+    fitted on the rest, and their predictions for the hidden days are scored.
+
+    Args:
+        skus (list[str] or str): SKUs to compare, or 'all' for the whole inventory
+        holdout (int): Trailing observations per SKU held out for scoring
+        params (dict): Fourier model settings (default: FOURIER_PARAMS)
+
+    Returns:
+        pd.DataFrame: One row per engine with seconds, mape, wape and bias
+    """
+    # Imported here: analysis_engine imports this module
+    from analysis_engine import PROPHET_PARAMS, load_prophet
+    from worker_pool import quiet_fit_logs
+
+    store = get_data_store()
+    sku_ids = store.skus() if skus is None or skus == 'all' or list(skus) == ['all'] else list(skus)
+    days, values = sales_matrix(sku_ids)
+
+    # Hide the last `holdout` observations of every series
+    observed = ~np.isnan(values)
+    rank_from_end = np.cumsum(observed[:, ::-1], axis=1)[:, ::-1]
+    hidden = observed & (rank_from_end <= holdout)
+    train = np.where(hidden, np.nan, values)
+    actual = values[hidden]
+
+    start = time.perf_counter()
+    fit = fit_fourier(days, train, params)
+    fourier_pred = predict_fourier(fit, days)[0][hidden]
+    fourier_seconds = time.perf_counter() - start
+
+    quiet_fit_logs()
+    Prophet = load_prophet()
+    # Prophet warns once per SKU that one year of history under-identifies yearly seasonality
+    logging.getLogger('prophet').setLevel(logging.ERROR)
+    start = time.perf_counter()
+    prophet_pred = []
+    for i in range(len(sku_ids)):
+        train_mask = observed[i] & ~hidden[i]
+        model = Prophet(**PROPHET_PARAMS)
+        model.fit(pd.DataFrame({'ds': _to_datetimes(days[train_mask]), 'y': values[i, train_mask]}))
+        prediction = model.predict(pd.DataFrame({'ds': _to_datetimes(days[hidden[i]])}))
+        prophet_pred.append(prediction['yhat'].to_numpy())
+    prophet_seconds = time.perf_counter() - start
+    prophet_pred = np.concatenate(prophet_pred) if prophet_pred else np.zeros(0)
+
+    rows = []
+    for engine, seconds, predicted in (
+        ('prophet', prophet_seconds, prophet_pred),
+        ('fourier', fourier_seconds, fourier_pred),
+    ):
+        rows.append({'engine': engine, 'skus': len(sku_ids), 'seconds': seconds, **forecast_errors(actual, predicted)})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized Fourier forecaster utilities.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compare_parser = subparsers.add_parser('compare', help="Score against Prophet on held-out history")
+    compare_parser.add_argument('skus', nargs='*', default=['all'], help="SKUs to compare, or 'all' (default)")
+    compare_parser.add_argument('--holdout', type=int, default=28, help="Held-out observations per SKU (default: 28)")
+    args = parser.parse_args(argv)
+
+    report = compare_engines(args.skus or 'all', args.holdout)
+    print(report.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    prophet_seconds, fourier_seconds = report['seconds'].iloc[0], report['seconds'].iloc[1]
+    print(f"Speedup: {prophet_seconds / max(fourier_seconds, 1e-9):.0f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Persistent forecast cache: an in-memory LRU in front of a SQLite store.
+
+Entries are keyed on (sku, forecast_days, model params, sales fingerprint),
+so a forecast is reused only while the SKU's sales history is unchanged.
+Both layers evict least-recently-used entries once they exceed their byte
+budget.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = '.cache'
+CACHE_PATH = os.path.join(CACHE_DIR, 'forecasts.sqlite')
+
+# Backtest folds get their own store and budget so a long backtest cannot evict live forecasts
+BACKTEST_CACHE_PATH = os.path.join(CACHE_DIR, 'backtest_folds.sqlite')
+
+# Aggregate-node fits for hierarchical reconciliation are kept out of the live cache too
+HIERARCHY_CACHE_PATH = os.path.join(CACHE_DIR, 'hierarchy.sqlite')
+
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    key TEXT PRIMARY KEY,
+    sku TEXT NOT NULL,
+    forecast_days INTEGER NOT NULL,
+    total REAL NOT NULL,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS forecasts_sku ON forecasts (sku);
+CREATE INDEX IF NOT EXISTS forecasts_last_access ON forecasts (last_access);
+"""
+
+
+def make_cache_key(sku_id, forecast_days, model_params, data_fingerprint):
+    """
+    Build the cache key for one forecast.
+
+    Args:
+        sku_id (str): The SKU identifier
+        forecast_days (int): Forecast horizon in days
+        model_params (dict): Keyword arguments the model was built with
+        data_fingerprint (str): Hash of the SKU's sales slice
+
+    Returns:
+        str: SHA-1 hex digest identifying the forecast
+    """
+    raw = json.dumps(
+        [sku_id, int(forecast_days), model_params, data_fingerprint],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ForecastCache:
+    """
+    Two-level forecast cache with size-based LRU eviction and hit/miss counters.
+
+    Args:
+        path (str): SQLite file for the persistent layer
+        max_disk_bytes (int): Byte budget for stored payloads on disk
+        max_memory_bytes (int): Byte budget for payloads held in memory
+    """
+
+    def __init__(self, path=CACHE_PATH, max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                 max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES):
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+            'invalidations': 0,
+        }
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _remember(self, key, entry):
+        """Put an entry in the memory layer and evict down to the byte budget."""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous['size']
+        self._memory[key] = entry
+        self._memory_bytes += entry['size']
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted['size']
+            self._counters['memory_evictions'] += 1
+
+    def get(self, key):
+        """
+        Look up a cached forecast.
+
+        Args:
+            key (str): Key from make_cache_key()
+
+        Returns:
+            tuple or None: (forecast_df, total_forecast_days), or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return entry['forecast_df'].copy(), entry['total']
+
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload, total, size, sku FROM forecasts WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self._counters['misses'] += 1
+                    return None
+                conn.execute("UPDATE forecasts SET last_access = ? WHERE key = ?", (time.time(), key))
+
+            payload, total, size, sku_id = row
+            forecast_df = pickle.loads(payload)
+            self._remember(key, {'forecast_df': forecast_df, 'total': total, 'size': size, 'sku': sku_id})
+            self._counters['disk_hits'] += 1
+            return forecast_df.copy(), total
+
+    def put(self, key, sku_id, forecast_days, forecast_df, total):
+        """
+        Store a forecast in both layers.
+
+        Args:
+            key (str): Key from make_cache_key()
+            sku_id (str): The SKU identifier (kept for invalidation)
+            forecast_days (int): Forecast horizon in days
+            forecast_df (pd.DataFrame): Forecast to store
+            total (float): Total forecasted sales for the horizon
+        """
+        payload = pickle.dumps(forecast_df, protocol=pickle.HIGHEST_PROTOCOL)
+        total = float(total)
+        with self._lock:
+            self._remember(key, {'forecast_df': forecast_df.copy(), 'total': total, 'size': len(payload),
+                                 'sku': sku_id})
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, sku_id, int(forecast_days), total, payload, len(payload), time.time()),
+                )
+                self._evict_disk(conn)
+            self._counters['writes'] += 1
+
+    def _evict_disk(self, conn):
+        """Delete least-recently-used rows until the store fits its byte budget."""
+        stored = conn.execute("SELECT COALESCE(SUM(size), 0) FROM forecasts").fetchone()[0]
+        if stored <= self.max_disk_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM forecasts ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows[:-1]:
+            if stored <= self.max_disk_bytes:
+                break
+            evicted.append((key,))
+            stored -= size
+        conn.executemany("DELETE FROM forecasts WHERE key = ?", evicted)
+        self._counters['disk_evictions'] += len(evicted)
+
+    def invalidate(self, sku_ids):
+        """
+        Drop every cached forecast for the given SKUs, e.g. after new sales arrive.
+
+        Args:
+            sku_ids (list[str]): SKUs whose forecasts are stale
+
+        Returns:
+            int: Number of disk entries removed
+        """
+        sku_ids = set(sku_ids)
+        with self._lock:
+            for key in [key for key, entry in self._memory.items() if entry['sku'] in sku_ids]:
+                self._memory_bytes -= self._memory.pop(key)['size']
+            with self._connect() as conn:
+                removed = conn.executemany(
+                    "DELETE FROM forecasts WHERE sku = ?", [(sku_id,) for sku_id in sku_ids]
+                ).rowcount
+            self._counters['invalidations'] += removed
+            return removed
+
+    def clear(self):
+        """Drop every cached forecast from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            with self._connect() as conn:
+                conn.execute("DELETE FROM forecasts")
+
+    def stats(self):
+        """
+        Get cache counters and sizes.
+
+        Returns:
+            dict: Hit/miss/eviction counters plus entry counts and byte usage per layer
+        """
+        with self._lock:
+            with self._connect() as conn:
+                entries, stored = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM forecasts"
+                ).fetchone()
+            stats = dict(self._counters)
+            stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+            stats['disk_entries'] = entries
+            stats['disk_bytes'] = stored
+            return stats
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_forecast_cache():
+    """
+    Get the process-wide ForecastCache at CACHE_PATH.
+
+    Returns:
+        ForecastCache: The shared forecast cache
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ForecastCache()
+        return _default_cache
+
+
+_backtest_cache = None
+
+
+def get_backtest_cache():
+    """
+    Get the process-wide ForecastCache for backtest folds, at BACKTEST_CACHE_PATH.
+
+    Returns:
+        ForecastCache: The shared backtest fold cache
+    """
+    global _backtest_cache
+    with _default_cache_lock:
+        if _backtest_cache is None:
+            _backtest_cache = ForecastCache(BACKTEST_CACHE_PATH)
+        return _backtest_cache
+
+
+_hierarchy_cache = None
+
+
+def get_hierarchy_cache():
+    """
+    Get the process-wide ForecastCache for hierarchy aggregate nodes, at HIERARCHY_CACHE_PATH.
+
+    Returns:
+        ForecastCache: The shared hierarchy node cache
+    """
+    global _hierarchy_cache
+    with _default_cache_lock:
+        if _hierarchy_cache is None:
+            _hierarchy_cache = ForecastCache(HIERARCHY_CACHE_PATH)
+        return _hierarchy_cache
@@ -0,0 +1,199 @@
+"""
+Background forecast jobs.
+
+get_forecast() calls are queued on a worker pool and tracked through job
+handles that the dashboard can poll. Concurrent requests for the same
+(sku, forecast_days) share one job, so two users asking for VEG0001 at
+the same time trigger a single fit.
+
+Workers are threads: the Stan optimization runs in a cmdstan subprocess, so
+fits proceed in parallel while the jobs stay in-process, where progress and
+results are visible to every Streamlit session without pickling. The first
+worker loads Prophet in the background as soon as the scheduler is created,
+so the first forecast does not pay for the import.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis_engine import forecast_version, get_forecast, warm_up
+
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_FINISHED_JOBS = 256
+
+# Refits allowed when sales are ingested while a job is fitting
+MAX_VERSION_RETRIES = 3
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ForecastJob:
+    """
+    Handle for one background forecast.
+
+    Attributes:
+        job_id (str): Unique job identifier
+        sku_id (str): The SKU being forecast
+        forecast_days (int): Forecast horizon in days
+        status (str): 'queued', 'running', 'done' or 'failed'
+        stage (str): Current stage reported by get_forecast()
+        progress (float): Completion fraction in [0, 1]
+        result (tuple): (model, forecast_df, total_forecast_days) once done
+        version (str): forecast_version() of the result once done
+        error (str): Error message if the job failed
+    """
+
+    def __init__(self, job_id, sku_id, forecast_days):
+        self.job_id = job_id
+        self.sku_id = sku_id
+        self.forecast_days = forecast_days
+        self.status = QUEUED
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.version = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        """True once the job has succeeded or failed."""
+        return self.status in (DONE, FAILED)
+
+    def wait(self, timeout=None):
+        """
+        Block until the job finishes.
+
+        Args:
+            timeout (float): Seconds to wait (default: forever)
+
+        Returns:
+            bool: True if the job finished within the timeout
+        """
+        return self._done.wait(timeout)
+
+    def _update_progress(self, stage, fraction):
+        self.stage = stage
+        self.progress = max(self.progress, min(float(fraction), 1.0))
+
+
+class ForecastJobScheduler:
+    """
+    Runs get_forecast() on a worker pool and de-duplicates identical requests.
+
+    Args:
+        max_workers (int): Concurrent forecast jobs
+        max_finished_jobs (int): Finished jobs kept for polling before being forgotten
+        prewarm (bool): Load Prophet on a worker right away instead of on the first job
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS, prewarm=True):
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='forecast-job')
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._active = {}
+        if prewarm:
+            # Jobs submitted meanwhile run on the other workers and wait for the import if needed
+            self._executor.submit(warm_up)
+
+    def submit(self, sku_id, forecast_days=7):
+        """
+        Queue a forecast, or join the in-flight job for the same SKU and horizon.
+
+        Args:
+            sku_id (str): The SKU identifier (e.g., 'VEG0001')
+            forecast_days (int): Number of days to forecast (default: 7)
+
+        Returns:
+            ForecastJob: Handle to poll for status, progress and result
+        """
+        key = (sku_id, int(forecast_days))
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job
+
+            job = ForecastJob(f"job-{next(self._ids)}", sku_id, int(forecast_days))
+            self._jobs[job.job_id] = job
+            self._active[key] = job
+            self._forget_finished()
+
+        self._executor.submit(self._run, key, job)
+        return job
+
+    def get(self, job_id):
+        """
+        Look up a job by id.
+
+        Args:
+            job_id (str): Identifier from ForecastJob.job_id
+
+        Returns:
+            ForecastJob or None: The job, or None if unknown or already forgotten
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, key, job):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            # The version must describe the history the result was fitted on. If an
+            # ingestion lands mid-fit the two reads differ and the fit is redone
+            for _ in range(MAX_VERSION_RETRIES):
+                version = forecast_version(job.sku_id, job.forecast_days)
+                result = get_forecast(job.sku_id, job.forecast_days, progress=job._update_progress)
+                if forecast_version(job.sku_id, job.forecast_days) == version:
+                    break
+            else:
+                raise RuntimeError(f"Sales for {job.sku_id} kept changing during the forecast; try again")
+            job.version = version
+            job.result = result
+            job._update_progress('done', 1.0)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active.pop(key, None)
+            job._done.set()
+
+    def _forget_finished(self):
+        """Drop the oldest finished jobs beyond max_finished_jobs."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and release the worker pool."""
+        self._executor.shutdown(wait=wait)
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_job_scheduler():
+    """
+    Get the process-wide ForecastJobScheduler.
+
+    Returns:
+        ForecastJobScheduler: The shared scheduler
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = ForecastJobScheduler()
+        return _default_scheduler
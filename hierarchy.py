@@ -0,0 +1,490 @@
+"""
+Hierarchical forecasting over total, category, subcategory and product.
+
+Every node of the hierarchy gets a base forecast: the Fourier engine fits all
+nodes in one vectorized pass, and the Prophet engine fits each aggregate on the
+warm worker pool while products reuse get_forecast(). The base forecasts are
+then reconciled with a summing matrix S so that every level adds up:
+
+    reconciled = S @ G @ base,    G = (S' W^-1 S)^-1 S' W^-1
+
+where W is the identity (ols), node sizes (wls_struct), in-sample residual
+variances (wls_var) or a shrunk residual covariance (mint_shrink); bottom_up
+simply sums the product forecasts. Reconciled sets are memoized per data
+version, so category and subcategory forecasts are served without extra fits.
+
+Usage:
+    python hierarchy.py --level category
+    python hierarchy.py --engine prophet --method bottom_up --output hierarchy.csv
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from analysis_engine import ENGINE_PARAMS, fit_forecast, get_forecast, validate_engine
+from batch_forecast import write_table
+from data_store import get_data_store
+from fast_forecast import _EPOCH, _to_datetimes, fit_fourier, predict_fourier, sales_matrix
+from forecast_cache import get_hierarchy_cache, make_cache_key
+from worker_pool import get_worker_pool, quiet_fit_logs
+
+LEVELS = ['total', 'category', 'subcategory', 'product']
+METHODS = ['bottom_up', 'ols', 'wls_struct', 'wls_var', 'mint_shrink']
+
+# Interval width of the reconciled bands (matches Prophet's default)
+INTERVAL_WIDTH = 0.8
+
+MAX_MEMOIZED_RESULTS = 8
+
+
+def build_hierarchy(skus=None):
+    """
+    Describe the product hierarchy and its summing matrix.
+
+    Args:
+        skus (list[str]): Bottom-level SKUs (default: the whole inventory)
+
+    Returns:
+        tuple: (nodes, S)
+            - nodes: DataFrame with node, level, category, subcategory, sku, one row per
+              node (total first, products last)
+            - S: float64 summing matrix, shape (n_nodes, n_products)
+    """
+    store = get_data_store()
+    skus = store.skus() if skus is None else list(skus)
+    products = pd.DataFrame([
+        {'sku': sku_id,
+         'category': str(store.inventory_rows(sku_id)['category'].iloc[0]),
+         'subcategory': str(store.inventory_rows(sku_id)['subcategory'].iloc[0])}
+        for sku_id in skus
+    ])
+
+    # Subcategory names repeat across categories (e.g. Chicken), so key them by both
+    categories = sorted(products['category'].unique())
+    subcategories = sorted(set(zip(products['category'], products['subcategory'])))
+
+    rows = [{'node': 'total', 'level': 'total', 'category': None, 'subcategory': None, 'sku': None}]
+    rows += [{'node': f"category:{category}", 'level': 'category', 'category': category,
+              'subcategory': None, 'sku': None} for category in categories]
+    rows += [{'node': f"subcategory:{category}/{subcategory}", 'level': 'subcategory', 'category': category,
+              'subcategory': subcategory, 'sku': None} for category, subcategory in subcategories]
+    rows += [{'node': f"product:{row.sku}", 'level': 'product', 'category': row.category,
+              'subcategory': row.subcategory, 'sku': row.sku} for row in products.itertuples()]
+    nodes = pd.DataFrame(rows)
+
+    n_aggregates = 1 + len(categories) + len(subcategories)
+    S = np.zeros((len(nodes), len(products)))
+    S[0] = 1.0
+    category_row = {category: 1 + i for i, category in enumerate(categories)}
+    subcategory_row = {key: 1 + len(categories) + i for i, key in enumerate(subcategories)}
+    columns = np.arange(len(products))
+    S[[category_row[c] for c in products['category']], columns] = 1.0
+    S[[subcategory_row[key] for key in zip(products['category'], products['subcategory'])], columns] = 1.0
+    S[n_aggregates + columns, columns] = 1.0
+    return nodes, S
+
+
+def _aggregate(S, values):
+    """Aggregate bottom series; a node is missing on a day if any of its products is."""
+    observed = ~np.isnan(values)
+    totals = S @ np.where(observed, values, 0.0)
+    missing = S @ (~observed).astype(np.float64) > 0
+    return np.where(missing, np.nan, totals)
+
+
+def shrink_covariance(residuals):
+    """
+    Shrink the residual covariance towards its diagonal (Schafer-Strimmer, as used by MinT).
+
+    Only days on which every node has a residual are used.
+
+    Args:
+        residuals (np.ndarray): In-sample residuals, shape (n_nodes, n_days), NaN where missing
+
+    Returns:
+        np.ndarray: Positive-definite covariance estimate, shape (n_nodes, n_nodes)
+    """
+    X = residuals[:, ~np.isnan(residuals).any(axis=0)].T
+    n = X.shape[0]
+    if n < 2:
+        # Too few common days: fall back to per-node variances
+        variances = np.nanmean(residuals ** 2, axis=1)
+        return np.diag(np.where(np.isfinite(variances) & (variances > 0), variances, 1.0))
+
+    covariance = X.T @ X / n
+    sd = np.sqrt(np.diag(covariance))
+    sd = np.where(sd > 0, sd, 1.0)
+    correlation = covariance / np.outer(sd, sd)
+    Xs = X / sd
+    v = (Xs ** 2).T @ (Xs ** 2) / (n * (n - 1)) - (Xs.T @ Xs) ** 2 / (n ** 2 * (n - 1))
+    np.fill_diagonal(v, 0.0)
+    d = correlation - np.eye(len(sd))
+    lam = float(np.clip(v.sum() / max((d ** 2).sum(), 1e-12), 0.0, 1.0))
+    target = np.diag(np.diag(covariance))
+    shrunk = lam * target + (1.0 - lam) * covariance
+    # Nodes with zero variance would make W singular
+    shrunk[np.diag_indices_from(shrunk)] = np.where(np.diag(shrunk) > 0, np.diag(shrunk), 1.0)
+    return shrunk
+
+
+def reconciliation_matrix(S, method, covariance=None):
+    """
+    Build G so that S @ G @ base is a coherent forecast.
+
+    Args:
+        S (np.ndarray): Summing matrix, shape (n_nodes, n_products)
+        method (str): One of METHODS
+        covariance (np.ndarray): Residual covariance (needed for wls_var and mint_shrink)
+
+    Returns:
+        np.ndarray: G, shape (n_products, n_nodes)
+
+    Raises:
+        ValueError: If the method is unknown
+    """
+    n_nodes, n_products = S.shape
+    if method == 'bottom_up':
+        G = np.zeros((n_products, n_nodes))
+        G[:, n_nodes - n_products:] = np.eye(n_products)
+        return G
+    if method == 'ols':
+        weights = np.ones(n_nodes)
+    elif method == 'wls_struct':
+        weights = S.sum(axis=1)
+    elif method == 'wls_var':
+        weights = np.diag(covariance)
+    elif method == 'mint_shrink':
+        W_inv_S = np.linalg.solve(covariance, S)
+        return np.linalg.solve(S.T @ W_inv_S, W_inv_S.T)
+    else:
+        raise ValueError(f"Unknown reconciliation method '{method}' (expected one of: {', '.join(METHODS)})")
+
+    W_inv_S = S / weights[:, None]
+    return np.linalg.solve(S.T @ W_inv_S, W_inv_S.T)
+
+
+def _fit_node(ds, y, forecast_days):
+    """Fit one aggregate series with Prophet. Runs inside a worker process."""
+    _, forecast_df, _ = fit_forecast(pd.DataFrame({'ds': ds, 'y': y}), forecast_days)
+    return forecast_df[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+
+def _series_fingerprint(days, y):
+    digest = hashlib.sha1()
+    digest.update(np.asarray(days, dtype=np.int32).tobytes())
+    digest.update(np.asarray(y, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def _fourier_base(days, node_values, forecast_days, params):
+    """Base forecasts and in-sample residuals for every node in one vectorized fit."""
+    fit = fit_fourier(days, node_values, params)
+    future_days = days[-1] + np.arange(1, forecast_days + 1)
+    base = predict_fourier(fit, future_days)
+    residuals = node_values - predict_fourier(fit, days)[0]
+    return future_days, base, residuals
+
+
+def _prophet_base(nodes, days, node_values, forecast_days, params):
+    """Base forecasts and in-sample residuals: products via get_forecast(), aggregates on the pool."""
+    cache = get_hierarchy_cache()
+    n_nodes = len(nodes)
+    frames = [None] * n_nodes
+
+    # Aggregates first, so the pool works while products are served in this process
+    pending = {}
+    workers = os.cpu_count() or 1
+    for i, node in enumerate(nodes.itertuples()):
+        if node.level == 'product':
+            continue
+        observed = ~np.isnan(node_values[i])
+        key = make_cache_key(node.node, forecast_days, params,
+                             _series_fingerprint(days[observed], node_values[i, observed]))
+        cached = cache.get(key)
+        if cached is not None:
+            frames[i] = cached[0]
+            continue
+        args = (_to_datetimes(days[observed]), node_values[i, observed], forecast_days)
+        if workers == 1:
+            quiet_fit_logs()
+            frames[i] = _fit_node(*args)
+            cache.put(key, node.node, forecast_days, frames[i], frames[i]['yhat'].tail(forecast_days).sum())
+        else:
+            pending[i] = (key, get_worker_pool().submit(_fit_node, *args))
+
+    for i, node in enumerate(nodes.itertuples()):
+        if node.level == 'product':
+            frames[i] = get_forecast(node.sku, forecast_days)[1]
+
+    for i, (key, future) in pending.items():
+        frames[i] = future.result()
+        cache.put(key, nodes['node'].iloc[i], forecast_days, frames[i], frames[i]['yhat'].tail(forecast_days).sum())
+
+    # Every frame is aligned by ds on the shared daily grid, so a node whose history ends
+    # early cannot shift its forecast onto the wrong days
+    future_days = days[-1] + np.arange(1, forecast_days + 1)
+    base = tuple(np.empty((n_nodes, forecast_days)) for _ in range(3))
+    residuals = np.full_like(node_values, np.nan)
+    for i, frame in enumerate(frames):
+        frame_days = (frame['ds'].to_numpy().astype('datetime64[D]') - _EPOCH).astype(np.int64)
+        if not np.isin(future_days, frame_days).all():
+            history_end = (_EPOCH + frame_days[max(len(frame_days) - forecast_days - 1, 0)]).astype('datetime64[D]')
+            raise ValueError(f"Forecast for {nodes['node'].iloc[i]!r} does not cover the shared horizon: "
+                             f"its history ends on {history_end}, not {(_EPOCH + days[-1]).astype('datetime64[D]')}")
+        positions = np.searchsorted(frame_days, future_days)
+        for out, column in zip(base, ('yhat', 'yhat_lower', 'yhat_upper')):
+            out[i] = frame[column].to_numpy()[positions]
+        columns = frame_days - days[0]
+        in_grid = (columns >= 0) & (columns < len(days))
+        residuals[i, columns[in_grid]] = node_values[i, columns[in_grid]] - frame['yhat'].to_numpy()[in_grid]
+    return future_days, base, residuals
+
+
+class HierarchicalForecast:
+    """
+    A reconciled forecast for every node of the hierarchy.
+
+    Attributes:
+        nodes (pd.DataFrame): node, level, category, subcategory, sku per row
+        ds (pd.DatetimeIndex): Forecast days
+        base (np.ndarray): Base (unreconciled) yhat, shape (n_nodes, forecast_days)
+        yhat, yhat_lower, yhat_upper (np.ndarray): Reconciled forecast and bands, same shape
+        method (str): Reconciliation method
+        engine (str): Engine of the base forecasts
+    """
+
+    def __init__(self, nodes, ds, base, yhat, yhat_lower, yhat_upper, method, engine):
+        self.nodes = nodes
+        self.ds = ds
+        self.base = base
+        self.yhat = yhat
+        self.yhat_lower = yhat_lower
+        self.yhat_upper = yhat_upper
+        self.method = method
+        self.engine = engine
+        self._row = {node: i for i, node in enumerate(nodes['node'])}
+
+    def _node_row(self, level, name=None, category=None):
+        if level == 'total':
+            node = 'total'
+        elif level == 'category':
+            node = f"category:{name}"
+        elif level == 'subcategory':
+            if category is None:
+                matches = self.nodes[(self.nodes['level'] == 'subcategory') & (self.nodes['subcategory'] == name)]
+                if len(matches) != 1:
+                    raise ValueError(f"Subcategory '{name}' is ambiguous or unknown; pass its category")
+                category = matches['category'].iloc[0]
+            node = f"subcategory:{category}/{name}"
+        elif level == 'product':
+            node = f"product:{name}"
+        else:
+            raise ValueError(f"Unknown level '{level}' (expected one of: {', '.join(LEVELS)})")
+        if node not in self._row:
+            raise ValueError(f"No {level} '{name}' in the hierarchy")
+        return self._row[node]
+
+    def forecast(self, level, name=None, category=None):
+        """
+        Get one node's reconciled forecast.
+
+        Args:
+            level (str): 'total', 'category', 'subcategory' or 'product'
+            name (str): Category, subcategory or SKU (not needed for 'total')
+            category (str): Parent category, for subcategory names used in several categories
+
+        Returns:
+            tuple: (forecast_df, total_forecast_days) with ds, yhat, yhat_lower, yhat_upper
+
+        Raises:
+            ValueError: If the node does not exist
+        """
+        i = self._node_row(level, name, category)
+        forecast_df = pd.DataFrame({
+            'ds': self.ds,
+            'yhat': self.yhat[i],
+            'yhat_lower': self.yhat_lower[i],
+            'yhat_upper': self.yhat_upper[i],
+        })
+        return forecast_df, float(self.yhat[i].sum())
+
+    def table(self, level=None):
+        """
+        Get the reconciled forecasts as one long table.
+
+        Args:
+            level (str): Only this level (default: every node)
+
+        Returns:
+            pd.DataFrame: node, level, category, subcategory, sku, ds, base_yhat,
+                yhat, yhat_lower, yhat_upper
+        """
+        rows = np.arange(len(self.nodes)) if level is None else np.flatnonzero(self.nodes['level'] == level)
+        horizon = len(self.ds)
+        table = self.nodes.iloc[np.repeat(rows, horizon)].reset_index(drop=True)
+        table['ds'] = np.tile(self.ds, len(rows))
+        table['base_yhat'] = self.base[rows].ravel()
+        table['yhat'] = self.yhat[rows].ravel()
+        table['yhat_lower'] = self.yhat_lower[rows].ravel()
+        table['yhat_upper'] = self.yhat_upper[rows].ravel()
+        return table
+
+    def totals(self, level=None):
+        """
+        Get each node's total over the forecast days.
+
+        Args:
+            level (str): Only this level (default: every node)
+
+        Returns:
+            pd.DataFrame: Node columns plus base_total and total
+        """
+        rows = np.arange(len(self.nodes)) if level is None else np.flatnonzero(self.nodes['level'] == level)
+        totals = self.nodes.iloc[rows].reset_index(drop=True)
+        totals['base_total'] = self.base[rows].sum(axis=1)
+        totals['total'] = self.yhat[rows].sum(axis=1)
+        return totals
+
+
+def reconcile_forecasts(forecast_days=7, method='mint_shrink', engine='fourier', skus=None):
+    """
+    Forecast every hierarchy node and reconcile the results (no memoization).
+
+    Args:
+        forecast_days (int): Number of days to forecast (default: 7)
+        method (str): One of METHODS (default: 'mint_shrink')
+        engine (str): Base forecast engine, 'fourier' (default) or 'prophet'
+        skus (list[str]): Bottom-level SKUs (default: the whole inventory)
+
+    Returns:
+        HierarchicalForecast: Reconciled forecasts for every node
+
+    Raises:
+        ValueError: If the method or engine is unknown
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown reconciliation method '{method}' (expected one of: {', '.join(METHODS)})")
+    params = validate_engine(engine)
+
+    nodes, S = build_hierarchy(skus)
+    days, values = sales_matrix(list(nodes['sku'].iloc[-S.shape[1]:]))
+    node_values = _aggregate(S, values)
+
+    if engine == 'fourier':
+        future_days, (yhat, lower, upper), residuals = _fourier_base(days, node_values, forecast_days, params)
+    else:
+        future_days, (yhat, lower, upper), residuals = _prophet_base(nodes, days, node_values, forecast_days, params)
+
+    covariance = shrink_covariance(residuals)
+    G = reconciliation_matrix(S, method, covariance)
+    P = S @ G
+    reconciled = P @ yhat
+
+    # Rescale each node's band by how reconciliation changes its forecast variance
+    base_variance = np.diag(covariance)
+    reconciled_variance = np.einsum('ij,jk,ik->i', P, covariance, P)
+    scale = np.sqrt(np.maximum(reconciled_variance, 0.0) / base_variance)[:, None]
+    z = NormalDist().inv_cdf(0.5 + INTERVAL_WIDTH / 2.0)
+    half_width = np.where(np.isfinite(upper - lower), (upper - lower) / 2.0, z * np.sqrt(base_variance)[:, None])
+    half_width = half_width * scale
+
+    return HierarchicalForecast(
+        nodes=nodes,
+        ds=pd.DatetimeIndex(_to_datetimes(future_days)),
+        base=yhat,
+        yhat=reconciled,
+        yhat_lower=reconciled - half_width,
+        yhat_upper=reconciled + half_width,
+        method=method,
+        engine=engine,
+    )
+
+
+_memoized = OrderedDict()
+_memoized_lock = threading.Lock()
+
+
+def get_hierarchical_forecast(forecast_days=7, method='mint_shrink', engine='fourier'):
+    """
+    Get the reconciled forecast for the whole inventory, memoized per data version.
+
+    The result is reused until any product's sales history changes, so repeated
+    category or subcategory queries never refit.
+
+    Args:
+        forecast_days (int): Number of days to forecast (default: 7)
+        method (str): One of METHODS (default: 'mint_shrink')
+        engine (str): Base forecast engine, 'fourier' (default) or 'prophet'
+
+    Returns:
+        HierarchicalForecast: Reconciled forecasts for every node (shared; do not modify)
+    """
+    store = get_data_store()
+    data_version = hashlib.sha1()
+    for sku_id in store.skus():
+        data_version.update(sku_id.encode('utf-8'))
+        data_version.update(store.product_fingerprint(store.product_id(sku_id)).encode('ascii'))
+    key = make_cache_key('hierarchy', forecast_days, {'method': method, 'engine': engine,
+                                                      **ENGINE_PARAMS.get(engine, {})}, data_version.hexdigest())
+
+    with _memoized_lock:
+        result = _memoized.get(key)
+        if result is not None:
+            _memoized.move_to_end(key)
+            return result
+
+    result = reconcile_forecasts(forecast_days, method, engine)
+    with _memoized_lock:
+        _memoized[key] = result
+        while len(_memoized) > MAX_MEMOIZED_RESULTS:
+            _memoized.popitem(last=False)
+    return result
+
+
+def get_aggregate_forecast(level, name=None, forecast_days=7, method='mint_shrink', engine='fourier', category=None):
+    """
+    Get a reconciled total, category, subcategory or product forecast.
+
+    Args:
+        level (str): 'total', 'category', 'subcategory' or 'product'
+        name (str): Category, subcategory or SKU (not needed for 'total')
+        forecast_days (int): Number of days to forecast (default: 7)
+        method (str): One of METHODS (default: 'mint_shrink')
+        engine (str): Base forecast engine, 'fourier' (default) or 'prophet'
+        category (str): Parent category, for subcategory names used in several categories
+
+    Returns:
+        tuple: (forecast_df, total_forecast_days)
+    """
+    return get_hierarchical_forecast(forecast_days, method, engine).forecast(level, name, category)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconciled forecasts by category, subcategory and product.")
+    parser.add_argument('--days', type=int, default=7, help="Forecast horizon in days (default: 7)")
+    parser.add_argument('--method', choices=METHODS, default='mint_shrink', help="Reconciliation method")
+    parser.add_argument('--engine', choices=list(ENGINE_PARAMS), default='fourier', help="Base forecast engine")
+    parser.add_argument('--level', choices=LEVELS, default=None, help="Only print/write this level")
+    parser.add_argument('--output', default=None, help="Forecast table (.csv or .parquet)")
+    args = parser.parse_args(argv)
+
+    result = reconcile_forecasts(args.days, args.method, args.engine)
+    if args.output:
+        write_table(result.table(args.level), args.output)
+        print(f"Forecast table written to {args.output}")
+
+    totals = result.totals(args.level or 'category')
+    columns = [column for column in ('node', 'base_total', 'total') if column in totals]
+    print(totals[columns].to_string(index=False, float_format=lambda value: f"{value:,.1f}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
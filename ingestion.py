@@ -0,0 +1,213 @@
+"""
+Append-only ingestion of daily sales into a partitioned Parquet store.
+
+The store lives in SALES_STORE_DIR, partitioned by month:
+    sales_store/month=202501/part-202501.parquet      bulk-loaded history
+    sales_store/month=202501/part-20250116.parquet    one file per ingested batch
+    sales_store/_manifest.json                         file list + last date per product
+
+Once the store exists the data store reads sales from it instead of
+daily_sales.csv. Ingestion assumes a single writer (e.g. the nightly job).
+
+Usage:
+    python ingestion.py build
+    python ingestion.py ingest new_sales.csv
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+import pandas as pd
+
+from data_store import (
+    SALES_DTYPES,
+    SALES_MANIFEST_NAME,
+    SALES_PATH,
+    SALES_STORE_DIR,
+    get_data_store,
+    read_sales_manifest,
+)
+from forecast_cache import get_forecast_cache
+
+REQUIRED_COLUMNS = list(SALES_DTYPES)
+
+
+def _month_dir(root, month):
+    return os.path.join(root, f"month={month}")
+
+
+def _write_manifest(root, manifest):
+    """Replace the manifest atomically; readers key reloads off this file."""
+    path = os.path.join(root, SALES_MANIFEST_NAME)
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_sales_store(csv_path=SALES_PATH, root=SALES_STORE_DIR):
+    """
+    Bulk-load a sales CSV into a fresh sales store, one file per month.
+
+    Args:
+        csv_path (str): Source CSV with datetime_id, product_id, qty_sold_kg
+        root (str): Sales store directory (must not already hold a store)
+
+    Returns:
+        dict: The written manifest
+
+    Raises:
+        ValueError: If the store already exists
+    """
+    if read_sales_manifest(root) is not None:
+        raise ValueError(f"Sales store already exists at {root}")
+
+    sales_df = pd.read_csv(csv_path, dtype=SALES_DTYPES)
+    months = (sales_df['datetime_id'] // 100).to_numpy()
+
+    files = []
+    for month, positions in pd.Series(range(len(sales_df))).groupby(months).indices.items():
+        os.makedirs(_month_dir(root, month), exist_ok=True)
+        name = os.path.join(f"month={month}", f"part-{month}.parquet")
+        sales_df.iloc[positions].to_parquet(os.path.join(root, name), index=False)
+        files.append(name)
+
+    last_dates = sales_df.groupby('product_id')['datetime_id'].max()
+    manifest = {
+        'version': 1,
+        'files': files,
+        'last_datetime_id': {str(product_id): int(date) for product_id, date in last_dates.items()},
+    }
+    _write_manifest(root, manifest)
+    return manifest
+
+
+def validate_sales_batch(batch_df, manifest):
+    """
+    Check a sales batch before it is appended.
+
+    Args:
+        batch_df (pd.DataFrame): New rows with datetime_id, product_id, qty_sold_kg
+        manifest (dict): Current sales store manifest
+
+    Returns:
+        pd.DataFrame: The batch with SALES_DTYPES, sorted by date then product
+
+    Raises:
+        ValueError: If the batch is malformed, references unknown products, or is
+            not strictly newer than the stored history of each product
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in batch_df.columns]
+    if missing:
+        raise ValueError(f"Sales batch is missing columns: {', '.join(missing)}")
+    if batch_df.empty:
+        raise ValueError("Sales batch is empty")
+    if batch_df[REQUIRED_COLUMNS].isna().any().any():
+        raise ValueError("Sales batch contains missing values")
+
+    batch = batch_df[REQUIRED_COLUMNS].astype(SALES_DTYPES)
+
+    dates = pd.to_datetime(batch['datetime_id'].astype(str), format='%Y%m%d', errors='coerce')
+    if dates.isna().any():
+        raise ValueError("Sales batch contains invalid datetime_id values (expected YYYYMMDD)")
+    if (batch['qty_sold_kg'] < 0).any():
+        raise ValueError("Sales batch contains negative qty_sold_kg")
+    if batch.duplicated(['datetime_id', 'product_id']).any():
+        raise ValueError("Sales batch contains duplicate (datetime_id, product_id) rows")
+
+    store = get_data_store()
+    unknown = sorted({int(pid) for pid in batch['product_id'].unique() if store.sku(pid) is None})
+    if unknown:
+        raise ValueError(f"Sales batch references unknown product_id(s): {unknown}")
+
+    # Append-only: every row must be newer than the product's last stored day
+    last_dates = batch['product_id'].astype(str).map(manifest['last_datetime_id']).fillna(0)
+    stale = batch[batch['datetime_id'] <= last_dates]
+    if not stale.empty:
+        row = stale.iloc[0]
+        raise ValueError(
+            f"Sales for product_id {int(row['product_id'])} on {int(row['datetime_id'])} "
+            f"are not newer than the stored history"
+        )
+
+    return batch.sort_values(['datetime_id', 'product_id'], kind='stable').reset_index(drop=True)
+
+
+def ingest_daily_sales(batch_df, root=SALES_STORE_DIR):
+    """
+    Validate a new sales batch and append it to the sales store.
+
+    The batch is written as new Parquet files (one per month it touches) and the
+    in-memory per-product indexes are extended in place. Cached forecasts of the
+    affected SKUs are dropped; other SKUs keep theirs.
+
+    Args:
+        batch_df (pd.DataFrame): New rows with datetime_id, product_id, qty_sold_kg
+        root (str): Sales store directory (built from daily_sales.csv if missing)
+
+    Returns:
+        list[str]: SKUs whose sales history changed
+    """
+    manifest = read_sales_manifest(root)
+    if manifest is None:
+        manifest = build_sales_store(root=root)
+
+    batch = validate_sales_batch(batch_df, manifest)
+
+    # One new file per month touched, named after the batch's first day
+    months = (batch['datetime_id'] // 100).to_numpy()
+    for month, positions in pd.Series(range(len(batch))).groupby(months).indices.items():
+        part = batch.iloc[positions]
+        os.makedirs(_month_dir(root, month), exist_ok=True)
+        name = os.path.join(f"month={month}", f"part-{int(part['datetime_id'].min())}.parquet")
+        if os.path.exists(os.path.join(root, name)):
+            name = os.path.join(f"month={month}", f"part-{int(part['datetime_id'].min())}-v{manifest['version'] + 1}.parquet")
+        part.to_parquet(os.path.join(root, name), index=False)
+        manifest['files'].append(name)
+
+    for product_id, date in batch.groupby('product_id')['datetime_id'].max().items():
+        manifest['last_datetime_id'][str(int(product_id))] = int(date)
+    manifest['version'] += 1
+    _write_manifest(root, manifest)
+
+    # Incremental index update, then mark only the affected SKUs' forecasts stale
+    store = get_data_store()
+    if os.path.abspath(root) == os.path.abspath(store.sales_store_dir):
+        store.append_sales(batch)
+
+    affected = [store.sku(product_id) for product_id in batch['product_id'].unique()]
+    get_forecast_cache().invalidate(affected)
+
+    return affected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the partitioned sales store.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Bulk-load daily_sales.csv into a new store")
+    build_parser.add_argument('--csv', default=SALES_PATH, help="Source sales CSV")
+
+    ingest_parser = subparsers.add_parser('ingest', help="Append a new sales batch (CSV)")
+    ingest_parser.add_argument('batch', help="CSV with datetime_id, product_id, qty_sold_kg")
+
+    parser.add_argument('--root', default=SALES_STORE_DIR, help="Sales store directory")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'build':
+            manifest = build_sales_store(args.csv, args.root)
+            print(f"Built sales store at {args.root} ({len(manifest['files'])} monthly files)")
+        else:
+            affected = ingest_daily_sales(pd.read_csv(args.batch), args.root)
+            print(f"Ingested {args.batch}: {len(affected)} SKU(s) updated")
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+Lightweight timing spans, counters and optional profiling for the engine.
+
+A top-level call such as get_forecast() opens a request(); stages inside it
+open span()s. Each finished request leaves a trace (stage breakdown, counter
+deltas, optional cProfile/tracemalloc output) that last_request() returns.
+
+Environment variables:
+    FORECAST_PROFILE           'cprofile', 'tracemalloc' or 'all' to profile every request
+    FORECAST_METRICS_LOG       append each request trace as a JSON line to this file
+    FORECAST_METRICS_PROM      rewrite this file in Prometheus text format after each request
+"""
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+PROFILE_ENV = 'FORECAST_PROFILE'
+METRICS_LOG_ENV = 'FORECAST_METRICS_LOG'
+METRICS_PROM_ENV = 'FORECAST_METRICS_PROM'
+
+PROFILE_TOP_FUNCTIONS = 25
+MAX_RECENT_REQUESTS = 50
+
+_current_trace = contextvars.ContextVar('forecast_trace', default=None)
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_span_totals = defaultdict(lambda: {'count': 0, 'seconds': 0.0})
+_recent = []
+_tracemalloc_users = 0
+
+
+def increment(name, amount=1):
+    """
+    Add to a process-wide counter (and to the active request's counter deltas).
+
+    Args:
+        name (str): Counter name, e.g. 'forecast_cache_hits'
+        amount (int): Increment (default: 1)
+    """
+    with _lock:
+        _counters[name] += amount
+    trace = _current_trace.get()
+    if trace is not None:
+        trace['counters'][name] = trace['counters'].get(name, 0) + amount
+
+
+def _record_span(name, seconds):
+    with _lock:
+        totals = _span_totals[name]
+        totals['count'] += 1
+        totals['seconds'] += seconds
+
+
+@contextmanager
+def span(name):
+    """
+    Time one stage. Recorded in the process totals and in the active request's trace.
+
+    Args:
+        name (str): Stage name, e.g. 'prophet_fit'
+    """
+    trace = _current_trace.get()
+    depth = trace['_depth'] if trace is not None else 0
+    if trace is not None:
+        trace['_depth'] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _record_span(name, seconds)
+        if trace is not None:
+            trace['_depth'] -= 1
+            trace['spans'].append({'name': name, 'depth': depth, 'duration_ms': seconds * 1000.0})
+
+
+def _profile_modes():
+    value = os.environ.get(PROFILE_ENV, '').strip().lower()
+    if value in ('1', 'true', 'all'):
+        return {'cprofile', 'tracemalloc'}
+    return {mode.strip() for mode in value.split(',') if mode.strip()}
+
+
+@contextmanager
+def request(name, **labels):
+    """
+    Trace one top-level call. Nested requests are recorded as spans of the outer one.
+
+    Args:
+        name (str): Request name, e.g. 'get_forecast'
+        **labels: Extra fields stored on the trace (e.g. sku_id='VEG0001')
+    """
+    if _current_trace.get() is not None:
+        with span(name):
+            yield
+        return
+
+    global _tracemalloc_users
+    trace = {
+        'name': name,
+        'labels': labels,
+        'started_at': time.time(),
+        'spans': [],
+        'counters': {},
+        '_depth': 0,
+    }
+    token = _current_trace.set(trace)
+
+    modes = _profile_modes()
+    profiler = cProfile.Profile() if 'cprofile' in modes else None
+    if 'tracemalloc' in modes:
+        with _lock:
+            if _tracemalloc_users == 0:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+            _tracemalloc_users += 1
+
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield trace
+        trace['status'] = 'ok'
+    except Exception as e:
+        trace['status'] = 'error'
+        trace['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        seconds = time.perf_counter() - start
+        _current_trace.reset(token)
+        _record_span(name, seconds)
+
+        trace['duration_ms'] = seconds * 1000.0
+        del trace['_depth']
+        if profiler is not None:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+            trace['profile'] = output.getvalue()
+        if 'tracemalloc' in modes:
+            with _lock:
+                trace['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0:
+                    tracemalloc.stop()
+
+        _finish(trace)
+
+
+def traced(name):
+    """
+    Decorator running a function inside request(name).
+
+    Args:
+        name (str): Request name
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with request(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def label(**fields):
+    """Attach fields (e.g. sku_id) to the active request's trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace['labels'].update(fields)
+
+
+def _finish(trace):
+    """Keep the trace for last_request() and export it if configured."""
+    with _lock:
+        _recent.append(trace)
+        del _recent[:-MAX_RECENT_REQUESTS]
+
+    log_path = os.environ.get(METRICS_LOG_ENV)
+    if log_path:
+        record = {key: value for key, value in trace.items() if key != 'profile'}
+        with _lock, open(log_path, 'a', encoding='utf-8') as handle:
+            handle.write(json.dumps(record, default=str) + '\n')
+
+    prom_path = os.environ.get(METRICS_PROM_ENV)
+    if prom_path:
+        write_prometheus(prom_path)
+
+
+def last_request(name=None):
+    """
+    Get the most recent finished request trace.
+
+    Args:
+        name (str): Only consider requests with this name (default: any)
+
+    Returns:
+        dict or None: Trace with name, labels, status, duration_ms, spans, counters
+            and, when profiling is enabled, profile / peak_memory_mb
+    """
+    with _lock:
+        for trace in reversed(_recent):
+            if name is None or trace['name'] == name:
+                return trace
+    return None
+
+
+def stage_breakdown(trace):
+    """
+    Total time per stage name within one trace.
+
+    Args:
+        trace (dict): A trace from last_request()
+
+    Returns:
+        list[dict]: [{'stage', 'calls', 'duration_ms'}] in first-seen order
+    """
+    totals = {}
+    for entry in trace['spans']:
+        stage = totals.setdefault(entry['name'], {'stage': entry['name'], 'calls': 0, 'duration_ms': 0.0})
+        stage['calls'] += 1
+        stage['duration_ms'] += entry['duration_ms']
+    return list(totals.values())
+
+
+def snapshot():
+    """
+    Get process-wide counters and span totals.
+
+    Returns:
+        dict: {'counters': {name: value}, 'spans': {name: {'count', 'seconds'}}}
+    """
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'spans': {name: dict(totals) for name, totals in _span_totals.items()},
+        }
+
+
+def prometheus_text():
+    """
+    Render counters and span totals in the Prometheus text exposition format.
+
+    Returns:
+        str: Metrics text
+    """
+    state = snapshot()
+    lines = [
+        '# HELP forecast_events_total Engine event counters.',
+        '# TYPE forecast_events_total counter',
+    ]
+    for name, value in sorted(state['counters'].items()):
+        lines.append(f'forecast_events_total{{event="{name}"}} {value}')
+    lines += [
+        '# HELP forecast_stage_seconds Time spent per engine stage.',
+        '# TYPE forecast_stage_seconds summary',
+    ]
+    for name, totals in sorted(state['spans'].items()):
+        lines.append(f'forecast_stage_seconds_count{{stage="{name}"}} {totals["count"]}')
+        lines.append(f'forecast_stage_seconds_sum{{stage="{name}"}} {totals["seconds"]:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path):
+    """
+    Atomically write prometheus_text() to a file (e.g. for node_exporter's textfile collector).
+
+    Args:
+        path (str): Output file
+    """
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        handle.write(prometheus_text())
+    os.replace(tmp_path, path)
@@ -0,0 +1,189 @@
+"""
+Load generator for the forecast service.
+
+Opens a fixed pool of keep-alive connections and sends requests over them as
+fast as responses come back, then reports throughput, status counts and
+latency percentiles. A {sku} placeholder in the path cycles through SKUs.
+
+Usage:
+    python loadgen.py --path '/forecast?sku={sku}&engine=fourier' --connections 16 --requests 2000
+    python loadgen.py --path '/simulate?sku={sku}&discount=0.2' --duration 30
+    python loadgen.py --method POST --path /forecast/batch --body '{"skus": ["VEG0001", "VEG0002"]}'
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+DEFAULT_URL = 'http://127.0.0.1:8080'
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+async def _read_response(reader):
+    """Read one response; returns its status code."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection")
+    status = int(status_line.split()[1])
+    length = 0
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection':
+            keep_alive = value.strip().lower() != 'close'
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def run_load(url=DEFAULT_URL, path='/health', method='GET', body=None, skus=('VEG0001',),
+                   connections=8, requests=1000, duration=None):
+    """
+    Send requests over a pool of keep-alive connections.
+
+    Args:
+        url (str): Service base URL
+        path (str): Request path; '{sku}' is replaced with the next SKU
+        method (str): HTTP method
+        body (str): Optional request body (sent as JSON)
+        skus (list[str]): SKUs substituted for '{sku}', in rotation
+        connections (int): Concurrent connections
+        requests (int): Total requests to send (ignored when duration is set)
+        duration (float): Send for this many seconds instead of a fixed count
+
+    Returns:
+        dict: requests, seconds, statuses (Counter), errors and latencies_ms (np.ndarray)
+    """
+    target = urlsplit(url)
+    host, port = target.hostname, target.port or 80
+    payload = body.encode() if body else b''
+    sku_cycle = itertools.cycle(skus)
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration if duration else None
+
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+
+    def next_request():
+        # Shared across connections; the event loop is single-threaded, so no lock is needed
+        if deadline is None and next(counter) >= requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        lines = [f"{method} {path.replace('{sku}', next(sku_cycle))} HTTP/1.1", f"Host: {host}:{port}",
+                 f"Content-Length: {len(payload)}"]
+        if payload:
+            lines.append("Content-Type: application/json")
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload
+
+    async def client():
+        reader = writer = None
+        while True:
+            message = next_request()
+            if message is None:
+                break
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                start = time.perf_counter()
+                writer.write(message)
+                await writer.drain()
+                status, keep_alive = await _read_response(reader)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+                statuses[status] += 1
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                errors[type(e).__name__] += 1
+                keep_alive = False
+            if not keep_alive:
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    seconds = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'seconds': seconds,
+        'statuses': statuses,
+        'errors': errors,
+        'latencies_ms': np.asarray(latencies),
+    }
+
+
+def summarize(result, percentiles=DEFAULT_PERCENTILES):
+    """
+    Throughput and latency summary of a run_load() result.
+
+    Returns:
+        dict: requests, seconds, requests_per_second, statuses, errors, mean_ms, pNN_ms, max_ms
+    """
+    latencies = result['latencies_ms']
+    summary = {
+        'requests': result['requests'],
+        'seconds': round(result['seconds'], 3),
+        'requests_per_second': round(result['requests'] / result['seconds'], 1) if result['seconds'] else 0.0,
+        'statuses': {str(status): count for status, count in sorted(result['statuses'].items())},
+        'errors': dict(result['errors']),
+    }
+    if len(latencies):
+        summary['mean_ms'] = round(float(latencies.mean()), 2)
+        for q, value in zip(percentiles, np.percentile(latencies, percentiles)):
+            summary[f'p{q:g}_ms'] = round(float(value), 2)
+        summary['max_ms'] = round(float(latencies.max()), 2)
+    return summary
+
+
+def _default_skus(limit=20):
+    from data_store import get_data_store
+    return get_data_store().skus()[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the forecast service.")
+    parser.add_argument('--url', default=DEFAULT_URL, help=f"Service base URL (default: {DEFAULT_URL})")
+    parser.add_argument('--path', default='/forecast?sku={sku}&engine=fourier',
+                        help="Request path; {sku} cycles through --skus")
+    parser.add_argument('--method', default='GET', help="HTTP method (default: GET)")
+    parser.add_argument('--body', default=None, help="JSON request body")
+    parser.add_argument('--skus', nargs='+', default=None, help="SKUs for {sku} (default: first 20 in inventory)")
+    parser.add_argument('--connections', type=int, default=8, help="Concurrent keep-alive connections (default: 8)")
+    parser.add_argument('--requests', type=int, default=1000, help="Total requests (default: 1000)")
+    parser.add_argument('--duration', type=float, default=None, help="Run for N seconds instead of --requests")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    skus = args.skus or (_default_skus() if '{sku}' in args.path else ['-'])
+    result = asyncio.run(run_load(args.url, args.path, args.method.upper(), args.body, skus,
+                                  args.connections, args.requests, args.duration))
+    summary = summarize(result)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['requests']} requests in {summary['seconds']:.2f}s over {args.connections} connections: "
+              f"{summary['requests_per_second']:.1f} req/s")
+        print(f"statuses: {summary['statuses']}  errors: {summary['errors']}")
+        if summary['requests']:
+            tail = '  '.join(f"{name[:-3]}={value:.2f}" for name, value in summary.items()
+                             if name.endswith('_ms'))
+            print(f"latency (ms): {tail}")
+    return 0 if summary['requests'] and not summary['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
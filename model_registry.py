@@ -0,0 +1,229 @@
+"""
+On-disk registry of fitted Prophet models, versioned per SKU.
+
+Layout under MODEL_DIR:
+    <sku>/index.json      version metadata (data fingerprint, params, history end, timestamp)
+    <sku>/v0001.json      model serialized with prophet.serialize.model_to_json
+    <sku>/.lock           flock'd while a process numbers and indexes a new version
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from forecast_cache import CACHE_DIR
+
+MODEL_DIR = os.path.join(CACHE_DIR, 'models')
+
+DEFAULT_MAX_VERSIONS = 5
+DEFAULT_MAX_LOADED_MODELS = 32
+
+
+def _write_atomic(path, text):
+    """Write a text file via a temporary file so readers never see a partial write."""
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        handle.write(text)
+    os.replace(tmp_path, path)
+
+
+def warm_start_params(model):
+    """
+    Extract a fitted model's parameters as a Stan initialization for the next fit.
+
+    Args:
+        model (Prophet): A fitted Prophet model
+
+    Returns:
+        dict: Initial values for k, m, sigma_obs, delta and beta, usable as fit(init=...)
+    """
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        if model.mcmc_samples == 0:
+            params[name] = model.params[name][0][0]
+        else:
+            params[name] = np.mean(model.params[name])
+    for name in ['delta', 'beta']:
+        if model.mcmc_samples == 0:
+            params[name] = model.params[name][0]
+        else:
+            params[name] = np.mean(model.params[name], axis=0)
+    return params
+
+
+class ModelRegistry:
+    """
+    Stores and loads fitted Prophet models by SKU and version.
+
+    Args:
+        root (str): Directory holding one sub-directory per SKU
+        max_versions (int): Versions kept per SKU; older ones are deleted on save
+        max_loaded_models (int): Deserialized models kept in memory
+    """
+
+    def __init__(self, root=MODEL_DIR, max_versions=DEFAULT_MAX_VERSIONS,
+                 max_loaded_models=DEFAULT_MAX_LOADED_MODELS):
+        self.root = root
+        self.max_versions = max_versions
+        self.max_loaded_models = max_loaded_models
+        self._lock = threading.RLock()
+        self._loaded = OrderedDict()
+
+    def _sku_dir(self, sku_id):
+        return os.path.join(self.root, sku_id)
+
+    def _model_path(self, sku_id, version):
+        return os.path.join(self._sku_dir(sku_id), f"v{version:04d}.json")
+
+    @contextmanager
+    def _sku_file_lock(self, sku_id):
+        """Hold an exclusive flock on the SKU's lock file, so worker processes save one at a time."""
+        with open(os.path.join(self._sku_dir(sku_id), '.lock'), 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _read_index(self, sku_id):
+        path = os.path.join(self._sku_dir(sku_id), 'index.json')
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+
+    def _write_index(self, sku_id, entries):
+        _write_atomic(os.path.join(self._sku_dir(sku_id), 'index.json'), json.dumps(entries, indent=2))
+
+    def versions(self, sku_id):
+        """
+        List stored versions for a SKU, oldest first.
+
+        Args:
+            sku_id (str): The SKU identifier
+
+        Returns:
+            list[dict]: Metadata with version, data_fingerprint, params, history_end, created_at
+        """
+        with self._lock:
+            return self._read_index(sku_id)
+
+    def latest(self, sku_id):
+        """
+        Get metadata for a SKU's newest model.
+
+        Args:
+            sku_id (str): The SKU identifier
+
+        Returns:
+            dict or None: Version metadata, or None if no model is stored
+        """
+        entries = self.versions(sku_id)
+        return entries[-1] if entries else None
+
+    def save(self, sku_id, model, data_fingerprint, params):
+        """
+        Serialize a fitted model as the SKU's next version.
+
+        Args:
+            sku_id (str): The SKU identifier
+            model (Prophet): A fitted Prophet model
+            data_fingerprint (str): Hash of the sales history the model was fitted on
+            params (dict): Keyword arguments the model was built with
+
+        Returns:
+            int: The new version number
+        """
+        # Imported on use so loading the registry does not pull in Prophet
+        from prophet.serialize import model_to_json
+        serialized = model_to_json(model)
+        with self._lock:
+            os.makedirs(self._sku_dir(sku_id), exist_ok=True)
+            # The thread lock only covers this process; pool workers save concurrently
+            with self._sku_file_lock(sku_id):
+                entries = self._read_index(sku_id)
+                version = entries[-1]['version'] + 1 if entries else 1
+                _write_atomic(self._model_path(sku_id, version), serialized)
+
+                entries.append({
+                    'version': version,
+                    'data_fingerprint': data_fingerprint,
+                    'params': params,
+                    'history_end': str(model.history['ds'].max().date()),
+                    'created_at': time.time(),
+                })
+
+                # Retire the oldest versions beyond the retention limit
+                for stale in entries[:-self.max_versions]:
+                    self._loaded.pop((sku_id, stale['version']), None)
+                    try:
+                        os.remove(self._model_path(sku_id, stale['version']))
+                    except FileNotFoundError:
+                        pass
+                entries = entries[-self.max_versions:]
+                self._write_index(sku_id, entries)
+
+            self._remember((sku_id, version), model)
+            return version
+
+    def _remember(self, key, model):
+        self._loaded[key] = model
+        self._loaded.move_to_end(key)
+        while len(self._loaded) > self.max_loaded_models:
+            self._loaded.popitem(last=False)
+
+    def load(self, sku_id, version=None):
+        """
+        Load a stored model.
+
+        Args:
+            sku_id (str): The SKU identifier
+            version (int): Version to load (default: latest)
+
+        Returns:
+            Prophet: The fitted model
+
+        Raises:
+            ValueError: If no matching model is stored
+        """
+        with self._lock:
+            if version is None:
+                entry = self.latest(sku_id)
+                if entry is None:
+                    raise ValueError(f"No stored model for SKU {sku_id}")
+                version = entry['version']
+
+            key = (sku_id, version)
+            model = self._loaded.get(key)
+            if model is None:
+                path = self._model_path(sku_id, version)
+                if not os.path.exists(path):
+                    raise ValueError(f"No stored model for SKU {sku_id} version {version}")
+                with open(path, encoding='utf-8') as handle:
+                    from prophet.serialize import model_from_json
+                    model = model_from_json(handle.read())
+            self._remember(key, model)
+            return model
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """
+    Get the process-wide ModelRegistry at MODEL_DIR.
+
+    Returns:
+        ModelRegistry: The shared model registry
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
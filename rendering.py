@@ -0,0 +1,167 @@
+"""
+Memoized rendering helpers for the Streamlit dashboard.
+
+Figures and tables are cached per (SKU, forecast version), so reruns caused
+by widgets such as the discount slider reuse them instead of rebuilding
+them from the full forecast_df.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from analysis_engine import get_product_list
+
+# Maximum points drawn per chart trace; older history is thinned to fit
+MAX_CHART_POINTS = 400
+
+# Product list refresh interval (seconds); the data store itself tracks file changes
+PRODUCT_LIST_TTL = 300
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+@st.cache_data(ttl=PRODUCT_LIST_TTL, show_spinner=False)
+def cached_product_list():
+    """
+    Get the product selection list, memoized across reruns and sessions.
+
+    Returns:
+        dict[str, str]: Dictionary mapping product_name to sku
+    """
+    return get_product_list()
+
+
+def downsample_forecast(forecast_df, max_points=MAX_CHART_POINTS, keep_last=7):
+    """
+    Thin the history part of a forecast to at most max_points rows.
+
+    The last keep_last rows (the forecast horizon) are always kept in full;
+    the history before them is sampled at an even stride, keeping its first row.
+
+    Args:
+        forecast_df (pd.DataFrame): Forecast with ds, yhat, yhat_lower, yhat_upper
+        max_points (int): Maximum rows returned
+        keep_last (int): Trailing rows never dropped
+
+    Returns:
+        pd.DataFrame: The chart columns of forecast_df, thinned
+    """
+    chart_df = forecast_df[FORECAST_COLUMNS]
+    if len(chart_df) <= max_points:
+        return chart_df
+
+    history = chart_df.iloc[:-keep_last]
+    budget = max(max_points - keep_last, 1)
+    stride = int(np.ceil(len(history) / budget))
+    return pd.concat([history.iloc[::stride], chart_df.iloc[-keep_last:]])
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def forecast_figure(sku_id, forecast_version, title, _forecast_df, max_points=MAX_CHART_POINTS):
+    """
+    Build the forecast chart, memoized per (SKU, forecast version).
+
+    Cached as a shared resource (no copy per rerun), so callers must not modify it.
+
+    Args:
+        sku_id (str): The SKU identifier (cache key)
+        forecast_version (str): Version from analysis_engine.forecast_version() (cache key)
+        title (str): Chart title
+        _forecast_df (pd.DataFrame): Forecast to plot (not hashed)
+        max_points (int): Maximum points per trace
+
+    Returns:
+        go.Figure: The Plotly figure
+    """
+    chart_df = downsample_forecast(_forecast_df, max_points)
+
+    fig = go.Figure()
+
+    # Add yhat (forecast line)
+    fig.add_trace(go.Scatter(
+        x=chart_df['ds'],
+        y=chart_df['yhat'],
+        mode='lines',
+        name='Forecast (yhat)',
+        line=dict(color='#1f77b4', width=2),
+        hovertemplate='<b>Date:</b> %{x}<br><b>Forecast:</b> %{y:.2f} kg<extra></extra>'
+    ))
+
+    # Add confidence interval (upper bound)
+    fig.add_trace(go.Scatter(
+        x=chart_df['ds'],
+        y=chart_df['yhat_upper'],
+        mode='lines',
+        name='Upper Bound',
+        line=dict(color='rgba(31, 119, 180, 0.3)', width=0),
+        showlegend=True,
+        hovertemplate='<b>Upper:</b> %{y:.2f} kg<extra></extra>'
+    ))
+
+    # Add confidence interval (lower bound) with fill
+    fig.add_trace(go.Scatter(
+        x=chart_df['ds'],
+        y=chart_df['yhat_lower'],
+        mode='lines',
+        name='Lower Bound',
+        line=dict(color='rgba(31, 119, 180, 0.3)', width=0),
+        fillcolor='rgba(31, 119, 180, 0.2)',
+        fill='tonexty',
+        showlegend=True,
+        hovertemplate='<b>Lower:</b> %{y:.2f} kg<extra></extra>'
+    ))
+
+    # Update layout
+    fig.update_layout(
+        title=dict(
+            text=title,
+            font=dict(size=18, family="Arial, sans-serif", color="#2c3e50")
+        ),
+        xaxis_title="Date",
+        yaxis_title="Quantity (kg)",
+        hovermode='x unified',
+        template='plotly_white',
+        height=500,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            bgcolor="rgba(255,255,255,0.8)",
+            bordercolor="#e0e0e0",
+            borderwidth=1
+        ),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+    )
+
+    # Add gridlines
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.1)')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.1)')
+
+    return fig
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def forecast_table(sku_id, forecast_version, _forecast_df, days=7):
+    """
+    Build the detailed forecast table, memoized per (SKU, forecast version).
+
+    Args:
+        sku_id (str): The SKU identifier (cache key)
+        forecast_version (str): Version from analysis_engine.forecast_version() (cache key)
+        _forecast_df (pd.DataFrame): Forecast to tabulate (not hashed)
+        days (int): Trailing forecast days to show
+
+    Returns:
+        pd.DataFrame: Date as YYYY-MM-DD text plus forecast columns rounded to 2 decimals
+    """
+    table = _forecast_df.tail(days)[FORECAST_COLUMNS]
+    return pd.DataFrame({
+        'Date': pd.to_datetime(table['ds']).dt.strftime('%Y-%m-%d').to_numpy(),
+        'Forecast (kg)': table['yhat'].round(2).to_numpy(),
+        'Lower Bound (kg)': table['yhat_lower'].round(2).to_numpy(),
+        'Upper Bound (kg)': table['yhat_upper'].round(2).to_numpy(),
+    })
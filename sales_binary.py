@@ -0,0 +1,326 @@
+"""
+Compact memory-mapped binary format for the sales history.
+
+Layout (little-endian, one file):
+    header      8s magic 'SALESBIN', uint32 version, uint32 n_offsets, uint64 n_records
+    source      int64 mtime_ns, uint64 size, 20s sha1 of the CSV it was converted from
+                (all zero when converted from a sales store; absent in version 1 files)
+    offsets     int64[n_offsets]    rows of product p are records offsets[p]:offsets[p + 1]
+    datetime_id int32[n_records]    sorted by product_id, then date
+    product_id  int16[n_records]    (padded to an 8-byte boundary)
+    qty_sold_kg float32[n_records]
+
+Columns are stored back to back, so one product's dates and quantities are
+contiguous slices that np.memmap serves without copying or reading the rest
+of the file. The source signature lets the data store tell when the CSV has
+moved on since the conversion (see source_is_current()).
+
+Usage:
+    python sales_binary.py convert
+    python sales_binary.py convert --source sales_store --output daily_sales.bin
+"""
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'SALESBIN'
+VERSION = 2
+
+_HEADER = struct.Struct('<8sIIQ')
+_SOURCE = struct.Struct('<qQ20s')
+_ALIGN = 8
+_HASH_CHUNK_BYTES = 1 << 20
+
+
+def _aligned(size):
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _header_size(version):
+    return _HEADER.size if version == 1 else _HEADER.size + _SOURCE.size
+
+
+def _section_offsets(n_offsets, n_records, version=VERSION):
+    """Byte offsets of the offsets, datetime_id, product_id and qty_sold_kg sections."""
+    offsets_at = _header_size(version)
+    dates_at = _aligned(offsets_at + 8 * n_offsets)
+    products_at = _aligned(dates_at + 4 * n_records)
+    qty_at = _aligned(products_at + 2 * n_records)
+    return offsets_at, dates_at, products_at, qty_at
+
+
+def source_signature(path):
+    """
+    Get the (mtime_ns, size, sha1 digest) of a source file.
+
+    Args:
+        path (str): The source sales CSV
+
+    Returns:
+        tuple: (mtime_ns int, size int, digest bytes)
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return stat.st_mtime_ns, stat.st_size, digest.digest()
+
+
+def read_source_signature(path):
+    """
+    Read the source signature recorded in a binary sales file's header.
+
+    Args:
+        path (str): File written by write_sales_binary()
+
+    Returns:
+        tuple or None: (mtime_ns, size, digest bytes), or None if no source was recorded
+    """
+    with open(path, 'rb') as handle:
+        header = handle.read(_header_size(VERSION))
+    if len(header) < _HEADER.size or header[:8] != MAGIC:
+        return None
+    version = _HEADER.unpack_from(header)[1]
+    if version == 1 or len(header) < _header_size(version):
+        return None
+    mtime_ns, size, digest = _SOURCE.unpack_from(header, _HEADER.size)
+    if digest == bytes(20):
+        return None
+    return mtime_ns, size, digest
+
+
+def source_is_current(binary_path, source_path):
+    """
+    Check whether a binary sales file still reflects its source CSV.
+
+    The CSV's (mtime, size) is compared first; the content hash is only
+    computed when those differ, so a touched but unchanged CSV still matches.
+
+    Args:
+        binary_path (str): File written by write_sales_binary()
+        source_path (str): The sales CSV
+
+    Returns:
+        bool: True if the CSV is unchanged since the conversion (or does not exist)
+    """
+    if not os.path.exists(source_path):
+        return True
+    recorded = read_source_signature(binary_path)
+    if recorded is None:
+        return False
+    stat = os.stat(source_path)
+    if (stat.st_mtime_ns, stat.st_size) == recorded[:2]:
+        return True
+    return stat.st_size == recorded[1] and source_signature(source_path)[2] == recorded[2]
+
+
+def write_sales_binary(sales_df, path, source_path=None):
+    """
+    Write sales rows in the binary format, replacing path atomically.
+
+    Args:
+        sales_df (pd.DataFrame): Rows with datetime_id, product_id, qty_sold_kg
+        path (str): Output file
+        source_path (str): The CSV sales_df was read from; its signature is stored
+            so readers can detect later changes (default: none recorded)
+
+    Returns:
+        int: Records written
+
+    Raises:
+        ValueError: If a product_id does not fit the int16 column
+    """
+    product_ids = sales_df['product_id'].to_numpy(dtype=np.int64)
+    if len(product_ids) and (product_ids.min() < 0 or product_ids.max() > np.iinfo(np.int16).max):
+        raise ValueError(f"product_id values must be in [0, {np.iinfo(np.int16).max}] for the binary sales format")
+
+    # Sort by product, then date; stable so same-day rows keep file order
+    order = np.lexsort((sales_df['datetime_id'].to_numpy(), product_ids))
+    dates = sales_df['datetime_id'].to_numpy(dtype=np.int32)[order]
+    products = product_ids[order].astype(np.int16)
+    quantities = sales_df['qty_sold_kg'].to_numpy(dtype=np.float32)[order]
+
+    n_records = len(order)
+    n_offsets = int(product_ids.max()) + 2 if n_records else 1
+    offsets = np.zeros(n_offsets, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(products, minlength=n_offsets - 1))
+
+    source = source_signature(source_path) if source_path is not None else (0, 0, bytes(20))
+    sections = _section_offsets(n_offsets, n_records)
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, 'wb') as handle:
+        handle.write(_HEADER.pack(MAGIC, VERSION, n_offsets, n_records))
+        handle.write(_SOURCE.pack(*source))
+        for position, array in zip(sections, (offsets, dates, products, quantities)):
+            handle.seek(position)
+            handle.write(array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes())
+    os.replace(tmp_path, path)
+    return n_records
+
+
+class SalesBinary:
+    """
+    Read-only, memory-mapped view of a binary sales file.
+
+    Behaves like a read-only {product_id: DataFrame} mapping, so it can stand in
+    for the data store's per-product index. Each frame wraps slices of the mapped
+    file; only the pages of the requested product are read.
+
+    Args:
+        path (str): File written by write_sales_binary()
+
+    Raises:
+        ValueError: If the file is not in the binary sales format
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as handle:
+            header = handle.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} is not a binary sales file")
+        magic, version, n_offsets, n_records = _HEADER.unpack(header)
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError(f"{path} is not a binary sales file (version 1 or {VERSION})")
+
+        self.n_records = n_records
+        # DataFrame wrappers per product; they share the mapped pages, so caching them costs no data copies
+        self._frames = {}
+        offsets_at, dates_at, products_at, qty_at = _section_offsets(n_offsets, n_records, version)
+        self.offsets = np.memmap(path, dtype='<i8', mode='r', offset=offsets_at, shape=(n_offsets,))
+        if n_records:
+            self.dates = np.memmap(path, dtype='<i4', mode='r', offset=dates_at, shape=(n_records,))
+            self.products = np.memmap(path, dtype='<i2', mode='r', offset=products_at, shape=(n_records,))
+            self.quantities = np.memmap(path, dtype='<f4', mode='r', offset=qty_at, shape=(n_records,))
+        else:
+            self.dates = np.zeros(0, dtype='<i4')
+            self.products = np.zeros(0, dtype='<i2')
+            self.quantities = np.zeros(0, dtype='<f4')
+
+    def _bounds(self, product_id):
+        product_id = int(product_id)
+        if product_id < 0 or product_id + 1 >= len(self.offsets):
+            return 0, 0
+        return int(self.offsets[product_id]), int(self.offsets[product_id + 1])
+
+    def series(self, product_id):
+        """
+        Get one product's dates and quantities as zero-copy views.
+
+        Args:
+            product_id (int): The product identifier
+
+        Returns:
+            tuple: (datetime_id int32 array, qty_sold_kg float32 array), empty if no sales
+        """
+        start, stop = self._bounds(product_id)
+        return self.dates[start:stop], self.quantities[start:stop]
+
+    def get(self, product_id, default=None):
+        """
+        Get one product's sales rows.
+
+        Args:
+            product_id (int): The product identifier
+            default: Returned when the product has no sales (default: None)
+
+        Returns:
+            pd.DataFrame: datetime_id, product_id, qty_sold_kg backed by the mapped file
+        """
+        rows = self._frames.get(int(product_id))
+        if rows is not None:
+            return rows
+        start, stop = self._bounds(product_id)
+        if start == stop:
+            return default
+        rows = pd.DataFrame({
+            'datetime_id': self.dates[start:stop],
+            'product_id': np.broadcast_to(np.int32(product_id), (stop - start,)),
+            'qty_sold_kg': self.quantities[start:stop],
+        }, copy=False)
+        self._frames[int(product_id)] = rows
+        return rows
+
+    def product_ids(self):
+        """
+        Get the products that have sales rows.
+
+        Returns:
+            np.ndarray: Product ids in ascending order
+        """
+        return np.flatnonzero(np.diff(self.offsets) > 0)
+
+    def __iter__(self):
+        return (int(product_id) for product_id in self.product_ids())
+
+    def __len__(self):
+        return len(self.product_ids())
+
+    def __contains__(self, product_id):
+        start, stop = self._bounds(product_id)
+        return stop > start
+
+    def __getitem__(self, product_id):
+        rows = self.get(product_id)
+        if rows is None:
+            raise KeyError(product_id)
+        return rows
+
+    def values(self):
+        """Yield each product's rows in product order."""
+        return (self[product_id] for product_id in self)
+
+    def items(self):
+        """Yield (product_id, rows) pairs in product order."""
+        return ((product_id, self[product_id]) for product_id in self)
+
+    def to_frame(self):
+        """
+        Copy the whole file into one DataFrame.
+
+        Returns:
+            pd.DataFrame: Sales rows (product_id widened to int32)
+        """
+        return pd.DataFrame({
+            'datetime_id': np.array(self.dates),
+            'product_id': self.products.astype(np.int32),
+            'qty_sold_kg': np.array(self.quantities),
+        })
+
+
+def main(argv=None):
+    from data_store import SALES_BINARY_PATH, SALES_DTYPES, SALES_PATH, read_sales_store
+
+    parser = argparse.ArgumentParser(description="Convert sales history to the memory-mapped binary format.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help="Write the binary sales file")
+    convert_parser.add_argument('--source', default=SALES_PATH,
+                                help=f"Sales CSV or sales store directory (default: {SALES_PATH})")
+    convert_parser.add_argument('--output', default=SALES_BINARY_PATH,
+                                help=f"Binary file to write (default: {SALES_BINARY_PATH})")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        sales_df, source_path = read_sales_store(args.source), None
+    else:
+        sales_df, source_path = pd.read_csv(args.source, dtype=SALES_DTYPES), args.source
+
+    try:
+        n_records = write_sales_binary(sales_df, args.output, source_path)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {n_records} sales rows to {args.output} ({os.path.getsize(args.output)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
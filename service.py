@@ -0,0 +1,643 @@
+"""
+Headless HTTP service for forecasts and waste simulations.
+
+A small asyncio HTTP/1.1 server (standard library only) with keep-alive
+connections. Forecast fits run on the shared pre-warmed worker pool, so the
+event loop only parses requests and serializes responses. Concurrent requests
+for the same (sku, forecast_days, engine) share one in-flight fit. When more
+than max_pending distinct fits are in flight, new ones are rejected with
+503 and Retry-After instead of queueing without bound.
+
+Endpoints:
+    GET  /health
+    GET  /metrics                     Prometheus text (service process counters)
+    GET  /forecast?sku=VEG0001&days=7&engine=prophet
+    POST /forecast/batch              {"skus": [...], "days": 7, "engine": "fourier"}
+    GET  /simulate?sku=VEG0001&discount=0.15&multiplier=1.0&days=7&engine=prophet&date=20251230
+    POST /simulate/batch              {"items": [{"sku": ..., "discount": ..., "multiplier": ...}], "date": ...}
+    GET  /export?kind=simulations&discounts=0.1,0.2&engine=fourier
+
+Responses are JSON, or an Arrow IPC stream when the request has ?format=arrow
+or Accept: application/vnd.apache.arrow.stream. /export answers CSV (or an
+Arrow stream) with chunked transfer encoding, encoding one chunk at a time off
+the event loop, and allows at most max_exports exports at once. Exports are
+Fourier-only: engine=prophet is rejected with 400 rather than fitted off the pool.
+
+Usage:
+    python service.py --port 8080
+    curl 'http://127.0.0.1:8080/forecast?sku=VEG0001'
+    python loadgen.py --path '/forecast?sku={sku}&engine=fourier' --connections 16 --requests 2000
+"""
+import argparse
+import asyncio
+import io
+import json
+import signal
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from analysis_engine import get_forecast, run_waste_simulation, validate_engine
+from export import EXPORT_KINDS, export_batches, iter_arrow_bytes, iter_csv_bytes
+from instrumentation import increment, prometheus_text
+from worker_pool import WarmWorkerPool, get_worker_pool, quiet_fit_logs
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Distinct forecast fits allowed in flight before new ones get 503
+DEFAULT_MAX_PENDING = 64
+
+# Concurrent /export streams; each holds one chunk plus a forecast chunk in memory
+DEFAULT_MAX_EXPORTS = 2
+
+MAX_BATCH_SIZE = 1000
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+JSON_MEDIA_TYPE = 'application/json'
+
+_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+class HTTPError(Exception):
+    """An error answered with the given status code and message."""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Overloaded(HTTPError):
+    """Raised when accepting a request would exceed the pending-fit limit."""
+
+    def __init__(self, message):
+        super().__init__(503, message, {'Retry-After': '1'})
+
+
+class StreamingBody:
+    """
+    A response body produced block by block from a blocking iterator of bytes.
+
+    Each block is pulled in a worker thread so encoding never blocks the event loop.
+
+    Args:
+        blocks (iterator[bytes]): The body, e.g. from export.iter_csv_bytes()
+        on_close (callable): Called once when the body is finished or abandoned
+    """
+
+    def __init__(self, blocks, on_close=None):
+        self.blocks = blocks
+        self.on_close = on_close
+        self._first = None
+
+    async def prime(self):
+        """Produce the first block now, so errors surface before the status line is sent."""
+        self._first = await asyncio.to_thread(next, self.blocks, None)
+
+    async def __aiter__(self):
+        if self._first:
+            yield self._first
+            self._first = None
+        while True:
+            block = await asyncio.to_thread(next, self.blocks, None)
+            if block is None:
+                return
+            if block:
+                yield block
+
+    def close(self):
+        try:
+            if hasattr(self.blocks, 'close'):
+                self.blocks.close()
+        except ValueError:
+            # Cancelled while a worker thread is still pulling a block; it finishes on its own
+            pass
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
+
+
+def _forecast_task(sku_id, forecast_days, engine):
+    """
+    Forecast one SKU. Runs inside a pool worker.
+
+    Returns:
+        tuple: (forecast rows for the horizon, total_forecast_days)
+    """
+    _, forecast_df, total = get_forecast(sku_id, forecast_days, engine=engine)
+    return forecast_df.tail(forecast_days)[FORECAST_COLUMNS].reset_index(drop=True), float(total)
+
+
+class ForecastService:
+    """
+    Coalescing, bounded front end to get_forecast() and run_waste_simulation().
+
+    Must be used from a single event loop.
+
+    Args:
+        pool (WarmWorkerPool): Pool for fits (default: get_worker_pool())
+        max_pending (int): Distinct fits allowed in flight (default: DEFAULT_MAX_PENDING)
+    """
+
+    def __init__(self, pool=None, max_pending=DEFAULT_MAX_PENDING):
+        self.pool = pool
+        self.max_pending = max_pending
+        self._inflight = {}
+
+    @property
+    def in_flight(self):
+        """Distinct fits currently running or queued on the pool."""
+        return len(self._inflight)
+
+    def _start(self, key):
+        if self.pool is None:
+            self.pool = get_worker_pool()
+        future = asyncio.wrap_future(self.pool.submit(_forecast_task, *key))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return future
+
+    async def forecasts(self, keys):
+        """
+        Forecast many (sku, forecast_days, engine) keys, joining in-flight fits.
+
+        Admission is all or nothing: if the keys that are not already in flight
+        would exceed max_pending, none of them are started.
+
+        Args:
+            keys (list[tuple]): (sku_id, forecast_days, engine) per request
+
+        Returns:
+            list: (forecast rows, total) or the exception raised, per key
+
+        Raises:
+            Overloaded: If the new fits would exceed max_pending
+        """
+        new_keys = {key for key in keys if key not in self._inflight}
+        if len(self._inflight) + len(new_keys) > self.max_pending:
+            increment('service_rejected')
+            raise Overloaded(f"{len(self._inflight)} forecasts in flight; retry later")
+        increment('service_coalesced', len(keys) - len(new_keys))
+
+        futures = [self._inflight.get(key) or self._start(key) for key in keys]
+        # shield(): a client that disconnects must not cancel a fit other requests share
+        return await asyncio.gather(*(asyncio.shield(future) for future in futures), return_exceptions=True)
+
+    async def forecast(self, sku_id, forecast_days=7, engine='prophet'):
+        """
+        Forecast one SKU.
+
+        Returns:
+            tuple: (forecast rows for the horizon, total_forecast_days)
+        """
+        result, = await self.forecasts([(sku_id, forecast_days, engine)])
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def simulations(self, items, forecast_days=7, engine='prophet', date_id=None):
+        """
+        Run the shelf-life waste simulation for many (sku, discount, multiplier) items.
+
+        Args:
+            items (list[tuple]): (sku_id, discount_percentage, stock_multiplier) per request
+            forecast_days (int): Forecast horizon in days
+            engine (str): Forecasting engine
+            date_id (int): Inventory snapshot date as YYYYMMDD, resolved as of that date
+                (default: latest snapshot)
+
+        Returns:
+            list: Result dict from run_waste_simulation() or the exception raised, per item
+        """
+        forecasts = await self.forecasts([(sku_id, forecast_days, engine) for sku_id, _, _ in items])
+        results = []
+        for (sku_id, discount, multiplier), forecast in zip(items, forecasts):
+            if isinstance(forecast, BaseException):
+                results.append(forecast)
+                continue
+            forecast_df, total = forecast
+            # Microseconds per call, so it runs on the event loop
+            try:
+                results.append(run_waste_simulation(sku_id, total, discount, multiplier, forecast_df=forecast_df,
+                                                    forecast_days=forecast_days, date_id=date_id))
+            except ValueError as e:
+                results.append(e)
+        return results
+
+
+def _number(params, name, default, kind=float):
+    value = params.get(name, default)
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be a number, got {value!r}")
+
+
+def _horizon(params):
+    forecast_days = _number(params, 'days', 7, int)
+    if not 1 <= forecast_days <= 365:
+        raise HTTPError(400, "days must be between 1 and 365")
+    engine = params.get('engine', 'prophet')
+    try:
+        validate_engine(engine)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    return forecast_days, engine
+
+
+def _date(params):
+    return _number(params, 'date', None, int) if params.get('date') is not None else None
+
+
+def _sku_list(value, name, limit=MAX_BATCH_SIZE):
+    if not isinstance(value, list) or not value:
+        raise HTTPError(400, f"{name} must be a non-empty list")
+    if len(value) > limit:
+        raise HTTPError(400, f"{name} holds {len(value)} entries; the limit is {limit}")
+    return value
+
+
+def _error_message(exc):
+    """Client-facing message for a per-SKU failure."""
+    if isinstance(exc, ValueError):
+        return str(exc)
+    return f"{type(exc).__name__}: {exc}"
+
+
+def _forecast_frame(sku_id, forecast_df):
+    frame = forecast_df.copy()
+    frame.insert(0, 'sku', sku_id)
+    return frame
+
+
+def _forecast_json(sku_id, forecast_days, engine, forecast_df, total):
+    rows = forecast_df.assign(ds=forecast_df['ds'].dt.strftime('%Y-%m-%d'))
+    return {
+        'sku': sku_id,
+        'forecast_days': forecast_days,
+        'engine': engine,
+        'total_forecast': total,
+        'forecast': rows.to_dict(orient='records'),
+    }
+
+
+def _arrow_bytes(frame):
+    # pyarrow is only needed for Arrow responses
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as stream:
+        stream.write_table(table)
+    return sink.getvalue()
+
+
+class ServiceApp:
+    """
+    HTTP routing and serialization on top of a ForecastService.
+
+    Args:
+        service (ForecastService): The service answering requests
+    """
+
+    def __init__(self, service, max_exports=DEFAULT_MAX_EXPORTS):
+        self.service = service
+        self.max_exports = max_exports
+        self._exports = 0
+        self.routes = {
+            '/health': {'GET': self.health},
+            '/metrics': {'GET': self.metrics},
+            '/forecast': {'GET': self.forecast},
+            '/forecast/batch': {'POST': self.forecast_batch},
+            '/simulate': {'GET': self.simulate},
+            '/simulate/batch': {'POST': self.simulate_batch},
+            '/export': {'GET': self.export},
+        }
+
+    async def health(self, request):
+        return 200, {'status': 'ok', 'in_flight': self.service.in_flight}
+
+    async def metrics(self, request):
+        return 200, prometheus_text()
+
+    async def forecast(self, request):
+        params = request['params']
+        sku_id = params.get('sku')
+        if not sku_id:
+            raise HTTPError(400, "sku is required")
+        forecast_days, engine = _horizon(params)
+        try:
+            forecast_df, total = await self.service.forecast(sku_id, forecast_days, engine)
+        except ValueError as e:
+            raise HTTPError(404, str(e))
+        if request['arrow']:
+            return 200, _forecast_frame(sku_id, forecast_df)
+        return 200, _forecast_json(sku_id, forecast_days, engine, forecast_df, total)
+
+    async def forecast_batch(self, request):
+        body = request['json']
+        skus = _sku_list(body.get('skus'), 'skus')
+        forecast_days, engine = _horizon(body)
+        results = await self.service.forecasts([(str(sku_id), forecast_days, engine) for sku_id in skus])
+
+        errors = {str(sku_id): _error_message(result)
+                  for sku_id, result in zip(skus, results) if isinstance(result, BaseException)}
+        ok = [(str(sku_id), result) for sku_id, result in zip(skus, results) if not isinstance(result, BaseException)]
+        if request['arrow']:
+            frames = [_forecast_frame(sku_id, forecast_df) for sku_id, (forecast_df, _) in ok]
+            frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['sku'] + FORECAST_COLUMNS)
+            return 200, frame, {'X-Failed-Skus': ','.join(errors)} if errors else {}
+        return 200, {
+            'results': [_forecast_json(sku_id, forecast_days, engine, forecast_df, total)
+                        for sku_id, (forecast_df, total) in ok],
+            'errors': errors,
+        }
+
+    async def simulate(self, request):
+        params = request['params']
+        sku_id = params.get('sku')
+        if not sku_id:
+            raise HTTPError(400, "sku is required")
+        forecast_days, engine = _horizon(params)
+        item = (sku_id, _number(params, 'discount', 0.15), _number(params, 'multiplier', 1.0))
+        result, = await self.service.simulations([item], forecast_days, engine, _date(params))
+        if isinstance(result, ValueError):
+            raise HTTPError(404, str(result))
+        if isinstance(result, BaseException):
+            raise result
+        row = {'sku': sku_id, 'discount': item[1], 'stock_multiplier': item[2], **result}
+        return 200, pd.DataFrame([row]) if request['arrow'] else row
+
+    async def simulate_batch(self, request):
+        body = request['json']
+        entries = _sku_list(body.get('items'), 'items')
+        forecast_days, engine = _horizon(body)
+        items = []
+        for entry in entries:
+            if not isinstance(entry, dict) or 'sku' not in entry:
+                raise HTTPError(400, "each item needs a sku")
+            items.append((str(entry['sku']), _number(entry, 'discount', 0.15), _number(entry, 'multiplier', 1.0)))
+        results = await self.service.simulations(items, forecast_days, engine, _date(body))
+
+        rows, errors = [], {}
+        for (sku_id, discount, multiplier), result in zip(items, results):
+            if isinstance(result, BaseException):
+                errors[sku_id] = _error_message(result)
+            else:
+                rows.append({'sku': sku_id, 'discount': discount, 'stock_multiplier': multiplier, **result})
+        if request['arrow']:
+            return 200, pd.DataFrame(rows), {'X-Failed-Skus': ','.join(errors)} if errors else {}
+        return 200, {'results': rows, 'errors': errors}
+
+    async def export(self, request):
+        params = request['params']
+        kind = params.get('kind', 'forecasts')
+        if kind not in EXPORT_KINDS:
+            raise HTTPError(400, f"Unknown export {kind!r}; expected one of {list(EXPORT_KINDS)}")
+        forecast_days, engine = _horizon({'engine': 'fourier', **params})
+        if engine != 'fourier':
+            # Streamed exports fit outside ForecastService, so they would bypass the pool and max_pending
+            raise HTTPError(400, "Exports support engine=fourier only; use the forecast endpoints for Prophet")
+        skus = params['skus'].split(',') if params.get('skus') else 'all'
+        try:
+            discounts = [float(value) for value in params.get('discounts', '0.15').split(',')]
+        except ValueError:
+            raise HTTPError(400, "discounts must be comma-separated numbers")
+        date_id = _date(params)
+        if self._exports >= self.max_exports:
+            increment('service_rejected')
+            raise Overloaded(f"{self._exports} exports in progress; retry later")
+
+        batches = export_batches(kind, skus, forecast_days, engine, discounts,
+                                 _number(params, 'multiplier', 1.0), date_id)
+        if request['arrow']:
+            blocks, content_type = iter_arrow_bytes(batches), ARROW_MEDIA_TYPE
+        else:
+            blocks, content_type = iter_csv_bytes(batches), 'text/csv'
+        self._exports += 1
+        increment('service_exports')
+        body = StreamingBody(blocks, self._export_finished)
+        try:
+            await body.prime()
+        except ValueError as e:
+            body.close()
+            raise HTTPError(400, str(e))
+        except BaseException:
+            body.close()
+            raise
+        filename = f"{kind}.{'arrow' if request['arrow'] else 'csv'}"
+        return 200, body, {'Content-Type': content_type, 'Content-Disposition': f'attachment; filename="{filename}"'}
+
+    def _export_finished(self):
+        self._exports -= 1
+
+    async def dispatch(self, request):
+        """
+        Route a parsed request and serialize the handler's result.
+
+        Returns:
+            tuple: (status, headers dict, body bytes or StreamingBody)
+        """
+        increment('service_requests')
+        try:
+            methods = self.routes.get(request['path'])
+            if methods is None:
+                raise HTTPError(404, f"No route for {request['path']}")
+            handler = methods.get(request['method'])
+            if handler is None:
+                raise HTTPError(405, f"{request['method']} not allowed", {'Allow': ', '.join(methods)})
+            status, payload, *extra = await handler(request)
+            headers = extra[0] if extra else {}
+        except HTTPError as e:
+            status, payload, headers = e.status, {'error': str(e)}, e.headers
+        except Exception as e:
+            increment('service_errors')
+            status, payload, headers = 500, {'error': f"{type(e).__name__}: {e}"}, {}
+
+        if isinstance(payload, StreamingBody):
+            return status, headers, payload
+        if isinstance(payload, pd.DataFrame):
+            return status, {'Content-Type': ARROW_MEDIA_TYPE, **headers}, _arrow_bytes(payload)
+        if isinstance(payload, str):
+            return status, {'Content-Type': 'text/plain; version=0.0.4', **headers}, payload.encode()
+        return status, {'Content-Type': JSON_MEDIA_TYPE, **headers}, json.dumps(payload).encode()
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    body = json.dumps({'error': str(e)}).encode()
+                    writer.write(_response_bytes(e.status, {'Content-Type': JSON_MEDIA_TYPE}, body, False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                status, headers, body = await self.dispatch(request)
+                if isinstance(body, StreamingBody):
+                    if not await _write_stream(writer, status, headers, body, request['keep_alive']):
+                        break
+                else:
+                    writer.write(_response_bytes(status, headers, body, request['keep_alive']))
+                    await writer.drain()
+                if not request['keep_alive']:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _read_request(reader):
+    """
+    Parse one HTTP/1.x request.
+
+    Returns:
+        dict or None: method, path, params, json, arrow and keep_alive; None at end of stream
+
+    Raises:
+        HTTPError: If the request is malformed or too large
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "Too many headers")
+
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Body exceeds {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b''
+
+    url = urlsplit(target)
+    params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    connection = headers.get('connection', '').lower()
+    request = {
+        'method': method.upper(),
+        'path': url.path.rstrip('/') or '/',
+        'params': params,
+        'json': {},
+        'arrow': params.get('format') == 'arrow' or ARROW_MEDIA_TYPE in headers.get('accept', ''),
+        'keep_alive': connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close',
+    }
+    if body:
+        try:
+            request['json'] = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(request['json'], dict):
+            raise HTTPError(400, "Body must be a JSON object")
+    return request
+
+
+def _response_head(status, headers, keep_alive):
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+    headers = {**headers, 'Connection': 'keep-alive' if keep_alive else 'close'}
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+def _response_bytes(status, headers, body, keep_alive):
+    return _response_head(status, {**headers, 'Content-Length': str(len(body))}, keep_alive) + body
+
+
+async def _write_stream(writer, status, headers, body, keep_alive):
+    """
+    Send a StreamingBody with chunked transfer encoding.
+
+    Returns:
+        bool: False if the body failed part-way. The connection must then be
+            closed without the final empty chunk, so the client sees the response is incomplete
+    """
+    try:
+        writer.write(_response_head(status, {**headers, 'Transfer-Encoding': 'chunked'}, keep_alive))
+        async for block in body:
+            writer.write(b'%x\r\n%b\r\n' % (len(block), block))
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        return True
+    except (ConnectionError, asyncio.IncompleteReadError):
+        raise
+    except Exception:
+        increment('service_errors')
+        return False
+    finally:
+        body.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None, ready=None):
+    """
+    Run the HTTP server until cancelled.
+
+    Args:
+        host (str): Interface to bind (default: 127.0.0.1)
+        port (int): Port to bind (default: 8080)
+        service (ForecastService): Service to expose (default: a new one on the shared pool)
+        ready (callable): Called with the bound (host, port) once listening
+    """
+    app = ServiceApp(service or ForecastService())
+    server = await asyncio.start_server(app.handle_connection, host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[:2])
+    async with server:
+        await server.serve_forever()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve forecasts and waste simulations over HTTP.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Interface to bind (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to bind (default: {DEFAULT_PORT})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Fit worker processes (default: the shared pool, one per CPU)")
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help=f"Distinct fits in flight before requests get 503 (default: {DEFAULT_MAX_PENDING})")
+    args = parser.parse_args(argv)
+
+    quiet_fit_logs()
+    pool = WarmWorkerPool(args.workers) if args.workers else get_worker_pool()
+    pool.prewarm()
+    service = ForecastService(pool, args.max_pending)
+
+    def ready(address):
+        print(f"Serving on http://{address[0]}:{address[1]} ({pool.max_workers} fit workers)", flush=True)
+
+    # SIGTERM stops the server like Ctrl-C, so the pool's workers are shut down too
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        asyncio.run(serve(args.host, args.port, service, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown(wait=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
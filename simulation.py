@@ -0,0 +1,606 @@
+"""
+Vectorized promotion and waste simulation.
+
+The promo model is the one used by run_waste_simulation(): a discount d lifts
+forecast sales by d * elasticity, waste is whatever stock the (lifted) sales
+do not absorb, and revenue is lifted sales at the discounted price. Here the
+model is evaluated with NumPy broadcasting over SKUs x stock multipliers x
+discounts in a single call.
+
+simulate_shelf_life() is the day-by-day variant: stock is held in FIFO age
+cohorts, a cohort is wasted when its shelf life runs out, and in-transit stock
+arrives after its lead time. It loops over horizon days only; every SKU, store,
+multiplier and discount is one broadcast array operation per day.
+
+simulate_waste_risk() runs either model over thousands of sampled demand
+paths at once and reports waste and revenue percentiles per discount.
+"""
+import copy
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from data_store import get_data_store
+from elasticity import ELASTICITY_MULTIPLIER, get_elasticity_table
+
+# Default discount grid: 0-80% in 1% steps
+DEFAULT_DISCOUNTS = np.round(np.arange(0, 81) / 100.0, 2)
+
+# Monte Carlo defaults: demand paths per SKU, reported percentiles, and the
+# coverage of the yhat_lower/yhat_upper band (Prophet's default interval_width)
+DEFAULT_PATHS = 2000
+RISK_PERCENTILES = (10, 50, 90)
+INTERVAL_WIDTH = 0.8
+
+
+def simulate_promotions(base_forecasts, stock, sale_price, discounts,
+                        stock_multipliers=(1.0,), elasticity=ELASTICITY_MULTIPLIER):
+    """
+    Evaluate the promo model for every SKU x stock multiplier x discount.
+
+    Args:
+        base_forecasts (array-like): Forecasted sales per SKU over the horizon, shape (n,)
+        stock (array-like): Stock on hand per SKU (kg), shape (n,)
+        sale_price (array-like): Undiscounted sale price per SKU, shape (n,)
+        discounts (array-like): Discounts as decimals (e.g., 0.15 for 15%), shape (d,)
+        stock_multipliers (array-like): Overstock multipliers applied to stock, shape (m,)
+        elasticity (float or array-like): Uplift multiplier, scalar or per SKU with shape (n,)
+
+    Returns:
+        dict: NumPy arrays with keys:
+            - current_stock: Stock after the multiplier, shape (n, m)
+            - base_waste_kg: Waste without discount, shape (n, m)
+            - base_revenue: Revenue without discount, shape (n,)
+            - promo_sales_kg: Sales with discount, shape (n, d)
+            - promo_waste_kg: Waste with discount, shape (n, m, d)
+            - promo_revenue: Revenue with discount, shape (n, d)
+    """
+    forecasts = np.asarray(base_forecasts, dtype=np.float64)
+    stock = np.asarray(stock, dtype=np.float64)
+    price = np.asarray(sale_price, dtype=np.float64)
+    discounts = np.asarray(discounts, dtype=np.float64)
+    multipliers = np.asarray(stock_multipliers, dtype=np.float64)
+    elasticity = np.broadcast_to(np.asarray(elasticity, dtype=np.float64), forecasts.shape)
+
+    # (n, m) stock levels and (n, d) promo sales, broadcast together to (n, m, d)
+    current_stock = stock[:, None] * multipliers[None, :]
+    promo_sales = forecasts[:, None] * (1.0 + discounts[None, :] * elasticity[:, None])
+    promo_waste = np.maximum(current_stock[:, :, None] - promo_sales[:, None, :], 0.0)
+    promo_revenue = promo_sales * (price[:, None] * (1.0 - discounts[None, :]))
+
+    return {
+        'current_stock': current_stock,
+        'base_waste_kg': np.maximum(current_stock - forecasts[:, None], 0.0),
+        'base_revenue': forecasts * price,
+        'promo_sales_kg': promo_sales,
+        'promo_waste_kg': promo_waste,
+        'promo_revenue': promo_revenue,
+    }
+
+
+def simulate_shelf_life(daily_demand, stock_on_hand, stock_in_transit=0.0, lead_time_days=0,
+                        shelf_life_days=None):
+    """
+    Run a FIFO shelf-life simulation day by day.
+
+    On-hand stock can be sold for shelf_life_days days (the remaining life at the
+    snapshot). In-transit stock arrives at the start of day lead_time_days with a
+    full shelf_life_days of life. Each day, demand is served from the oldest
+    sellable cohort first. At the end of its last day, whatever is left of a
+    cohort becomes waste. All stock arguments broadcast against
+    daily_demand[..., 0], so any leading shape (SKUs, stores, multipliers,
+    discounts) is simulated at once.
+
+    Args:
+        daily_demand (array-like): Demand per day, shape (..., T); negative values count as zero
+        stock_on_hand (array-like): Stock on hand (kg)
+        stock_in_transit (array-like): Stock arriving after the lead time (kg) (default: 0)
+        lead_time_days (array-like): Days until in-transit stock arrives (default: 0)
+        shelf_life_days (array-like): Remaining shelf life in days (default: never expires)
+
+    Returns:
+        dict: NumPy arrays with keys:
+            - sold_kg: Sales served per day, shape (..., T)
+            - expired_kg: Stock wasted at the end of each day, shape (..., T)
+            - waste_kg: Total expired stock over the horizon, shape (...)
+            - ending_stock_kg: Unexpired stock left after the horizon, shape (...)
+            - pending_kg: In-transit stock still to arrive after the horizon, shape (...)
+    """
+    demand = np.maximum(np.asarray(daily_demand, dtype=np.float64), 0.0)
+    horizon = demand.shape[-1]
+    shape = np.broadcast_shapes(demand.shape[:-1], np.shape(stock_on_hand), np.shape(stock_in_transit),
+                                np.shape(lead_time_days), np.shape(shelf_life_days))
+    if shelf_life_days is None:
+        shelf_life_days = horizon + 1
+    # Lead times and shelf lives stay in their input shape; comparisons broadcast them
+    lead = np.maximum(np.asarray(lead_time_days, dtype=np.int64), 0)
+    life = np.asarray(shelf_life_days, dtype=np.int64)
+
+    # Two cohorts: on hand and in transit. With a non-negative lead time the
+    # arrival never expires before the on-hand stock, so on hand always sells first
+    on_hand = np.broadcast_to(np.asarray(stock_on_hand, dtype=np.float64), shape).copy()
+    in_transit = np.broadcast_to(np.asarray(stock_in_transit, dtype=np.float64), shape).copy()
+
+    sold = np.empty(shape + (horizon,))
+    expired = np.empty(shape + (horizon,))
+    for day in range(horizon):
+        # A cohort sells only between its arrival and its expiry
+        wanted = np.broadcast_to(demand[..., day], shape)
+        from_on_hand = np.minimum(wanted, np.where(life > day, on_hand, 0.0))
+        on_hand -= from_on_hand
+        arrived = (lead <= day) & (lead + life > day)
+        from_transit = np.minimum(wanted - from_on_hand, np.where(arrived, in_transit, 0.0))
+        in_transit -= from_transit
+        sold[..., day] = from_on_hand + from_transit
+
+        # Cohorts on shelf whose life ends today are written off tonight
+        on_hand_expiring = np.broadcast_to(life <= day + 1, shape)
+        transit_expiring = np.broadcast_to((lead <= day) & (lead + life <= day + 1), shape)
+        expired[..., day] = np.where(on_hand_expiring, on_hand, 0.0) + np.where(transit_expiring, in_transit, 0.0)
+        on_hand[on_hand_expiring] = 0.0
+        in_transit[transit_expiring] = 0.0
+
+    delivered = np.broadcast_to(lead < horizon, shape)
+    return {
+        'sold_kg': sold,
+        'expired_kg': expired,
+        'waste_kg': expired.sum(axis=-1),
+        'ending_stock_kg': on_hand + np.where(delivered, in_transit, 0.0),
+        'pending_kg': np.where(delivered, 0.0, in_transit),
+    }
+
+
+def simulate_shelf_life_promotions(daily_forecasts, stock, sale_price, discounts, stock_multipliers=(1.0,),
+                                   elasticity=ELASTICITY_MULTIPLIER, stock_in_transit=0.0,
+                                   lead_time_days=0, shelf_life_days=None):
+    """
+    Evaluate the promo model with the day-by-day shelf-life simulation.
+
+    The discount lifts every day's demand by d * elasticity, as in
+    simulate_promotions(). Waste is stock that expires within the horizon, and
+    revenue is sales actually served from stock. The stock multiplier scales
+    on-hand stock only.
+
+    Args:
+        daily_forecasts (array-like): Forecasted sales per SKU and day, shape (n, T)
+        stock (array-like): Stock on hand per SKU (kg), shape (n,)
+        sale_price (array-like): Undiscounted sale price per SKU, shape (n,)
+        discounts (array-like): Discounts as decimals (e.g., 0.15 for 15%), shape (d,)
+        stock_multipliers (array-like): Overstock multipliers applied to stock, shape (m,)
+        elasticity (float or array-like): Uplift multiplier, scalar or per SKU with shape (n,)
+        stock_in_transit (float or array-like): In-transit stock per SKU (kg)
+        lead_time_days (int or array-like): Days until in-transit stock arrives, per SKU
+        shelf_life_days (int or array-like): Remaining shelf life per SKU (default: never expires)
+
+    Returns:
+        dict: NumPy arrays with the keys of simulate_promotions(), where
+            base_revenue has shape (n, m) and promo_sales_kg and promo_revenue
+            have shape (n, m, d), plus:
+            - base_sales_kg: Sales served without discount, shape (n, m)
+            - ending_stock_kg: Unexpired stock left after the horizon with discount, shape (n, m, d)
+    """
+    forecasts = np.maximum(np.asarray(daily_forecasts, dtype=np.float64), 0.0)
+    n = forecasts.shape[0]
+    stock = np.asarray(stock, dtype=np.float64)
+    price = np.asarray(sale_price, dtype=np.float64)
+    discounts = np.asarray(discounts, dtype=np.float64)
+    multipliers = np.asarray(stock_multipliers, dtype=np.float64)
+    elasticity = np.broadcast_to(np.asarray(elasticity, dtype=np.float64), (n,))
+
+    def per_sku(values):
+        return np.broadcast_to(np.asarray(values), (n,))[:, None, None]
+
+    # Trailing discount axis: index 0 is the undiscounted baseline
+    grid = np.concatenate([[0.0], discounts])
+    current_stock = stock[:, None] * multipliers[None, :]
+    uplift = 1.0 + grid[None, :] * elasticity[:, None]
+    result = simulate_shelf_life(
+        forecasts[:, None, None, :] * uplift[:, None, :, None],
+        current_stock[:, :, None],
+        per_sku(stock_in_transit),
+        per_sku(lead_time_days),
+        None if shelf_life_days is None else per_sku(shelf_life_days),
+    )
+    sales = result['sold_kg'].sum(axis=-1)
+    revenue = sales * (price[:, None, None] * (1.0 - grid[None, None, :]))
+
+    return {
+        'current_stock': current_stock,
+        'base_waste_kg': result['waste_kg'][:, :, 0],
+        'base_sales_kg': sales[:, :, 0],
+        'base_revenue': revenue[:, :, 0],
+        'promo_sales_kg': sales[:, :, 1:],
+        'promo_waste_kg': result['waste_kg'][:, :, 1:],
+        'promo_revenue': revenue[:, :, 1:],
+        'ending_stock_kg': result['ending_stock_kg'][:, :, 1:],
+    }
+
+
+def best_discounts(result, discounts, objective='revenue'):
+    """
+    Pick the best discount per SKU and stock multiplier.
+
+    Ties go to the smallest discount.
+
+    Args:
+        result (dict): Output of simulate_promotions()
+        discounts (array-like): The discount grid passed to simulate_promotions()
+        objective (str): 'revenue' to maximize promo revenue, 'waste' to minimize promo waste
+
+    Returns:
+        dict: Arrays of shape (n, m) with keys discount, promo_waste_kg, promo_revenue
+    """
+    discounts = np.asarray(discounts, dtype=np.float64)
+    waste = result['promo_waste_kg']
+    revenue = np.broadcast_to(result['promo_revenue'][:, None, :], waste.shape)
+
+    if objective == 'revenue':
+        best = np.argmax(revenue, axis=2)
+    elif objective == 'waste':
+        best = np.argmin(waste, axis=2)
+    else:
+        raise ValueError(f"Unknown objective {objective!r}; expected 'revenue' or 'waste'")
+
+    picked = best[:, :, None]
+    return {
+        'discount': discounts[best],
+        'promo_waste_kg': np.take_along_axis(waste, picked, axis=2)[:, :, 0],
+        'promo_revenue': np.take_along_axis(revenue, picked, axis=2)[:, :, 0],
+    }
+
+
+def interval_demand_paths(forecast_df, n_paths=DEFAULT_PATHS, forecast_days=7,
+                          interval_width=INTERVAL_WIDTH, seed=None):
+    """
+    Draw demand paths from a normal distribution fitted to each day's interval.
+
+    Each day's mean is yhat. Its standard deviation is the one for which
+    yhat_lower/yhat_upper is the central interval_width interval. Days are drawn
+    independently, and negative draws are clipped to zero.
+
+    Args:
+        forecast_df (pd.DataFrame): Forecast with yhat, yhat_lower, yhat_upper
+        n_paths (int): Paths to draw (default: DEFAULT_PATHS)
+        forecast_days (int): Forecast days at the end of forecast_df (default: 7)
+        interval_width (float): Coverage of the forecast interval (default: 0.8)
+        seed (int): Random seed for reproducible draws
+
+    Returns:
+        np.ndarray: Demand paths, shape (n_paths, forecast_days)
+    """
+    future = forecast_df.tail(forecast_days)
+    mean = future['yhat'].to_numpy(dtype=np.float64)
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2.0)
+    scale = (future['yhat_upper'].to_numpy(dtype=np.float64)
+             - future['yhat_lower'].to_numpy(dtype=np.float64)) / (2.0 * z)
+    draws = np.random.default_rng(seed).standard_normal((n_paths, len(mean)))
+    return np.maximum(mean + draws * np.maximum(scale, 0.0), 0.0)
+
+
+def prophet_demand_paths(model, n_paths=DEFAULT_PATHS, forecast_days=7):
+    """
+    Draw demand paths from a fitted Prophet model's predictive samples.
+
+    The samples include trend uncertainty, so the days within a path are
+    correlated. Negative samples are clipped to zero.
+
+    Args:
+        model (Prophet): A fitted Prophet model
+        n_paths (int): Paths to draw (default: DEFAULT_PATHS)
+        forecast_days (int): Days to forecast after the history (default: 7)
+
+    Returns:
+        np.ndarray: Demand paths, shape (n_paths, forecast_days)
+    """
+    # Shallow copy so the sample count never leaks into a model shared with other requests
+    model = copy.copy(model)
+    model.uncertainty_samples = n_paths
+    future = model.make_future_dataframe(periods=forecast_days).tail(forecast_days)
+    return np.maximum(model.predictive_samples(future)['yhat'].T, 0.0)
+
+
+def simulate_waste_risk(demand_paths, stock, sale_price, discounts, stock_multiplier=1.0,
+                        elasticity=ELASTICITY_MULTIPLIER, stock_in_transit=0.0, lead_time_days=0,
+                        shelf_life_days=None, percentiles=RISK_PERCENTILES):
+    """
+    Push every demand path through the promo model and summarize the spread.
+
+    With shelf_life_days, each path runs through the day-by-day FIFO simulation
+    (simulate_shelf_life_promotions). Without it, path totals go through
+    simulate_promotions(). Either way, all paths and discounts form a single
+    NumPy batch.
+
+    Args:
+        demand_paths (array-like): Sampled daily demand for one SKU, shape (p, T)
+        stock (float): Stock on hand (kg)
+        sale_price (float): Undiscounted sale price
+        discounts (array-like): Discounts as decimals, shape (d,)
+        stock_multiplier (float): Multiplier for stock levels (default: 1.0)
+        elasticity (float): Uplift multiplier
+        stock_in_transit (float): In-transit stock (kg), shelf-life model only
+        lead_time_days (int): Days until in-transit stock arrives, shelf-life model only
+        shelf_life_days (int): Remaining shelf life; None uses the totals model
+        percentiles (tuple): Percentiles to report (default: 10, 50, 90)
+
+    Returns:
+        pd.DataFrame: One row per discount with base_waste_pNN, promo_waste_pNN,
+            base_revenue_pNN and promo_revenue_pNN columns for each percentile
+    """
+    paths = np.asarray(demand_paths, dtype=np.float64)
+    discounts = np.asarray(discounts, dtype=np.float64)
+    n_paths = paths.shape[0]
+
+    # Paths take the SKU axis of the kernels; stock and price repeat per path
+    if shelf_life_days is None:
+        result = simulate_promotions(
+            paths.sum(axis=1), np.full(n_paths, stock), np.full(n_paths, sale_price),
+            discounts, [stock_multiplier], elasticity,
+        )
+        base_revenue = result['base_revenue']
+        promo_revenue = result['promo_revenue']
+    else:
+        result = simulate_shelf_life_promotions(
+            paths, np.full(n_paths, stock), np.full(n_paths, sale_price), discounts, [stock_multiplier],
+            elasticity, stock_in_transit, lead_time_days, shelf_life_days,
+        )
+        base_revenue = result['base_revenue'][:, 0]
+        promo_revenue = result['promo_revenue'][:, 0, :]
+
+    # (p, d) outcomes reduced to (len(percentiles), d) in one call each
+    percentiles = list(percentiles)
+    base_waste = np.percentile(result['base_waste_kg'][:, 0], percentiles)
+    base_revenue = np.percentile(base_revenue, percentiles)
+    promo_waste = np.percentile(result['promo_waste_kg'][:, 0, :], percentiles, axis=0)
+    promo_revenue = np.percentile(promo_revenue, percentiles, axis=0)
+
+    table = {'discount': discounts}
+    for i, q in enumerate(percentiles):
+        table[f'base_waste_p{q}'] = np.full(len(discounts), base_waste[i])
+        table[f'promo_waste_p{q}'] = promo_waste[i]
+        table[f'base_revenue_p{q}'] = np.full(len(discounts), base_revenue[i])
+        table[f'promo_revenue_p{q}'] = promo_revenue[i]
+    return pd.DataFrame(table)
+
+
+def sku_inventory(skus=None, date_id=None):
+    """
+    Get the inventory row used for SKU-level simulation (first store's row per SKU).
+
+    Args:
+        skus (list[str]): SKUs to return, in this order (default: every SKU)
+        date_id (int): Snapshot date as YYYYMMDD, resolved as of that date (default: latest snapshot)
+
+    Returns:
+        pd.DataFrame: One inventory row per SKU, indexed by sku
+
+    Raises:
+        ValueError: If a SKU is not in the snapshot
+    """
+    first_rows = inventory_snapshot(date_id).drop_duplicates('sku')
+    first_rows = first_rows.set_index(first_rows['sku'].astype(str))
+    if skus is None:
+        return first_rows
+
+    missing = [sku_id for sku_id in skus if sku_id not in first_rows.index]
+    if missing:
+        raise ValueError(f"SKU {missing[0]} not found in inventory")
+    return first_rows.loc[list(skus)]
+
+
+def run_promotion_grid(base_forecasts, discounts=DEFAULT_DISCOUNTS, stock_multipliers=(1.0,),
+                       objective='revenue', elasticity=None, date_id=None):
+    """
+    Simulate a full discount x overstock surface for many SKUs in one call.
+
+    Args:
+        base_forecasts (dict[str, float] or pd.Series): Forecasted sales per SKU over the horizon
+        discounts (array-like): Discounts as decimals (default: 0-80% in 1% steps)
+        stock_multipliers (array-like): Overstock multipliers (default: (1.0,))
+        objective (str): 'revenue' or 'waste', used to pick the best discount
+        elasticity (float or array-like): Uplift multiplier, scalar or per SKU
+            (default: each SKU's fitted value, see elasticity.py)
+        date_id (int): Inventory snapshot date as YYYYMMDD (default: latest snapshot)
+
+    Returns:
+        tuple: (scenarios_df, best_df)
+            - scenarios_df: One row per (sku, stock_multiplier, discount) with waste and revenue
+            - best_df: One row per (sku, stock_multiplier) with the best discount under objective
+    """
+    forecasts = pd.Series(base_forecasts, dtype='float64')
+    skus = list(forecasts.index)
+    inventory = sku_inventory(skus, date_id)
+    discounts = np.asarray(discounts, dtype=np.float64)
+    multipliers = np.asarray(stock_multipliers, dtype=np.float64)
+    if elasticity is None:
+        elasticity = get_elasticity_table().lookup(skus)
+
+    result = simulate_promotions(
+        forecasts.to_numpy(),
+        inventory['stock_on_hand_kg'].to_numpy(),
+        inventory['list_price'].to_numpy(),
+        discounts,
+        multipliers,
+        elasticity,
+    )
+    n, m, d = result['promo_waste_kg'].shape
+
+    # Tidy long frame: categorical sku keeps millions of rows compact
+    scenarios_df = pd.DataFrame({
+        'sku': pd.Categorical.from_codes(np.repeat(np.arange(n), m * d), categories=skus),
+        'stock_multiplier': np.tile(np.repeat(multipliers, d), n),
+        'discount': np.tile(discounts, n * m),
+        'current_stock': np.repeat(result['current_stock'].ravel(), d),
+        'base_waste_kg': np.repeat(result['base_waste_kg'].ravel(), d),
+        'base_revenue': np.repeat(result['base_revenue'], m * d),
+        'promo_waste_kg': result['promo_waste_kg'].ravel(),
+        'promo_revenue': np.broadcast_to(result['promo_revenue'][:, None, :], (n, m, d)).ravel(),
+    })
+
+    best = best_discounts(result, discounts, objective)
+    best_df = pd.DataFrame({
+        'sku': np.repeat(skus, m),
+        'stock_multiplier': np.tile(multipliers, n),
+        'best_discount': best['discount'].ravel(),
+        'promo_waste_kg': best['promo_waste_kg'].ravel(),
+        'promo_revenue': best['promo_revenue'].ravel(),
+    })
+
+    return scenarios_df, best_df
+
+
+def inventory_snapshot(date_id=None):
+    """
+    Get every (store, SKU) inventory row of the snapshot in effect on a date.
+
+    Args:
+        date_id (int): Date as YYYYMMDD; the latest snapshot on or before it is used
+            (default: latest snapshot)
+
+    Returns:
+        pd.DataFrame: Inventory rows for that snapshot
+
+    Raises:
+        ValueError: If there is no snapshot on or before the date
+    """
+    return get_data_store().inventory_snapshot(date_id)
+
+
+def allocate_store_demand(product_forecasts, date_id=None, allocation='stock'):
+    """
+    Allocate product-level forecasts down to every store carrying the product.
+
+    Args:
+        product_forecasts (dict[str, float] or pd.Series): Forecasted sales per SKU over the horizon
+        date_id (int): Inventory snapshot date as YYYYMMDD (default: latest snapshot)
+        allocation (str): 'stock' splits by each store's share of on-hand plus in-transit
+            stock for the product; 'equal' splits evenly across stores
+
+    Returns:
+        pd.DataFrame: One row per (store, SKU) with store_id, sku, product_id,
+            stock_on_hand_kg, stock_in_transit_kg, lead_time_days, list_price, cost_price,
+            shelf_life_days, demand_share and allocated_forecast_kg
+    """
+    forecasts = pd.Series(product_forecasts, dtype='float64')
+    snapshot = inventory_snapshot(date_id)
+    snapshot = snapshot[snapshot['sku'].isin(forecasts.index)]
+
+    # Dense product codes so per-product sums are a single bincount
+    sku_codes, sku_labels = pd.factorize(snapshot['sku'].astype(str))
+    n_products = len(sku_labels)
+
+    if allocation == 'stock':
+        weight = (snapshot['stock_on_hand_kg'].to_numpy(dtype=np.float64)
+                  + snapshot['stock_in_transit_kg'].to_numpy(dtype=np.float64))
+    elif allocation == 'equal':
+        weight = np.ones(len(snapshot))
+    else:
+        raise ValueError(f"Unknown allocation {allocation!r}; expected 'stock' or 'equal'")
+
+    # Products whose stores hold no stock at all fall back to an even split
+    totals = np.bincount(sku_codes, weights=weight, minlength=n_products)
+    counts = np.bincount(sku_codes, minlength=n_products)
+    empty = totals[sku_codes] <= 0
+    share = np.where(empty, 1.0 / counts[sku_codes], weight / np.where(empty, 1.0, totals[sku_codes]))
+
+    product_totals = forecasts.reindex(sku_labels).to_numpy()
+    return pd.DataFrame({
+        'store_id': snapshot['store_id'].to_numpy(),
+        'sku': pd.Categorical(snapshot['sku'].astype(str), categories=forecasts.index),
+        'product_id': snapshot['product_id'].to_numpy(),
+        'stock_on_hand_kg': snapshot['stock_on_hand_kg'].to_numpy(),
+        'stock_in_transit_kg': snapshot['stock_in_transit_kg'].to_numpy(),
+        'lead_time_days': snapshot['lead_time_days'].to_numpy(),
+        'list_price': snapshot['list_price'].to_numpy(),
+        'cost_price': snapshot['cost_price'].to_numpy(),
+        'shelf_life_days': snapshot['shelf_life_days'].to_numpy(),
+        'demand_share': share,
+        'allocated_forecast_kg': product_totals[sku_codes] * share,
+    })
+
+
+def store_demand_paths(stores, daily_forecasts):
+    """
+    Split each product's daily forecast path across its stores.
+
+    Args:
+        stores (pd.DataFrame): Output of allocate_store_demand()
+        daily_forecasts (pd.DataFrame): One row per day, one column per SKU
+
+    Returns:
+        np.ndarray: Demand per store row and day, shape (len(stores), days)
+
+    Raises:
+        ValueError: If a SKU in stores has no column in daily_forecasts
+    """
+    sku_labels = stores['sku'].astype(str)
+    rows = daily_forecasts.columns.get_indexer(sku_labels)
+    if (rows < 0).any():
+        missing = sorted(set(sku_labels[rows < 0]))
+        raise ValueError(f"No daily forecast for SKU(s) {', '.join(missing)}")
+    paths = daily_forecasts.to_numpy(dtype=np.float64).T[rows]
+    return paths * stores['demand_share'].to_numpy()[:, None]
+
+
+def run_store_simulation(product_forecasts, discount_percentage, stock_multiplier=1.0,
+                         date_id=None, allocation='stock', elasticity=None,
+                         daily_forecasts=None):
+    """
+    Simulate waste and revenue for every (store, SKU) pair in one vectorized pass.
+
+    Args:
+        product_forecasts (dict[str, float] or pd.Series): Forecasted sales per SKU over the horizon
+        discount_percentage (float): Discount percentage as decimal (e.g., 0.15 for 15%)
+        stock_multiplier (float): Multiplier for stock levels to simulate overstocking (default: 1.0)
+        date_id (int): Inventory snapshot date as YYYYMMDD (default: latest snapshot)
+        allocation (str): Demand allocation, see allocate_store_demand()
+        elasticity (float or array-like): Uplift multiplier, scalar or per row
+            (default: each SKU's fitted value, see elasticity.py)
+        daily_forecasts (pd.DataFrame): Optional daily forecast path, one row per day and one
+            column per SKU. When given, each store gets its demand share of every day and
+            the shelf-life simulation (simulate_shelf_life_promotions) is used
+
+    Returns:
+        pd.DataFrame: Indexed by (store_id, sku), sorted, with float32 columns
+            allocated_forecast_kg, current_stock, days_to_expire, base_waste_kg,
+            promo_waste_kg, base_revenue and promo_revenue
+    """
+    stores = allocate_store_demand(product_forecasts, date_id, allocation)
+    if elasticity is None:
+        elasticity = get_elasticity_table().lookup(stores['sku'].astype(str))
+    if daily_forecasts is None:
+        result = simulate_promotions(
+            stores['allocated_forecast_kg'].to_numpy(),
+            stores['stock_on_hand_kg'].to_numpy(),
+            stores['list_price'].to_numpy(),
+            [discount_percentage],
+            [stock_multiplier],
+            elasticity,
+        )
+    else:
+        result = simulate_shelf_life_promotions(
+            store_demand_paths(stores, daily_forecasts),
+            stores['stock_on_hand_kg'].to_numpy(),
+            stores['list_price'].to_numpy(),
+            [discount_percentage],
+            [stock_multiplier],
+            elasticity,
+            stores['stock_in_transit_kg'].to_numpy(),
+            stores['lead_time_days'].to_numpy(),
+            stores['shelf_life_days'].to_numpy(),
+        )
+        result['base_revenue'] = result['base_revenue'][:, 0]
+        result['promo_revenue'] = result['promo_revenue'][:, 0]
+
+    table = pd.DataFrame({
+        'store_id': stores['store_id'].to_numpy(),
+        'sku': stores['sku'],
+        'allocated_forecast_kg': stores['allocated_forecast_kg'].to_numpy(dtype=np.float32),
+        'current_stock': result['current_stock'][:, 0].astype(np.float32),
+        'days_to_expire': stores['shelf_life_days'].to_numpy(),
+        'base_waste_kg': result['base_waste_kg'][:, 0].astype(np.float32),
+        'promo_waste_kg': result['promo_waste_kg'][:, 0, 0].astype(np.float32),
+        'base_revenue': result['base_revenue'].astype(np.float32),
+        'promo_revenue': result['promo_revenue'][:, 0].astype(np.float32),
+    })
+    return table.set_index(['store_id', 'sku']).sort_index()
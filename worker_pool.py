@@ -0,0 +1,92 @@
+"""
+Long-lived pool of pre-warmed forecasting worker processes.
+
+Each worker imports Prophet and runs one tiny fit when it starts, so the
+Stan backend is loaded before the first real request reaches it. The pool is
+shared for the life of the process: batch runs and services submit to it
+instead of spawning (and re-warming) a fresh pool per call.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+
+
+def quiet_fit_logs():
+    """Silence the per-fit INFO chatter from Prophet and cmdstanpy."""
+    # cmdstanpy resets its logger level the first time it builds it, so build it first
+    from cmdstanpy.utils import get_logger
+    get_logger().setLevel(logging.WARNING)
+    logging.getLogger('prophet').setLevel(logging.WARNING)
+
+
+def _init_worker():
+    """Process initializer: quiet logs, then load Prophet and the Stan backend."""
+    quiet_fit_logs()
+    from analysis_engine import warm_up
+    warm_up()
+
+
+def _ping():
+    return os.getpid()
+
+
+class WarmWorkerPool:
+    """
+    Process pool whose workers load Prophet once, at startup.
+
+    Args:
+        max_workers (int): Worker processes (default: os.cpu_count())
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+
+    def prewarm(self, wait_for_workers=False, timeout=None):
+        """
+        Start every worker now instead of on the first submitted task.
+
+        Args:
+            wait_for_workers (bool): Block until all workers have finished warming up
+            timeout (float): Seconds to wait when blocking (default: forever)
+
+        Returns:
+            list[Future]: One ping per worker; each resolves to the worker's pid
+        """
+        futures = [self._executor.submit(_ping) for _ in range(self.max_workers)]
+        if wait_for_workers:
+            wait(futures, timeout=timeout)
+        return futures
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Run a picklable callable on a warm worker.
+
+        Returns:
+            Future: The call's future
+        """
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        """Stop the workers and release the pool."""
+        self._executor.shutdown(wait=wait)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """
+    Get the process-wide WarmWorkerPool, starting its workers on first use.
+
+    Returns:
+        WarmWorkerPool: The shared pool
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WarmWorkerPool()
+            _default_pool.prewarm()
+        return _default_pool